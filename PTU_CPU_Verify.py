@@ -8,7 +8,11 @@
 #  - 產出 Albert_Overview.txt / .html + 純文字 console log
 #  - Log 目錄：/root/Documents/PTU_Linux_Rev4.8.0/PtuLog/run_YYYYmmdd_HHMMSS
 # =============================================================================
-import os, re, json, time, shutil, pathlib, datetime, subprocess
+import os, re, sys, json, mmap, time, queue, atexit, base64, bisect, struct, socket, asyncio, resource, itertools, shutil, signal, pathlib, datetime, subprocess, threading, multiprocessing
+import http.server, socketserver, urllib.parse
+from collections import deque
+from html import escape
+from array import array
 
 # ====== 可調整預設 ======
 LOG_BASE_DEFAULT = "/root/Documents/PTU_Linux_Rev4.8.0/PtuLog"
@@ -69,226 +73,2757 @@ def build_ptu_cmd(profile, binpath, load, dur, custom_tpl=None):
         return tpl.replace("{PTU_BIN}", binpath).replace("{LOAD}", str(load)).replace("{DURATION}", str(dur))
     return f'"{binpath}" {idf}-ct 3 -cp {load} -t {dur} -y -q'
 
+# console / campaign log：檔案保持開著寫進緩衝，距上次 flush 超過 LOG_FLUSH_S 才真的寫出（一串訊息只寫一次）；
+# OverheadMonitor 定期 flush，step 結束與程式結束時全部關檔。
+LOG_FLUSH_S = 1.0
+_LOGS, _LOGS_LOCK = {}, threading.Lock()
+
 def plain_write(fp, text):
-    with open(fp, "a", encoding="utf-8") as f: f.write(strip_ansi(text))
+    with _LOGS_LOCK:
+        lf = _LOGS.get(fp)
+        if lf is None: lf = _LOGS[fp] = [open(fp, "a", encoding="utf-8"), 0.0]
+        lf[0].write(strip_ansi(text))
+        t = time.monotonic()
+        if t - lf[1] >= LOG_FLUSH_S:
+            lf[0].flush(); lf[1] = t
 
-def detect_cpu_total():
-    try:
-        rc,o,_ = run(["nproc"]);  return int(o.strip()) if rc==0 else 1
-    except: return 1
+def flush_logs(close=False):
+    with _LOGS_LOCK:
+        for lf in _LOGS.values():
+            try:
+                lf[0].flush()
+                if close: lf[0].close()
+            except (OSError, ValueError): pass
+            lf[1] = time.monotonic()
+        if close: _LOGS.clear()
 
-def start_turbostat(out_file, duration):
+atexit.register(flush_logs, True)
+
+def turbostat_cmd(out_file, duration):
     if not have("turbostat"): return None
-    dump_flag = ""
+    rc,o,e = run("turbostat -h")
+    h = o + e                               # 多數版本的 help 印在 stderr
+    flags = ["--interval 1", f"--num_iterations {duration}"]
     if not TSTAT_FORCE_SUMMARY:
-        rc,h,_ = run("turbostat -h")
-        if "--Dump" in h or re.search(r"\b-D\b", h): dump_flag = "-D"
-        elif "--dump" in h: dump_flag = "--dump"
-    cmd = f'turbostat --interval 1 --num_iterations {duration} {dump_flag} --out "{out_file}" --quiet'.strip()
-    return subprocess.Popen(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-def parse_trend(ts_file):
-    if not os.path.exists(ts_file) or os.path.getsize(ts_file)==0: return []
-    with open(ts_file, "r", encoding="utf-8", errors="ignore") as f:
-        lines = [ln.strip() for ln in f if ln.strip()]
-    if not lines: return []
-    header = lines[0].split()
-    col = next((i for i,n in enumerate(header) if n in ("Avg_MHz","Bzy_MHz")), -1)
-    if col < 0: return []
-    data=[]
-    for ln in lines[1:]:
-        parts = ln.split()
-        if len(parts) <= col: continue
+        if "--Dump" in h or re.search(r"\b-D\b", h): flags.append("-D")
+        elif "--dump" in h: flags.append("--dump")
+    # Time_Of_Day_Seconds 預設關閉；有 --enable 就打開，Tstat 以它當時間軸（舊版沒有時退回 樣本數 × interval）
+    if "--enable" in h: flags.append("--enable Time_Of_Day_Seconds")
+    return " ".join(["turbostat"] + flags + [f'--out "{out_file}"', "--quiet"])
+
+# ====== PTU 狀態列 → 時序 ======
+# PTU/PTAT 週期性輸出的「名稱: 數值 單位」抽成長表 CSV（tod,key,value）。tod 是收到該行的牆鐘時間（epoch 秒），
+# 與 turbostat 的 Time_Of_Day_Seconds 同一基準（turbostat_cmd 有 --enable 時才有這欄；舊版 turbostat 的時間軸
+# 只能用 telemetry 起點 + 樣本數 × interval 推算，誤差約一個 interval）。第一個名稱符合 PTU_OPS_KEY 的欄位當 throughput（視為速率）。
+PTU_KV_RE = re.compile(r"([A-Za-z][\w.%/()# -]*?)\s*[:=]\s*(-?\d+(?:\.\d+)?)\s*(MHz|GHz|mW|W|C|%)?(?![\w.])")
+PTU_OPS_KEY_DEFAULT = r"(?i)ops|flops|iter"
+
+class PtuStatus(object):
+    def __init__(self, out_csv, ops_key=None):
+        self.f = open(out_csv, "w", encoding="utf-8")
+        self.f.write("tod,key,value\n")
+        self.rows = 0
+        self.ops_re = re.compile(ops_key) if ops_key else None
+        self.ops_key = None
+        self.ops = []           # (tod, 數值)
+
+    def feed(self, line):
+        t = time.time()
+        tod = f"{t:.3f}"
+        for k,v,unit in PTU_KV_RE.findall(line):
+            key = re.sub(r"\s+", "_", k.strip()) + (f"_{unit}" if unit else "")
+            self.f.write(f"{tod},{key},{v}\n")
+            self.rows += 1
+            if self.ops_key is None and self.ops_re and not unit and self.ops_re.search(key): self.ops_key = key
+            if key == self.ops_key: self.ops.append((t, float(v)))
+
+    def close(self): self.f.close()
+
+# ====== RAPL 背景取樣 ======
+# 只開一次 fd、用 pread 讀 energy_uj；依 powercap 階層分 package / 子 domain，
+# 總功耗只加 package 層（避免 package+core+uncore+dram 重複計算）；
+# 計數器回捲用 max_energy_range_uj 補回。
+RAPL_ROOT = "/sys/class/powercap"
+RAPL_INTERVAL_DEFAULT = 1.0             # 秒，最小 0.1
+RAPL_RING_DEFAULT = 3600                # 記憶體中保留的最近樣本數
+
+def _read_str(p, default=""):
+    try:
+        with open(p) as f: return f.read().strip()
+    except (OSError, IOError): return default
+
+def rapl_zones(root=RAPL_ROOT):
+    zones = []
+    if not os.path.isdir(root): return zones
+    for zid in sorted(os.listdir(root)):
+        # intel-rapl:0 / intel-rapl:0:1；控制型目錄（intel-rapl）與 mmio 重複介面略過
+        if ":" not in zid or "mmio" in zid: continue
+        path = os.path.join(root, zid)
+        energy = os.path.join(path, "energy_uj")
+        if not os.path.isfile(energy): continue
+        name = _read_str(os.path.join(path, "name"), zid)
+        parts = zid.split(":")
+        parent = ":".join(parts[:-1]) if len(parts) > 2 else None
+        zones.append({"id": zid, "name": name, "parent": parent, "energy": energy,
+                      "max": int(_read_str(os.path.join(path, "max_energy_range_uj"), "0") or 0)})
+    names = {z["id"]: z["name"] for z in zones}
+    for z in zones:
+        z["label"] = f'{names.get(z["parent"], z["parent"])}/{z["name"]}' if z["parent"] else z["name"]
+        z["top"] = z["parent"] is None and z["name"].startswith("package")
+    return zones
+
+class RaplSampler(threading.Thread):
+    def __init__(self, zones, interval=RAPL_INTERVAL_DEFAULT, out_csv=None, ring=RAPL_RING_DEFAULT):
+        super().__init__(name="rapl-sampler", daemon=True)
+        self.zones = zones
+        self.interval = max(0.1, float(interval))
+        self.out_csv = out_csv
+        self._csv = None                         # run() / open_csv() 才打開；沒 start 直接 sample() 也不會炸
+        self.ring = deque(maxlen=ring)           # (t, [W per zone], 總 package W)
+        self.fds = [os.open(z["energy"], os.O_RDONLY) for z in zones]
+        self.energy_j = [0.0]*len(zones)
+        self.peak_w = [0.0]*len(zones)
+        self.peak_total = 0.0
+        self.wraps = 0
+        self.samples = 0
+        self._stop_ev = threading.Event()
+        self._lock = threading.Lock()
+        self._prev = self._read()
+        self._t0 = self._tp = time.monotonic()
+        self.wall0 = time.time()                # rapl_*.csv 的 t_s 從這個牆鐘時間起算
+
+    def _read(self):
+        out = []
+        for fd in self.fds:
+            try: out.append(int(os.pread(fd, 32, 0)))
+            except (OSError, ValueError): out.append(None)
+        return out
+
+    def sample(self):
+        cur, t = self._read(), time.monotonic()
+        dt = t - self._tp
+        if dt <= 0: return
+        watts = []
+        for i,(a,b) in enumerate(zip(self._prev, cur)):
+            if a is None or b is None: watts.append(NAN); continue
+            d = b - a
+            if d < 0:
+                d += self.zones[i]["max"] or 0
+                self.wraps += 1
+            d = max(0, d)
+            self.energy_j[i] += d/1e6
+            watts.append(d/1e6/dt)
+        total = sum(w for w,z in zip(watts, self.zones) if z["top"] and w == w)
+        with self._lock:
+            for i,w in enumerate(watts):
+                if w == w and w > self.peak_w[i]: self.peak_w[i] = w
+            self.peak_total = max(self.peak_total, total)
+            self.ring.append((t - self._t0, watts, total))
+            self.samples += 1
+        self._prev, self._tp = cur, t
+        if self._csv:
+            self._csv.write(f"{t - self._t0:.3f},{total:.3f}," + ",".join(f"{w:.3f}" for w in watts) + "\n")
+
+    def open_csv(self):
+        if self.out_csv and not self._csv:
+            self._csv = open(self.out_csv, "w", encoding="utf-8", buffering=1)
+            self._csv.write("t_s,package_total_W," + ",".join(z["label"] for z in self.zones) + "\n")
+
+    def close(self):
+        if self._csv: self._csv.close()
+        self._csv = None
+        for fd in self.fds: os.close(fd)
+        self.fds = []
+
+    def run(self):
+        label_thread(self.name)
+        self.open_csv()
         try:
-            t = int(float(parts[0])); v = float(parts[col]); data.append((t,v))
-        except: pass
-    agg={}
-    for t,v in data: agg.setdefault(t, []).append(v)
-    return [[t, sum(v)/len(v)] for t,v in sorted(agg.items())]
+            while not self._stop_ev.wait(self.interval): self.sample()
+            self.sample()
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop_ev.set()
+        self.join(timeout=self.interval + 5)
+
+    def elapsed(self): return self._tp - self._t0
+
+    def summary(self):
+        el = max(1e-6, self.elapsed())
+        with self._lock:
+            doms = [{"label": z["label"], "top": z["top"], "energy_j": e, "avg_w": e/el, "peak_w": p}
+                    for z,e,p in zip(self.zones, self.energy_j, self.peak_w)]
+            pkg_j = sum(d["energy_j"] for d in doms if d["top"])
+            return {"elapsed_s": el, "samples": self.samples, "wraps": self.wraps,
+                    "energy_j": pkg_j, "avg_w": pkg_j/el, "peak_w": self.peak_total, "domains": doms}
+
+# ====== Online 分析（跑的同時偵測降頻 / 過熱 / 功耗牆 / 死核） ======
+# 追 turbostat（或內建取樣）檔案的新增內容，逐樣本更新固定記憶體的統計（Welford、EWMA、連續計數）；
+# FAILFAST=1 時第一個異常就送 SIGTERM 給自己，走跟 Stop 相同的收尾路徑，Overview 記 FAIL。
+FAILFAST_DEFAULT = False
+WARMUP_S_DEFAULT = 60                   # 前 N 秒建立基準頻率，不判定
+FREQ_DROP_PCT_DEFAULT = 15              # EWMA 頻率低於基準 N% …
+SUSTAIN_S_DEFAULT = 30                  # … 且持續 N 秒才算
+TEMP_LIMIT_C_DEFAULT = 95
+PL_NEAR_PCT_DEFAULT = 95                # 降頻時功耗 ≥ PL1 的 N% → 判為功耗牆
+DEAD_BUSY_PCT_DEFAULT = 5               # 選到的核 Busy% 低於 N% …
+DEAD_CORE_S_DEFAULT = 60                # … 持續 N 秒 → 死核
+
+class FileTail(object):
+    # 只讀上次之後新增的 bytes；不完整的最後一行留到下次
+    def __init__(self, path):
+        self.path, self.off, self.rest = path, 0, b""
+
+    def lines(self, max_bytes=1 << 20):
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.off); buf = f.read(max_bytes)
+        except (OSError, IOError):
+            return []
+        self.off += len(buf)
+        buf = self.rest + buf
+        cut = buf.rfind(b"\n") + 1
+        self.rest = buf[cut:]
+        return buf[:cut].decode("utf-8", "ignore").splitlines(True)
+
+class Welford(object):
+    def __init__(self): self.n, self.mean, self.m2, self.min, self.max = 0, 0.0, 0.0, None, None
+    def add(self, x):
+        self.n += 1
+        d = x - self.mean
+        self.mean += d/self.n
+        self.m2 += d*(x - self.mean)
+        self.min = x if self.min is None else min(self.min, x)
+        self.max = x if self.max is None else max(self.max, x)
+    def std(self): return (self.m2/(self.n - 1))**0.5 if self.n > 1 else 0.0
+
+class Ewma(object):
+    def __init__(self, alpha=0.1): self.alpha, self.value = alpha, None
+    def add(self, x):
+        self.value = x if self.value is None else self.value + self.alpha*(x - self.value)
+        return self.value
+
+def analysis_config(env=None):
+    env = os.environ if env is None else env
+    g = lambda k, d: type(d)(env.get(k, d))
+    return {"failfast": env.get("FAILFAST", "1" if FAILFAST_DEFAULT else "0") in ("1","true","yes"),
+            "warmup_s": g("WARMUP_S", WARMUP_S_DEFAULT), "freq_drop_pct": g("FREQ_DROP_PCT", FREQ_DROP_PCT_DEFAULT),
+            "sustain_s": g("SUSTAIN_S", SUSTAIN_S_DEFAULT), "temp_limit_c": g("TEMP_LIMIT_C", TEMP_LIMIT_C_DEFAULT),
+            "pl_near_pct": g("PL_NEAR_PCT", PL_NEAR_PCT_DEFAULT), "dead_busy_pct": g("DEAD_BUSY_PCT", DEAD_BUSY_PCT_DEFAULT),
+            "dead_core_s": g("DEAD_CORE_S", DEAD_CORE_S_DEFAULT)}
+
+def rapl_pl1_w(zones):
+    # package 層 constraint_0（long term / PL1）加總
+    tot = 0.0
+    for z in zones or ():
+        if z["top"]:
+            uw = _read_str(os.path.join(os.path.dirname(z["energy"]), "constraint_0_power_limit_uw"), "0")
+            tot += int(uw or 0)/1e6
+    return tot or None
+
+class Analyzer(object):
+    def __init__(self, cfg, cpus=None, load=100, pl1_w=None):
+        self.cfg, self.cpus, self.load, self.pl1_w = cfg, set(cpus or ()), load, pl1_w
+        self.stats = {k: Welford() for k in ("freq_mhz","busy_pct","power_w","temp_c")}
+        self.freq_ewma = Ewma(0.1)
+        self.base = Welford()                # warm-up 期的頻率基準
+        self.low_s = self.hot_s = 0.0
+        self.throttle_s = 0.0                # 累計低於基準門檻的秒數
+        self.idle_s = {}
+        self.events = []
+        self.flags = set()
+        self.last_t = None
+
+    def _flag(self, t, kind, detail):
+        if kind in self.flags: return
+        self.flags.add(kind)
+        self.events.append((t, kind, detail))
+
+    def add(self, t, summ, cpus, power=None):
+        dt = (t - self.last_t) if self.last_t is not None else 0.0
+        self.last_t = t
+        c = self.cfg
+        freq = summ.get("Bzy_MHz", summ.get("Avg_MHz"))
+        temp = max([summ.get("PkgTmp", NAN), summ.get("CoreTmp", NAN)], key=lambda x: x if x == x else -1)
+        if power is None: power = summ.get("PkgWatt")
+        for k,v in (("freq_mhz", freq), ("busy_pct", summ.get("Busy%")), ("power_w", power), ("temp_c", temp)):
+            if v is not None and v == v: self.stats[k].add(v)
+        if t < c["warmup_s"]:
+            if freq is not None and t >= c["warmup_s"]/6: self.base.add(freq)
+            return
+        if freq is not None and self.base.n:
+            ew = self.freq_ewma.add(freq)
+            if ew < self.base.mean*(1 - c["freq_drop_pct"]/100.0):
+                self.low_s += dt
+                self.throttle_s += dt
+                if self.low_s >= c["sustain_s"]:
+                    if self.pl1_w and power is not None and power >= self.pl1_w*c["pl_near_pct"]/100.0:
+                        self._flag(t, "power_limit", f"{ew:.0f} MHz vs base {self.base.mean:.0f} MHz at {power:.0f} W (PL1 {self.pl1_w:.0f} W)")
+                    elif temp == temp and temp >= c["temp_limit_c"] - 5:
+                        self._flag(t, "thermal_throttle", f"{ew:.0f} MHz vs base {self.base.mean:.0f} MHz at {temp:.0f} °C")
+                    else:
+                        self._flag(t, "freq_drop", f"{ew:.0f} MHz vs base {self.base.mean:.0f} MHz for {self.low_s:.0f}s")
+            else:
+                self.low_s = 0.0
+        if temp == temp and temp >= c["temp_limit_c"]:
+            self.hot_s += dt
+            if self.hot_s >= c["sustain_s"]: self._flag(t, "over_temp", f"{temp:.0f} °C ≥ {c['temp_limit_c']} °C for {self.hot_s:.0f}s")
+        else:
+            self.hot_s = 0.0
+        if self.load >= 50:
+            for cpu,row in cpus.items():
+                if self.cpus and cpu not in self.cpus: continue
+                b = row.get("Busy%")
+                if b is None: continue
+                self.idle_s[cpu] = self.idle_s.get(cpu, 0.0) + dt if b < c["dead_busy_pct"] else 0.0
+                if self.idle_s[cpu] >= c["dead_core_s"]:
+                    self._flag(t, f"dead_core_{cpu}", f"cpu{cpu} Busy% {b:.1f} for {self.idle_s[cpu]:.0f}s")
+
+    def summary(self):
+        st = {k: {"n": w.n, "mean": w.mean, "std": w.std(), "min": w.min, "max": w.max} for k,w in self.stats.items() if w.n}
+        return {"stats": st, "base_mhz": self.base.mean if self.base.n else None, "throttle_s": self.throttle_s,
+                "events": [{"t": t, "kind": k, "detail": d} for t,k,d in self.events]}
+
+class RunMonitor(threading.Thread):
+    def __init__(self, tstat_file, analyzer, rapl=None, interval=1.0, log=None, live=None, store=None, wall0=None):
+        super().__init__(name="run-monitor", daemon=True)
+        self.wall0 = time.time() if wall0 is None else wall0     # telemetry 起點（沒有 Time_Of_Day 時 turbostat 時間軸的基準）
+        self.tail = FileTail(tstat_file)
+        self.tstat = Tstat(cpu_metrics=None if store else ("Busy%",))     # 有欄式檔要寫就保留全部 per-CPU 欄位
+        self.an, self.rapl, self.interval, self.log, self.live = analyzer, rapl, interval, log, live
+        self.store = store
+        if store: store.topo = self.tstat.topo
+        self.tripped = None
+        self._rapl_t = None
+        self._stop_ev = threading.Event()
+
+    def _live_t(self, t, rapl=False):
+        # turbostat 樣本時間與 RAPL 的 monotonic 時間各自起算：先換成牆鐘，再換成 live 的 run 經過秒數
+        if rapl: return self.live.elapsed(self.rapl.wall0 + t)
+        t0 = self.tstat._t0 if self.tstat._t0 is not None else self.wall0 + self.tstat.interval
+        return self.live.elapsed(t0 + t)
+
+    def poll(self, final=False):
+        while True:
+            lines = self.tail.lines()
+            for ln in lines: self.tstat.feed(ln)
+            if not final or not lines: break        # 收尾時讀到檔尾
+        last = self.rapl.ring[-1] if self.rapl and self.rapl.ring else None
+        power = last[2] if last else None
+        n0, got = len(self.an.events), False
+        for t,summ,cpus,pkgs in self.tstat.take(final):
+            if self.store:
+                try: self.store.append(t, summ, cpus, pkgs)
+                except OSError as e:
+                    if self.log: self.log(f"{now()} | [WARN] Telemetry store write failed ({e}) — reports will parse the text file.\n")
+                    self.store.abort(); self.store = None
+            self.an.add(t, summ, cpus, power)
+            if self.live: self.live.push(self._live_t(t), summ, cpus, last)
+            got = True
+        if self.live and last and not got and last[0] != self._rapl_t:
+            self.live.push(self._live_t(last[0], rapl=True), {}, None, last)      # 沒有 turbostat 樣本時至少送功耗
+        self._rapl_t = last[0] if last else None
+        if self.live and len(self.an.events) > n0: self.live.set(events=len(self.an.events))
+        for t,kind,detail in self.an.events[n0:]:
+            if self.log: self.log(f"{now()} | [WARN] Online analysis: {kind} @ {t:.0f}s — {detail}\n")
+            if self.an.cfg["failfast"] and self.tripped is None:
+                self.tripped = f"{kind}: {detail}"
+                if self.log: self.log(f"{now()} | [FAIL] Fail-fast triggered — stopping run early.\n")
+                os.kill(os.getpid(), signal.SIGTERM)
+
+    def run(self):
+        label_thread(self.name)
+        while not self._stop_ev.wait(self.interval): self.poll()
+
+    def stop(self):
+        self._stop_ev.set()
+        self.join(timeout=self.interval + 5)
+        self.poll(final=True)
+        if self.store:
+            try: self.store.close()
+            except OSError as e:
+                if self.log: self.log(f"{now()} | [WARN] Telemetry store close failed: {e}\n")
+                self.store.abort(); self.store = None
+
+# ====== 內建 CPU soaker（最後一道降級） ======
+# 每顆選到的 CPU 一個 process，os.sched_setaffinity 綁核；以 SOAK_PERIOD 為週期做
+# duty-cycle：忙 LOAD% 的時間、其餘睡掉。kernel：int（整數 ALU）/ fp（NumPy matmul，
+# 沒 NumPy 用純 Python FMA）/ mem（大塊記憶體搬移）。回報每核實際使用率與 ops/s，
+# 以及每個視窗（DURATION / SOAK_WINDOWS，至少 1 秒）的 ops，給 perf-per-watt 算穩定度。
+SOAK_KERNEL_DEFAULT = "int"             # int / fp / mem
+SOAK_PERIOD = 0.1                       # duty-cycle 週期（秒）
+SOAK_MEM_BYTES = 32 << 20
+SOAK_WINDOWS = 600
+SOAK_UNITS = {"int": "ops", "fp": "flop", "mem": "B"}
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+def _soak_kernel(kind):
+    if kind == "fp":
+        if np is not None:
+            a = np.random.rand(128, 128); b = np.random.rand(128, 128)
+            def k(): np.dot(a, b); return 2*128**3
+        else:
+            def k():
+                acc, x = 0.0, 1.000001
+                for _ in range(10000): acc = acc*0.999999 + x
+                return 20000
+        return k
+    if kind == "mem":
+        src, dst = bytearray(SOAK_MEM_BYTES), bytearray(SOAK_MEM_BYTES)
+        def k(): dst[:] = src; return 2*SOAK_MEM_BYTES
+        return k
+    def k():
+        x = 1
+        for _ in range(10000): x = (x*1103515245 + 12345) & 0xFFFFFFFF
+        return 10000
+    return k
+
+def _soak_worker(cpu, duration, load, kind, q, stop_ev, win=1.0):
+    try: os.sched_setaffinity(0, {cpu})
+    except (OSError, AttributeError): pass
+    k = _soak_kernel(kind)
+    busy = max(0, min(100, load))/100.0
+    ops, t0, c0, w0 = 0, time.monotonic(), time.process_time(), time.time()
+    end = t0 + duration
+    wins, wops, wend = array("d"), 0, t0 + win
+    while not stop_ev.is_set():
+        p0 = time.monotonic()
+        while p0 >= wend:                   # 視窗結束（睡過頭就補 0）
+            wins.append(ops - wops); wops = ops; wend += win
+        if p0 >= end: break
+        if busy > 0:
+            until = p0 + SOAK_PERIOD*busy
+            while True:
+                ops += k()
+                if time.monotonic() >= until: break
+        rest = min(p0 + SOAK_PERIOD, end) - time.monotonic()
+        if rest > 0 and busy < 1: stop_ev.wait(rest)
+    wall = max(1e-6, time.monotonic() - t0)
+    q.put({"cpu": cpu, "kernel": kind, "wall_s": wall, "util": 100.0*(time.process_time() - c0)/wall,
+           "ops": ops, "ops_s": ops/wall, "t0": w0, "win": win, "wins": wins})
+
+def run_soaker(cpus, duration, load, kind=SOAK_KERNEL_DEFAULT, stop_ev=None):
+    q = multiprocessing.Queue()
+    stop_ev = stop_ev or multiprocessing.Event()
+    win = max(1.0, duration/SOAK_WINDOWS)
+    procs = [multiprocessing.Process(target=_soak_worker, name=f"soak-{c}", args=(c, duration, load, kind, q, stop_ev, win), daemon=True)
+             for c in cpus]
+    for p in procs: p.start()
+    res = []
+    for _ in procs:
+        try: res.append(q.get(timeout=duration + 30))
+        except queue.Empty: break
+    for p in procs: p.join(timeout=5)
+    return sorted(res, key=lambda r: r["cpu"])
+
+# ====== turbostat 串流解析 ======
+# 逐行讀、跟著 header 變動重新對欄；每個數值欄位存成 array('f')（缺值補 NaN），
+# 記憶體只跟「欄位數 × 取樣數」有關，與檔案大小/文字量無關。
+TSTAT_INTERVAL = 1.0
+TSTAT_HEADER_HINTS = {"Avg_MHz","Bzy_MHz","Busy%","CPU","Core","Package","Die","PkgWatt","Time_Of_Day_Seconds","usec"}
+TSTAT_TOPO_COLS = {"Package","Node","Die","Core","CPU","APIC","X2APIC","usec","Time_Of_Day_Seconds"}
+TSTAT_PKG_PREFIX = ("Pkg","PKG_","RAM","CorWatt","GFX","Uncore","SysWatt","Totl%","Any%")
+NAN = float("nan")
+
+def _isnum(tok):
+    try: float(tok); return True
+    except ValueError: return False
+
+class Tstat(object):
+    def __init__(self, interval=TSTAT_INTERVAL, cpu_metrics=None, matrix=None):
+        self.interval = interval
+        self.cpu_metrics = set(cpu_metrics) if cpu_metrics is not None else None
+        self.matrix = matrix    # CpuMatrix：per-CPU 的 matrix metrics 直接落檔，不留在記憶體
+        self._mx = {}
+        self.topo = matrix.topo if matrix is not None else {}     # cpu -> (package, core)
+        self.t = array("d")
+        self.summary = {}   # metric -> array('f')
+        self.cpu = {}       # cpu -> {metric: array('f')}
+        self.pkg = {}       # package -> {metric: array('f')}
+        self.header = []
+        self._idx = {}
+        self._cols = []         # (欄位 index, 名稱, 是否 package 欄)；header 變動時重算
+        self._seen = set()
+        self._rows = 0
+        self._n = 0
+        self._t0 = None
+
+    def __len__(self): return len(self.t)
+
+    def _flush_mx(self):
+        if self.matrix is not None and len(self.t):
+            self.matrix.append(self.t[-1], self._mx)
+            self._mx = {}
+
+    def _new_sample(self, tod=None):
+        self._flush_mx()
+        self.t.append(tod if tod is not None else self._n*self.interval)
+        self._n += 1                        # 累計樣本數（take() 刪掉舊樣本後時間軸仍連續）
+        self._seen = set()
+
+    def feed(self, line):
+        parts = line.split()
+        if not parts: return
+        if not _isnum(parts[0]) and parts[0] != "-":
+            if parts == self.header:
+                self._rows = 0                  # 每個樣本前重印的同一個 header：不必重算欄位
+            elif TSTAT_HEADER_HINTS.intersection(parts):
+                self.header = parts
+                self._idx = {n:i for i,n in enumerate(parts)}
+                self._cols = [(i, n, n.startswith(TSTAT_PKG_PREFIX)) for i,n in enumerate(parts) if n not in TSTAT_TOPO_COLS]
+                self._rows = 0
+            return
+        if not self.header: return
+        ci, pi, ti = self._idx.get("CPU"), self._idx.get("Package"), self._idx.get("Time_Of_Day_Seconds")
+        if ci is not None and ci >= len(parts): return      # 截斷的列（連 CPU 欄都沒有）不能當 summary 列
+        cpu = parts[ci] if ci is not None and ci < len(parts) else "-"
+        key = ("cpu", cpu) if cpu != "-" else ("sum",)
+        if self._rows == 0 or key in self._seen:
+            tod = None
+            if ti is not None and ti < len(parts) and _isnum(parts[ti]):
+                tod = float(parts[ti])
+                if self._t0 is None: self._t0 = tod - self._n*self.interval
+                tod -= self._t0
+            self._new_sample(tod)
+        self._rows += 1
+        self._seen.add(key)
+        if cpu == "-":
+            table, ptable = self.summary, None
+        else:
+            try: c = int(cpu)
+            except ValueError: return
+            table = self.cpu.setdefault(c, {})
+            p = parts[pi] if pi is not None and pi < len(parts) else "0"
+            ptable = self.pkg.setdefault(int(p), {}) if p.isdigit() else None
+            if c not in self.topo:
+                ki = self._idx.get("Core")
+                k = parts[ki] if ki is not None and ki < len(parts) else ""
+                if p.isdigit() and k.isdigit() and pi is not None: self.topo[c] = (int(p), int(k))
+        n, np_ = len(self.t) - 1, len(parts)
+        mxm = self.matrix.metrics if self.matrix is not None and table is not self.summary else ()
+        keep = self.cpu_metrics if table is not self.summary else None
+        for i,name,pk in self._cols:
+            if i >= np_: break
+            try: v = float(parts[i])
+            except ValueError: continue
+            if pk and ptable is not None: tbl = ptable
+            elif name in mxm:
+                self._mx.setdefault(name, {}).setdefault(c, v)
+                continue
+            elif keep is None or name in keep: tbl = table
+            else: continue
+            col = tbl.get(name)                 # 每個數值都走這裡：不另呼叫函式
+            if col is None: col = tbl[name] = array("f")
+            k = len(col)
+            if k == n: col.append(v)            # k > n：同一樣本重複列（如 Package 行）只取第一筆
+            elif k < n:
+                col.extend(array("f", [NAN])*(n - k)); col.append(v)
+
+    def take(self, final=False):
+        # 取出已完成的樣本（最後一個可能還在寫，留著；final＝來源已結束，全部取出）並從欄位刪掉：online 分析用，記憶體固定
+        k = len(self.t) - (0 if final else 1)
+        if k <= 0: return []
+        def row(table, i):
+            return {m: c[i] for m,c in table.items() if i < len(c) and c[i] == c[i]}
+        out = [(self.t[i], row(self.summary, i), {c: row(d, i) for c,d in self.cpu.items()},
+                {p: row(d, i) for p,d in self.pkg.items()}) for i in range(k)]
+        del self.t[:k]
+        for tables in ([self.summary], self.cpu.values(), self.pkg.values()):
+            for table in tables:
+                for col in table.values(): del col[:k]
+        return out
+
+    def finish(self):
+        self._flush_mx()
+        if self.matrix is not None: self.matrix.close()
+        n = len(self.t)
+        for tables in ([self.summary], self.cpu.values(), self.pkg.values()):
+            for table in tables:
+                for col in table.values():
+                    while len(col) < n: col.append(NAN)
+        return self
+
+    def metrics(self):
+        names = set(self.summary)
+        for d in self.cpu.values(): names.update(d)
+        for d in self.pkg.values(): names.update(d)
+        return sorted(names)
+
+    def series(self, metric):
+        # summary 列優先；沒有 summary（純 per-CPU 輸出）就逐樣本平均各 CPU
+        col = self.summary.get(metric)
+        if col is not None: return col
+        if self.matrix is not None and metric in self.matrix.mean: return self.matrix.mean[metric]
+        cols = [d[metric] for d in self.cpu.values() if metric in d] or \
+               [d[metric] for d in self.pkg.values() if metric in d]
+        if not cols: return None
+        out = array("f")
+        for i in range(len(self.t)):
+            vs = [c[i] for c in cols if c[i] == c[i]]
+            out.append(sum(vs)/len(vs) if vs else NAN)
+        return out
+
+def parse_turbostat(ts_file, cpu_metrics=None, matrix=None):
+    ts = Tstat(cpu_metrics=cpu_metrics, matrix=matrix)
+    if not os.path.exists(ts_file) or os.path.getsize(ts_file)==0: return ts.finish()
+    with open(ts_file, "r", encoding="utf-8", errors="ignore") as f:
+        for ln in f:
+            if ln.endswith("\n"): ts.feed(ln)   # 最後一行沒換行＝寫到一半，略過
+    return ts.finish()
+
+def col_stats(col):
+    vs = [v for v in (col or ()) if v == v]
+    if not vs: return None
+    return sum(vs)/len(vs), min(vs), max(vs)
+
+def percentiles(col, ps=(1, 50, 99)):
+    vs = sorted(v for v in (col or ()) if v == v)
+    if not vs: return None
+    return [vs[min(len(vs)-1, int(round(p/100.0*(len(vs)-1))))] for p in ps]
+
+def parse_trend(ts_file, tstat=None):
+    ts = tstat if tstat is not None else parse_turbostat(ts_file, cpu_metrics=("Avg_MHz","Bzy_MHz"))
+    name = next((n for n in ts.header if n in ("Avg_MHz","Bzy_MHz")), None)
+    col = ts.series(name) if name else None
+    if col is None: return []
+    return [[int(ts.t[i]), round(v, 1)] for i,v in enumerate(col) if v == v]
+
+# ====== Per-CPU 矩陣（time × CPU，落檔） ======
+# 每個 metric 一個 row-major float32 檔（telemetry/percpu_<metric>.f32），解析時逐樣本 append、記憶體只留一列；
+# 讀回用 mmap（有 NumPy 用 np.memmap）。多天長跑也不會吃光 RAM。
+MATRIX_METRICS = ("Bzy_MHz", "Avg_MHz", "Busy%")
+
+def _mx_name(m): return re.sub(r"[^A-Za-z0-9_]", "_", m.replace("%", "pct"))
 
-def make_html(run_dir, duration, gov, profile, ptu_bin, avgW, trend):
+class CpuMatrix(object):
+    def __init__(self, out_dir, metrics=MATRIX_METRICS):
+        self.out_dir, self.metrics = out_dir, tuple(metrics)
+        self.cpus = None        # 欄順序（第一個有 per-CPU 資料的樣本決定；之後才出現的 CPU 略過）
+        self.topo = {}          # cpu -> (package, core)
+        self.t = array("d")     # 每列的時間
+        self.mean = {m: array("f") for m in self.metrics}   # 每樣本各 CPU 平均（沒有 summary 列時給 series 用）
+        self._valid = set()     # 至少有一個有效值的 metric
+        self._fp = {}
+
+    @property
+    def rows(self): return len(self.t)
+
+    def path(self, m): return os.path.join(self.out_dir, f"percpu_{_mx_name(m)}.f32")
+
+    def _start(self, cpus):
+        self.cpus = sorted(cpus)
+        mkdir_p(self.out_dir)
+        self._fp = {m: open(self.path(m), "wb") for m in self.metrics}
+
+    def _write(self, m, a):
+        if sys.byteorder != "little":
+            a = array("f", a); a.byteswap()
+        self._fp[m].write(a)
+
+    def append(self, t, row):
+        for m in self.metrics:
+            vs = [v for v in row.get(m, {}).values() if v == v]
+            self.mean[m].append(sum(vs)/len(vs) if vs else NAN)
+            if vs: self._valid.add(m)
+        if self.cpus is None:
+            cs = set()
+            for d in row.values(): cs.update(d)
+            if not cs: return
+            self._start(cs)
+        self.t.append(t)
+        for m in self.metrics:
+            d = row.get(m, {})
+            self._write(m, array("f", [d.get(c, NAN) for c in self.cpus]))
+
+    def extend(self, t, cols, means=()):
+        # 整塊寫入（欄式 telemetry 的 n×CPU 區塊，CPU 順序相同就原樣落檔）；cols: metric -> (cpu ids, row-major f32)
+        # means：沒有 summary 列、需要逐樣本平均的 metric
+        n = len(t)
+        if self.cpus is None:
+            cs = set()
+            for ids, _ in cols.values(): cs.update(ids)
+            if not cs: return
+            self._start(cs)
+        k = len(self.cpus)
+        self.t.extend(t)
+        for m in self.metrics:
+            ids, blk = cols.get(m, ((), None))
+            if blk is None:
+                blk = array("f", [NAN])*(n*k)
+            else:
+                if m not in self._valid and any(v == v for v in blk): self._valid.add(m)
+                if list(ids) != self.cpus:
+                    pos, w = {c: j for j,c in enumerate(ids)}, len(ids)
+                    sel = [pos.get(c) for c in self.cpus]
+                    blk = array("f", [blk[r*w + j] if j is not None else NAN for r in range(n) for j in sel])
+            if m in means:
+                if np is not None:
+                    a = np.frombuffer(blk, dtype="f4").reshape(n, k); ok = a == a
+                    c = ok.sum(1)
+                    self.mean[m].extend(array("f", np.where(c > 0, np.where(ok, a, 0).sum(1)/np.maximum(c, 1), NAN).tolist()))
+                else:
+                    for r in range(n):
+                        vs = [v for v in blk[r*k:(r+1)*k] if v == v]
+                        self.mean[m].append(sum(vs)/len(vs) if vs else NAN)
+            else:
+                self.mean[m].extend(array("f", [NAN])*n)
+            self._write(m, blk)
+
+    def close(self):
+        if not self._fp: return self
+        for f in self._fp.values(): f.close()
+        self._fp = {}
+        keep = [m for m in self.metrics if m in self._valid]
+        if "Bzy_MHz" in keep and "Avg_MHz" in keep: keep.remove("Avg_MHz")     # 有 Bzy_MHz 就不另存 Avg_MHz
+        for m in self.metrics:
+            if m not in keep: os.remove(self.path(m))
+        self.metrics = tuple(keep)
+        for c in self.cpus:
+            if c not in self.topo:
+                d = os.path.join(CPU_SYS, f"cpu{c}", "topology")
+                pk, co = _read_str(os.path.join(d, "physical_package_id"), "0"), _read_str(os.path.join(d, "core_id"), str(c))
+                self.topo[c] = (int(pk) if pk.lstrip("-").isdigit() else 0, int(co) if co.isdigit() else c)
+        with open(os.path.join(self.out_dir, "percpu_t.f64"), "wb") as f:
+            t = array("d", self.t)
+            if sys.byteorder != "little": t.byteswap()
+            t.tofile(f)
+        with open(os.path.join(self.out_dir, "percpu.json"), "w", encoding="utf-8") as f:
+            json.dump({"rows": self.rows, "cpus": self.cpus, "metrics": list(self.metrics), "dtype": "<f4",
+                       "topo": {str(c): list(self.topo[c]) for c in self.cpus},
+                       "files": {m: os.path.basename(self.path(m)) for m in self.metrics}}, f)
+        return self
+
+    def open(self, m):
+        # 唯讀映射：NumPy → np.memmap；沒有 NumPy → mmap + memoryview（小端主機不複製）
+        n = self.rows * len(self.cpus or ())
+        if not n: return ()
+        if np is not None: return np.memmap(self.path(m), dtype="<f4", mode="r", shape=(n,))
+        with open(self.path(m), "rb") as f:
+            if sys.byteorder == "little":
+                return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("f")
+            a = array("f"); a.fromfile(f, n); a.byteswap()
+            return a
+
+# ====== 欄式 telemetry（chunked binary，跑的同時寫） ======
+# RunMonitor 每取出一個樣本就 append，累積成 chunk 才落檔：小 JSON meta + 時間軸（<f8）+ 每個 metric 一塊
+# row-major <f4（summary n×1、package n×P、CPU n×C，缺值 NaN）。同一 metric 的 CPU 區塊接起來就是 CpuMatrix 的檔案格式。
+# 檔尾是 chunk 索引；沒有索引（中途當掉）就逐 chunk 掃，寫一半的 chunk 丟掉。讀取走 mmap，報告不必再解析文字。
+TELEMETRY_MAGIC = b"PTCOL1\n\0"
+TELEMETRY_TAIL = b"PTCOLIDX"
+TELEMETRY_CHUNK_ROWS = 600
+TELEMETRY_CHUNK_VALUES = 1 << 20        # 每個 chunk 最多暫存這麼多值（512 CPU × 20 欄時約 100 列一個 chunk）
+_CHUNK = struct.Struct("<4sII")          # b"CHNK", 列數, meta bytes（含補齊到 8 的空白）
+_TAIL = struct.Struct("<Q8s")            # 索引 offset, TELEMETRY_TAIL
+
+def _le(a, code):
+    if sys.byteorder != "little":
+        a = array(code, a); a.byteswap()
+    return a
+
+class TelemetryStore(object):
+    def __init__(self, path):
+        self.path = path
+        self.f = open(path, "wb")
+        self.f.write(TELEMETRY_MAGIC)
+        self.topo = {}          # cpu -> (package, core)；RunMonitor 會換成 Tstat 的 topo
+        self.ids = {sc: [] for sc in "scp"}         # scope（summary / CPU / package）-> ids；只增不減，
+        self.ms = {sc: [] for sc in "scp"}          # 新欄位 / 新 CPU 出現就先切 chunk
+        self._sets = {sc: (set(), set()) for sc in "scp"}
+        self.index = []
+        self.rows = 0
+        self.closed = False
+        self._clear()
+
+    def _clear(self):
+        self.t = array("d")
+        self.buf = {(sc, m): array("f") for sc in "scp" for m in self.ms[sc]}
+        self._vals = 0
+
+    def append(self, t, summ, cpus, pkgs):
+        rows = (("s", {0: summ}), ("c", cpus), ("p", pkgs))
+        new = [(sc, tbl) for sc,tbl in rows
+               if any(i not in self._sets[sc][0] or not self._sets[sc][1].issuperset(d) for i,d in tbl.items())]
+        if new:
+            self.flush()
+            for sc,tbl in new:
+                ids, ms = self._sets[sc]
+                ids.update(tbl)
+                for d in tbl.values(): ms.update(d)
+                self.ids[sc], self.ms[sc] = sorted(ids), sorted(ms)
+            self._clear()
+        self.t.append(t)
+        for sc,tbl in rows:
+            ds = [tbl.get(i, {}) for i in self.ids[sc]]
+            for m in self.ms[sc]: self.buf[(sc, m)].extend(array("f", [d.get(m, NAN) for d in ds]))
+            self._vals += len(ds)*len(self.ms[sc])
+        if len(self.t) >= TELEMETRY_CHUNK_ROWS or self._vals >= TELEMETRY_CHUNK_VALUES: self.flush()
+
+    def flush(self):
+        n = len(self.t)
+        if not n: return
+        keys = list(self.buf)
+        topo = {str(c): list(self.topo[c]) for c in self.ids["c"] if c in self.topo}
+        meta = json.dumps({"blocks": [[s, m, self.ids[s] if s != "s" else []] for s,m in keys], "topo": topo}).encode()
+        off = self.f.tell()
+        meta += b" "*(-(off + _CHUNK.size + len(meta)) % 8)
+        self.f.write(_CHUNK.pack(b"CHNK", n, len(meta)) + meta)
+        self.f.write(_le(self.t, "d"))
+        for k in keys: self.f.write(_le(self.buf[k], "f"))
+        self.f.flush()
+        self.index.append([off, n, self.t[0], self.t[-1]])
+        self.rows += n
+        self._clear()
+
+    def close(self):
+        if self.closed: return self
+        self.flush()
+        off = self.f.tell()
+        self.f.write(json.dumps({"rows": self.rows, "chunks": self.index}).encode() + _TAIL.pack(off, TELEMETRY_TAIL))
+        self.f.close()
+        self.closed = True
+        return self
+
+    def abort(self):
+        try: self.f.close()
+        except OSError: pass
+
+class TelemetryReader(object):
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(TELEMETRY_MAGIC) or f.read(len(TELEMETRY_MAGIC)) != TELEMETRY_MAGIC:
+                raise ValueError(f"{path}: not a telemetry file")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        end, offs = size, None
+        if size >= len(TELEMETRY_MAGIC) + _TAIL.size:
+            ioff, tag = _TAIL.unpack_from(self.mm, size - _TAIL.size)
+            if tag == TELEMETRY_TAIL and ioff < size:
+                try:
+                    offs = [c[0] for c in json.loads(self.mm[ioff:size - _TAIL.size].decode())["chunks"]]
+                    end = ioff
+                except ValueError: offs = None
+        self.complete = offs is not None
+        self.chunks = []
+        off = len(TELEMETRY_MAGIC)
+        for o in (offs if offs is not None else itertools.repeat(None)):
+            ch = self._chunk(o if o is not None else off, end)
+            if ch is None: break
+            self.chunks.append(ch)
+            off = ch["end"]
+        self.rows = sum(ch["n"] for ch in self.chunks)
+
+    def _chunk(self, off, end):
+        if off + _CHUNK.size > end: return None
+        tag, n, ml = _CHUNK.unpack_from(self.mm, off)
+        if tag != b"CHNK": return None
+        try: meta = json.loads(self.mm[off + _CHUNK.size:off + _CHUNK.size + ml].decode())
+        except ValueError: return None
+        p = off + _CHUNK.size + ml
+        ch = {"n": n, "t": p, "blocks": [], "topo": {int(c): tuple(v) for c,v in meta.get("topo", {}).items()}}
+        p += 8*n
+        for s,m,ids in meta["blocks"]:
+            ch["blocks"].append((s, m, ids, p))
+            p += 4*n*max(1, len(ids))
+        if p > end: return None
+        ch["end"] = p
+        return ch
+
+    def _arr(self, code, off, cnt):
+        mv = memoryview(self.mm)[off:off + cnt*array(code).itemsize]
+        if sys.byteorder == "little": return mv.cast(code)
+        a = array(code, mv.tobytes()); a.byteswap()
+        return a
+
+    def f64(self, off, cnt): return self._arr("d", off, cnt)
+    def f32(self, off, cnt): return self._arr("f", off, cnt)
+
+    def close(self):
+        try: self.mm.close()
+        except BufferError: pass            # 還有 memoryview 在外面用，交給 GC
+
+def load_telemetry(path, cpu_metrics=None, matrix=None):
+    # 欄式檔 → Tstat（與 parse_turbostat 同介面）；matrix 的 per-CPU 區塊整塊寫進 CpuMatrix，不逐值處理
+    rd = TelemetryReader(path)
+    ts = Tstat(cpu_metrics=cpu_metrics)
+    def put(table, m, vals, i0):
+        col = table.get(m)
+        if col is None: col = table[m] = array("f")
+        if len(col) < i0: col.extend(array("f", [NAN])*(i0 - len(col)))
+        col.frombytes(memoryview(vals).cast("B"))
+    for ch in rd.chunks:
+        n, i0 = ch["n"], len(ts.t)
+        t = rd.f64(ch["t"], n)
+        ts.t.frombytes(memoryview(t).cast("B"))
+        ts.topo.update(ch["topo"])
+        summ = {m for s,m,_,_ in ch["blocks"] if s == "s"}
+        mx = {}
+        for s,m,ids,off in ch["blocks"]:
+            if m not in ts.header: ts.header.append(m)
+            if s == "c":
+                for i in ids: ts.cpu.setdefault(i, {})     # metric 被濾掉也要記下這顆 CPU（len(ts.cpu) 與 parse_turbostat 一致）
+            if s == "s":
+                put(ts.summary, m, rd.f32(off, n), i0)
+            elif s == "c" and matrix is not None and m in matrix.metrics:
+                mx[m] = (ids, rd.f32(off, n*len(ids)))
+            elif s == "p" or cpu_metrics is None or m in cpu_metrics:
+                blk, w = rd.f32(off, n*len(ids)), len(ids)
+                tables = ts.pkg if s == "p" else ts.cpu
+                for j,i in enumerate(ids): put(tables.setdefault(i, {}), m, array("f", blk[j::w].tolist()), i0)
+        if matrix is not None:
+            matrix.topo.update(ch["topo"])
+            matrix.extend(t, mx, [m for m in mx if m not in summ])
+    ts._n = len(ts.t)
+    rd.close()
+    ts.finish()
+    if matrix is not None:
+        matrix.close()
+        ts.matrix = matrix
+    return ts
+
+# ====== 內建頻率取樣（無 turbostat 時） ======
+# 優先讀 /dev/cpu/N/msr 的 APERF/MPERF/TSC（與 turbostat 同公式），msr 打不開或讀不到 APERF 就退回
+# cpufreq scaling_cur_freq + /proc/stat。單一 thread、fd 預先開好、每次取樣不 fork。
+# 輸出成 turbostat 相容文字（Time_Of_Day_Seconds/CPU/Avg_MHz/Busy%/Bzy_MHz），直接餵 parse_turbostat()。
+FREQ_SAMPLER_DEFAULT = "auto"           # auto（無 turbostat 才用）/ msr / cpufreq / off
+MSR_TSC, MSR_MPERF, MSR_APERF = 0x10, 0xE7, 0xE8
+
+def parse_cpulist(s):
+    out = []
+    for part in (s or "").strip().split(","):
+        if not part: continue
+        if "-" in part:
+            a,b = part.split("-", 1); out.extend(range(int(a), int(b)+1))
+        else: out.append(int(part))
+    return out
+
+def online_cpus(cpu_root="/sys/devices/system/cpu"):
+    cpus = parse_cpulist(_read_str(os.path.join(cpu_root, "online")))
+    if cpus: return cpus
+    return sorted(int(d[3:]) for d in os.listdir(cpu_root) if re.match(r"cpu\d+$", d)) if os.path.isdir(cpu_root) else []
+
+class FreqSampler(threading.Thread):
+    def __init__(self, out_file, interval=TSTAT_INTERVAL, mode="auto", cpus=None,
+                 cpu_root="/sys/devices/system/cpu", msr_root="/dev/cpu", proc_stat="/proc/stat"):
+        super().__init__(name="freq-sampler", daemon=True)
+        self.out_file = out_file
+        self.interval = max(0.1, float(interval))
+        self.cpus = list(cpus) if cpus is not None else online_cpus(cpu_root)
+        self.proc_stat = proc_stat
+        self.fds = {}
+        self.last = {}                          # 最近一次取樣：cpu -> (Avg_MHz, Busy%, Bzy_MHz)
+        self._stop_ev = threading.Event()
+        self.mode = None
+        if mode in ("auto", "msr"):
+            try:
+                for c in self.cpus: self.fds[c] = os.open(os.path.join(msr_root, str(c), "msr"), os.O_RDONLY)
+                for fd in self.fds.values(): self._rdmsr(fd, MSR_APERF)     # VM / 沒有 APERF 的機器 open 會過但 pread 回 EIO
+                self.mode = "msr"
+            except OSError:
+                self._close()
+                if mode == "msr": raise
+        if self.mode is None:
+            for c in self.cpus:
+                p = os.path.join(cpu_root, f"cpu{c}", "cpufreq", "scaling_cur_freq")
+                try: self.fds[c] = os.open(p, os.O_RDONLY)
+                except OSError: pass
+            if not self.fds: raise OSError("no msr or cpufreq interface")
+            self.cpus = sorted(self.fds)
+            self.stat_fd = os.open(proc_stat, os.O_RDONLY)
+            self.mode = "cpufreq"
+
+    def _close(self):
+        for fd in self.fds.values(): os.close(fd)
+        self.fds = {}
+
+    def _read_msr(self):
+        out = {}
+        for c,fd in self.fds.items():
+            try: out[c] = tuple(self._rdmsr(fd, r) for r in (MSR_APERF, MSR_MPERF, MSR_TSC))
+            except OSError: pass
+        return out
+
+    def _rdmsr(self, fd, reg):
+        # msr 裝置：offset 即 MSR 編號，一次讀 8 bytes（假樹測試可覆寫此方法）
+        return int.from_bytes(os.pread(fd, 8, reg), "little")
+
+    def _read_stat(self):
+        out, buf = {}, b""
+        while True:
+            chunk = os.pread(self.stat_fd, 65536, len(buf))
+            if not chunk: break
+            buf += chunk
+        for ln in buf.decode("ascii", "ignore").splitlines():
+            if not ln.startswith("cpu") or ln.startswith("cpu "): continue
+            f = ln.split()
+            try: v = [int(x) for x in f[1:]]
+            except ValueError: continue
+            idle = v[3] + (v[4] if len(v) > 4 else 0)
+            out[int(f[0][3:])] = (sum(v[:8]) - idle, sum(v[:8]))
+        return out
+
+    def _read_cpufreq(self):
+        out = {}
+        for c,fd in self.fds.items():
+            try: out[c] = int(os.pread(fd, 32, 0))/1000.0
+            except (OSError, ValueError): pass
+        return out
+
+    def _sample(self, prev, cur, dt):
+        rows = {}
+        if self.mode == "msr":
+            for c,(a1,m1,t1) in cur.items():
+                if c not in prev: continue
+                a0,m0,t0 = prev[c]
+                da, dm, dtsc = (a1-a0) % (1<<64), (m1-m0) % (1<<64), (t1-t0) % (1<<64)
+                if not dtsc: continue
+                rows[c] = (da/dt/1e6, 100.0*dm/dtsc, (dtsc/dt/1e6)*da/dm if dm else 0.0)
+        else:
+            (mhz, st1), st0 = cur, prev[1]
+            for c,f in mhz.items():
+                b1,t1 = st1.get(c, (0,0)); b0,t0 = st0.get(c, (0,0))
+                busy = 100.0*(b1-b0)/(t1-t0) if t1 > t0 else 0.0
+                rows[c] = (f*busy/100.0, busy, f)
+        return rows
+
+    def _snapshot(self):
+        if self.mode == "msr": return self._read_msr()
+        return self._read_cpufreq(), self._read_stat()
+
+    def run(self):
+        label_thread(self.name)
+        with open(self.out_file, "w", encoding="utf-8") as out:
+            out.write("Time_Of_Day_Seconds\tCPU\tAvg_MHz\tBusy%\tBzy_MHz\n")
+            prev, tp = self._snapshot(), time.monotonic()
+            try:
+                while not self._stop_ev.wait(self.interval):
+                    cur, t = self._snapshot(), time.monotonic()
+                    rows = self._sample(prev, cur, t - tp)
+                    prev, tp = cur, t
+                    if not rows: continue
+                    self.last = rows
+                    tod = f"{time.time():.3f}"
+                    n = len(rows)
+                    avg = [sum(r[i] for r in rows.values())/n for i in range(3)]
+                    buf = [f"{tod}\t-\t{avg[0]:.0f}\t{avg[1]:.2f}\t{avg[2]:.0f}\n"]
+                    buf += [f"{tod}\t{c}\t{r[0]:.0f}\t{r[1]:.2f}\t{r[2]:.0f}\n" for c,r in sorted(rows.items())]
+                    out.write("".join(buf)); out.flush()
+            finally:
+                self._close()
+                if self.mode == "cpufreq": os.close(self.stat_fd)
+
+    def stop(self):
+        self._stop_ev.set()
+        self.join(timeout=self.interval + 5)
+
+# ====== 報告圖表：降採樣 + 壓縮編碼 ======
+# 每條序列做 min/max envelope（每個 bucket 保留最低與最高點，峰值與降頻谷底不會被抹平），
+# 以 base64 Float32 內嵌；多個解析度層級讓 zoom 進去時仍有細節。
+CHART_LEVELS = (1500, 15000)            # 各層 bucket 數（資料點比這少就直接用原始點）
+CHART_COLORS = ("#3b82f6","#ef4444","#10b981","#f59e0b","#8b5cf6","#64748b")
+
+def downsample_minmax(t, v, buckets):
+    pts = [(t[i], v[i]) for i in range(min(len(t), len(v))) if v[i] == v[i]]
+    n = len(pts)
+    if n <= 2*buckets: return array("f", (p[0] for p in pts)), array("f", (p[1] for p in pts))
+    to, vo = array("f"), array("f")
+    for b in range(buckets):
+        seg = pts[b*n//buckets:(b+1)*n//buckets]
+        if not seg: continue
+        lo = min(range(len(seg)), key=lambda i: seg[i][1]); hi = max(range(len(seg)), key=lambda i: seg[i][1])
+        for i in sorted({lo, hi}):
+            to.append(seg[i][0]); vo.append(seg[i][1])
+    return to, vo
+
+def b64f32(a):
+    a = array("f", a)
+    if sys.byteorder != "little": a.byteswap()
+    return base64.b64encode(a.tobytes()).decode("ascii")
+
+def chart_series(name, t, v):
+    levels, seen = [], 0
+    for bk in CHART_LEVELS:
+        to, vo = downsample_minmax(t, v, bk)
+        if len(to) <= seen: break
+        levels.append({"n": len(to), "t": b64f32(to), "v": b64f32(vo)})
+        seen = len(to)
+        if len(to) < 2*bk: break           # 已是原始點，更細的層沒意義
+    return {"name": name, "levels": levels} if levels else None
+
+def load_rapl_csv(fp):
+    # 串流讀 rapl_*.csv → (t, {欄名: array})
+    t, cols = array("d"), {}
+    if not fp or not os.path.exists(fp): return t, cols
+    with open(fp, "r", encoding="utf-8", errors="ignore") as f:
+        head = f.readline().strip().split(",")[1:]
+        for h in head: cols[h] = array("f")
+        for ln in f:
+            parts = ln.strip().split(",")
+            if len(parts) != len(head) + 1: continue
+            try: vals = [float(x) for x in parts]
+            except ValueError: continue
+            t.append(vals[0])
+            for h,x in zip(head, vals[1:]): cols[h].append(x)
+    return t, cols
+
+def build_charts(tstat, rapl_csv=None):
+    charts = []
+    def add(title, unit, items):
+        ser = [s for s in (chart_series(n, t, v) for n,t,v in items if v is not None) if s]
+        if ser: charts.append({"title": title, "unit": unit, "series": ser})
+    add("Frequency", "MHz", [(m, tstat.t, tstat.series(m)) for m in ("Avg_MHz","Bzy_MHz")])
+    rt, rc = load_rapl_csv(rapl_csv)
+    if rc:
+        add("Power (RAPL)", "W", [(k if k != "package_total_W" else "package total", rt, c) for k,c in rc.items()])
+    else:
+        add("Power (turbostat)", "W", [(m, tstat.t, tstat.series(m)) for m in ("PkgWatt","CorWatt","RAMWatt")])
+    add("Temperature", "°C", [(m, tstat.t, tstat.series(m)) for m in ("PkgTmp","CoreTmp")])
+    if len(tstat.pkg) > 1:
+        add("Temperature by package", "°C", [(f"pkg{p}", tstat.t, d.get("PkgTmp")) for p,d in sorted(tstat.pkg.items())])
+    add("Utilization", "%", [("Busy%", tstat.t, tstat.series("Busy%"))])
+    return charts
+
+# Per-CPU heatmap：時間切 bucket、每格取平均後量化成 1 byte（0 = 無資料），粗細兩層；
+# 瀏覽器只拿到預先聚合好的層，86400 × 512 的原始格子不進 HTML。
+HEATMAP_LEVELS = (480, 3840)            # 各層時間 bucket 數
+HEATMAP_MAX_CELLS = 2000000             # 最細層 bucket × CPU 上限
+HEATMAP_SLOW_N = 10
+
+def heatmap(mx, metric):
+    n, k = mx.rows, len(mx.cpus or ())
+    if not n or not k: return None
+    data = mx.open(metric)
+    nb = max(1, min(n, HEATMAP_LEVELS[-1], HEATMAP_MAX_CELLS // k))
+    sums, cnts = [], []                 # 最細層：每個 bucket 各 CPU 的總和 / 有效樣本數
+    for b in range(nb):
+        r0, r1 = b*n//nb, (b+1)*n//nb
+        blk = data[r0*k:r1*k]
+        if np is not None:
+            blk = np.asarray(blk).reshape(r1 - r0, k)
+            ok = blk == blk
+            sums.append(array("d", np.where(ok, blk, 0).sum(0).tolist())); cnts.append(array("L", ok.sum(0).tolist()))
+        else:
+            s, c = array("d"), array("L")
+            for j in range(k):
+                vs = [v for v in blk[j::k] if v == v]
+                s.append(sum(vs)); c.append(len(vs))
+            sums.append(s); cnts.append(c)
+    tot_s, tot_c, lo_c = array("d", bytes(8*k)), array("L", [0]*k), [None]*k
+    for s, c in zip(sums, cnts):
+        for j in range(k):
+            if c[j]:
+                tot_s[j] += s[j]; tot_c[j] += c[j]
+                v = s[j]/c[j]
+                if lo_c[j] is None or v < lo_c[j]: lo_c[j] = v
+    vals = [v for v in lo_c if v is not None]
+    if not vals: return None
+    lo = min(vals)
+    hi = max(max(s[j]/c[j] for s, c in zip(sums, cnts) for j in range(k) if c[j]), lo + 1e-6)
+    order = sorted(range(k), key=lambda j: (mx.topo[mx.cpus[j]], mx.cpus[j]))    # package → core → cpu
+    levels, prev = [], 0
+    for L in HEATMAP_LEVELS:
+        m = min(L, nb)
+        if m <= prev: continue
+        prev = m
+        ts, d = array("f"), bytearray(m*k)
+        for i in range(m):
+            f0, f1 = i*nb//m, (i+1)*nb//m
+            ts.append(mx.t[f0*n//nb])
+            if f1 - f0 == 1: sv, cv = sums[f0], cnts[f0]
+            else: sv, cv = [sum(x) for x in zip(*sums[f0:f1])], [sum(x) for x in zip(*cnts[f0:f1])]
+            for oi, j in enumerate(order):
+                if cv[j]: d[i*k + oi] = 1 + int(round((sv[j]/cv[j] - lo) / (hi - lo) * 254))
+        levels.append({"n": m, "t": b64f32(ts), "d": base64.b64encode(bytes(d)).decode("ascii")})
+    means = {j: tot_s[j]/tot_c[j] for j in range(k) if tot_c[j]}
+    med = sorted(means.values())[len(means)//2]
+    slow = [{"cpu": mx.cpus[j], "pkg": mx.topo[mx.cpus[j]][0], "core": mx.topo[mx.cpus[j]][1],
+             "mean": round(means[j], 1), "min": round(lo_c[j], 1),
+             "delta_pct": round((means[j] - med) / med * 100, 1) if med else 0.0}
+            for j in sorted(means, key=means.get)[:HEATMAP_SLOW_N]]
+    pk, pkgs = {}, []                   # 每個 package：最細層 bucket 的平均時序（畫 Frequency by package）
+    for j in range(k): pk.setdefault(mx.topo[mx.cpus[j]][0], []).append(j)
+    for p, js in sorted(pk.items()):
+        tc = sum(tot_c[j] for j in js)
+        if not tc: continue
+        pt, pv = array("f"), array("f")
+        for b in range(nb):
+            c = sum(cnts[b][j] for j in js)
+            if c:
+                pt.append(mx.t[b*n//nb]); pv.append(sum(sums[b][j] for j in js)/c)
+        pkgs.append({"pkg": p, "cpus": len(js), "mean": round(sum(tot_s[j] for j in js)/tc, 1),
+                     "min": round(min(pv), 1), "max": round(max(pv), 1), "series": chart_series(f"pkg{p}", pt, pv)})
+    return {"metric": metric, "unit": "%" if metric.endswith("%") else "MHz", "lo": lo, "hi": hi, "t1": mx.t[-1],
+            "cpus": [mx.cpus[j] for j in order], "topo": [list(mx.topo[mx.cpus[j]]) for j in order],
+            "levels": levels, "slow": slow, "pkgs": pkgs}
+
+def build_heatmaps(mx):
+    return [h for h in (heatmap(mx, m) for m in mx.metrics) if h]
+
+def package_rows(heat, tstat, rsum=None):
+    # 每個 package 一列：頻率 / Busy%（per-CPU 矩陣）、功耗（RAPL package-N，沒有就 turbostat PkgWatt）、溫度（PkgTmp）
+    rows = {}
+    row = lambda p: rows.setdefault(p, {"pkg": p, "cpus": None})
+    for h in heat:
+        key = "mhz" if h["unit"] == "MHz" else "busy"
+        for p in h.get("pkgs", ()):
+            r = row(p["pkg"])
+            r["cpus"], r[key], r[key + "_min"] = p["cpus"], p["mean"], p["min"]
+    for p, d in tstat.pkg.items():
+        for m, avg, peak in (("PkgTmp", "temp_c", "temp_max_c"), ("PkgWatt", "avg_w", "peak_w")):
+            st = col_stats(d.get(m))
+            if st: row(p).update({avg: round(st[0], 2), peak: round(st[2], 2)})
+    for d in (rsum or {}).get("domains", []):
+        m = re.match(r"package-(\d+)$", d["label"])
+        if m and d["top"]: row(int(m.group(1))).update(avg_w=round(d["avg_w"], 2), peak_w=round(d["peak_w"], 2))
+    return [rows[p] for p in sorted(rows)]
+
+def package_imbalance(rows):
+    # 各 package 之間的差距：(最高 − 最低) / 最高；溫度另給 °C 差
+    out = {}
+    for key in ("mhz", "busy", "avg_w", "temp_c"):
+        vs = sorted((r[key], r["pkg"]) for r in rows if r.get(key) is not None)
+        if len(vs) < 2: continue
+        (lo, lp), (hi, hp) = vs[0], vs[-1]
+        out[key] = {"spread_pct": round((hi - lo)/hi*100, 1) if hi else 0.0, "delta": round(hi - lo, 2), "low_pkg": lp, "high_pkg": hp}
+    return out
+
+HEATMAP_JS = r"""var HMs=document.getElementById('hmsel'),HMg=document.getElementById('hmcore'),HMc=document.getElementById('hm'),HMt=document.getElementById('hmtip'),HMcache={},HMrh=1,HMl=null;
+HM.forEach(function(h){h.levels.forEach(function(l){l.t=dec(l.t);var b=atob(l.d),u=new Uint8Array(b.length);for(var i=0;i<b.length;i++)u[i]=b.charCodeAt(i);l.d=u;if(l.n){T0=Math.min(T0,l.t[0]);T1=Math.max(T1,h.t1)}});
+  var o=document.createElement('option');o.textContent=h.metric+' ('+h.unit+')';HMs.appendChild(o)});
+function hmRGB(q){if(!q)return [238,238,238];var x=(q-1)/254,lo=x<.5,a=lo?[220,38,38]:[245,158,11],b=lo?[245,158,11]:[22,163,74],f=lo?x*2:x*2-1;
+  return [a[0]+(b[0]-a[0])*f,a[1]+(b[1]-a[1])*f,a[2]+(b[2]-a[2])*f]}
+function hmRows(h,core){var rows=[],key={};
+  h.cpus.forEach(function(c,i){var p=h.topo[i],k=core?p[0]+':'+p[1]:c;if(!(k in key)){key[k]=rows.length;rows.push({ix:[],pkg:p[0],core:p[1],cpus:[]})}var r=rows[key[k]];r.ix.push(i);r.cpus.push(c)});
+  return rows}
+function hmImg(h,l,core){
+  var key=h.metric+'|'+l.n+'|'+core;if(HMcache[key])return HMcache[key];
+  var rows=hmRows(h,core),k=h.cpus.length,cv=document.createElement('canvas');cv.width=l.n;cv.height=rows.length;
+  var cx=cv.getContext('2d'),im=cx.createImageData(l.n,rows.length),p=im.data;
+  rows.forEach(function(r,ri){for(var b=0;b<l.n;b++){var s=0,n=0;for(var j=0;j<r.ix.length;j++){var q=l.d[b*k+r.ix[j]];if(q){s+=q;n++}}
+    var c=hmRGB(n?Math.round(s/n):0),o=4*(ri*l.n+b);p[o]=c[0];p[o+1]=c[1];p[o+2]=c[2];p[o+3]=255}});
+  cx.putImageData(im,0,0);return HMcache[key]={cv:cv,rows:rows}}
+function drawHM(){
+  var h=HM[HMs.selectedIndex],f=(view[1]-view[0])/Math.max(1e-9,T1-T0),l=h.levels[0];h.levels.forEach(function(x){if(x.n*f<=2400)l=x});HMl=l;
+  var g=hmImg(h,l,HMg.checked),R=g.rows.length,rh=HMrh=Math.max(1,Math.min(14,Math.floor(600/R))),Hh=R*rh,a=view[0],b=view[1];
+  function X(t){return pL+(t-a)*(W-pL-pR)/Math.max(1e-9,b-a)}
+  HMc.width=W;HMc.height=Hh+pB;var cx=HMc.getContext('2d'),i0=Math.max(0,lb(l.t,a)-1),i1=Math.max(i0+1,lb(l.t,b)),e=i1<l.n?l.t[i1]:h.t1;
+  cx.imageSmoothingEnabled=false;cx.save();cx.beginPath();cx.rect(pL,0,W-pL-pR,Hh);cx.clip();
+  cx.drawImage(g.cv,i0,0,i1-i0,R,X(l.t[i0]),0,Math.max(1,X(e)-X(l.t[i0])),Hh);cx.restore();
+  cx.font='11px sans-serif';cx.fillStyle='#666';cx.strokeStyle='#333';
+  var last=null;g.rows.forEach(function(r,ri){if(r.pkg===last)return;last=r.pkg;if(ri){cx.beginPath();cx.moveTo(pL,ri*rh);cx.lineTo(W-pR,ri*rh);cx.stroke()}cx.fillText('pkg'+r.pkg,4,ri*rh+11)});
+  for(var k=0;k<=4;k++){var t=a+(b-a)*k/4;cx.fillText(Math.round(t-T0)+'s',X(t)-12,Hh+16)}
+  document.getElementById('hmleg').innerHTML='<span style="color:#dc2626">■</span> '+h.lo.toFixed(0)+' '+h.unit+' … <span style="color:#16a34a">■</span> '+h.hi.toFixed(0)+' '+h.unit+' · '+R+(HMg.checked?' cores':' CPUs')}
+HMc.addEventListener('mousemove',function(ev){
+  if(!HMl)return;var h=HM[HMs.selectedIndex],g=hmImg(h,HMl,HMg.checked),r=HMc.getBoundingClientRect(),x=(ev.clientX-r.left)*W/r.width,row=g.rows[Math.floor((ev.clientY-r.top)*HMc.height/r.height/HMrh)];
+  if(!row||x<pL){HMt.textContent='';return}
+  var t=view[0]+(x-pL)*(view[1]-view[0])/(W-pL-pR),b=Math.max(0,lb(HMl.t,t)-1),s=0,n=0,k=h.cpus.length;
+  row.ix.forEach(function(i){var q=HMl.d[b*k+i];if(q){s+=q;n++}});
+  HMt.textContent='cpu '+row.cpus.join(',')+' (pkg '+row.pkg+', core '+row.core+') @ '+Math.round(t-T0)+'s: '+(n?(h.lo+(s/n-1)/254*(h.hi-h.lo)).toFixed(0)+' '+h.unit:'n/a')});
+HMc.addEventListener('dblclick',function(){view=[T0,T1];redraw()});
+HMs.onchange=HMg.onchange=function(){drawHM()};
+if(HM.length)document.getElementById('heatwrap').style.display='';
+"""
+
+def pkg_line(r):
+    f = lambda k, fmt: format(r[k], fmt) if r.get(k) is not None else "n/a"
+    return (f"freq avg={f('mhz', '.0f')} min={f('mhz_min', '.0f')} MHz | busy {f('busy', '.1f')}% | "
+            f"power avg={f('avg_w', '.1f')} peak={f('peak_w', '.1f')} W | temp avg={f('temp_c', '.0f')} max={f('temp_max_c', '.0f')} °C")
+
+def imbalance_line(imb):
+    names = {"mhz": "freq", "busy": "busy", "avg_w": "power", "temp_c": "temp"}
+    return ", ".join(f"{names[k]} {v['delta']:.1f} °C (pkg{v['low_pkg']} coolest)" if k == "temp_c" else
+                     f"{names[k]} {v['spread_pct']:.1f}% (pkg{v['low_pkg']} lowest)" for k,v in imb.items())
+
+def make_html(run_dir, duration, gov, profile, ptu_bin, avgW, charts, rapl=None, verdict=None, reasons=(), heat=(), pkgs=(), eff=None,
+              ovh=None, hk=()):
     html = os.path.join(run_dir, "Albert_Overview.html")
-    js = "var data=" + json.dumps(trend) + ";"
+    fh = next((h for h in heat if h["unit"] == "MHz" and len(h.get("pkgs", ())) > 1), None)
+    if fh:
+        charts = list(charts) + [{"title": "Frequency by package", "unit": "MHz", "series": [p["series"] for p in fh["pkgs"] if p["series"]]}]
+    heat = [dict(h, pkgs=[{k:v for k,v in p.items() if k != "series"} for p in h.get("pkgs", ())]) for h in heat]
+    js = ("var CH=" + json.dumps(charts, separators=(",",":")) + ",COL=" + json.dumps(CHART_COLORS) +
+          ",HM=" + json.dumps(list(heat), separators=(",",":")) + ";").replace("</", "<\\/")     # 標籤裡的 </script> 不能提早結束 script
+    slow = next((h["slow"] for h in heat if h["unit"] == "MHz"), [])
     tpl = f"""<!doctype html><meta charset="utf-8"><title>Albert Overview – PTU CPU Verify</title>
 <style>
 body{{font-family:system-ui,Segoe UI,Roboto,"Noto Sans",Arial,sans-serif;background:#fafafa;color:#222;margin:24px}}
 .card{{background:#fff;border-radius:16px;box-shadow:0 6px 20px rgba(0,0,0,.08);padding:20px;max-width:980px}}
-h1{{font-size:20px;margin:0 0 12px}}
+h1{{font-size:20px;margin:0 0 12px}}h2{{font-size:15px;margin:16px 0 6px}}
 table{{border-collapse:collapse;width:100%;margin-top:6px}}td{{padding:8px 10px;border-bottom:1px solid #eee;vertical-align:top}}
 td.k{{color:#555;width:180px}}.badge{{display:inline-block;padding:2px 8px;border-radius:999px;background:#eef}}
-svg{{width:100%;height:260px;background:#fcfcff;border:1px solid #eee;border-radius:12px}}
-.axis text{{font-size:11px;fill:#666}}.path{{fill:none;stroke:#3b82f6;stroke-width:2}}
+svg{{width:100%;height:220px;background:#fcfcff;border:1px solid #eee;border-radius:12px;cursor:crosshair;user-select:none}}
+svg text{{font-size:11px;fill:#666}}.path{{fill:none;stroke-width:1.5}}.legend span{{margin-right:14px;font-size:12px}}
+button{{border:1px solid #ddd;background:#fff;border-radius:8px;padding:3px 10px;cursor:pointer}}
 </style>
 <div class="card">
 <h1>PTU CPU Verify — Albert Overview</h1>
 <table>
+{f'<tr><td class="k">Verdict</td><td><span class="badge" style="background:{"#dcfce7" if verdict=="PASS" else "#fee2e2"}">{escape(verdict)}</span> {"<br>".join(escape(r) for r in reasons)}</td></tr>' if verdict else ""}
 <tr><td class="k">Start time</td><td>{now()}</td></tr>
 <tr><td class="k">Duration</td><td>{duration}s</td></tr>
-<tr><td class="k">Governor</td><td>{gov}</td></tr>
-<tr><td class="k">Profile</td><td><span class="badge">{profile}</span></td></tr>
-<tr><td class="k">PTU bin</td><td>{ptu_bin or "&lt;not set&gt;"}</td></tr>
-<tr><td class="k">Avg Power (RAPL)</td><td>{avgW}</td></tr>
-<tr><td class="k">Log folder</td><td>{run_dir}</td></tr>
+<tr><td class="k">Governor</td><td>{escape(str(gov))}</td></tr>
+<tr><td class="k">Profile</td><td><span class="badge">{escape(str(profile))}</span></td></tr>
+<tr><td class="k">PTU bin</td><td>{escape(ptu_bin) if ptu_bin else "&lt;not set&gt;"}</td></tr>
+<tr><td class="k">Avg Power (RAPL)</td><td>{escape(str(avgW))}</td></tr>
+<tr><td class="k">Peak Power (RAPL)</td><td>{f"{rapl['peak_w']:.2f}" if rapl else "N/A"}</td></tr>
+{"".join(f'<tr><td class="k">&nbsp;&nbsp;{escape(d["label"])}</td><td>avg {d["avg_w"]:.2f} W · peak {d["peak_w"]:.2f} W</td></tr>' for d in (rapl or {}).get("domains", []))}
+<tr><td class="k">Log folder</td><td>{escape(run_dir)}</td></tr>
 </table>
-<h1 style="margin-top:18px;">Average Frequency Trend (MHz)</h1>
-<div id="chart"><svg id="svg" viewBox="0 0 900 260" preserveAspectRatio="none"></svg></div>
+{'<h2>Efficiency (perf per watt)</h2><table>' + "".join(f'<tr><td class="k">{escape(k)}</td><td>{escape(v)}</td></tr>' for k,v in efficiency_lines(eff)) + '</table>' if eff else ""}
+{'<h2>Harness overhead (self)</h2><table>' + "".join(f'<tr><td class="k">{escape(k)}</td><td>{escape(v)}</td></tr>' for k,v in overhead_lines(ovh, hk)) + '</table>' if ovh else ""}
+{'<h2>Per package</h2><table>' + "".join(f'<tr><td class="k">pkg {r["pkg"]} ({r["cpus"] or "?"} CPUs)</td><td>{escape(pkg_line(r))}</td></tr>' for r in pkgs) +
+ f'<tr><td class="k">Imbalance</td><td>{escape(imbalance_line(package_imbalance(pkgs)) or "n/a")}</td></tr></table>' if len(pkgs) > 1 else ""}
+<h1 style="margin-top:18px;">Telemetry Trends <button id="reset" style="float:right">Reset zoom</button></h1>
+<div style="color:#777;font-size:12px">拖曳選取區間放大（所有圖同步），雙擊或 Reset zoom 還原。</div>
+<div id="charts"></div>
+<div id="heatwrap" style="display:none">
+<h1 style="margin-top:18px;">Per-CPU Heatmap <select id="hmsel"></select> <label style="font-size:13px;font-weight:normal"><input type="checkbox" id="hmcore"> per core</label></h1>
+<div style="color:#777;font-size:12px">跟著上方曲線的縮放區間；依 package → core 排列，滑鼠移上去看數值。</div>
+<div id="hmtip" style="color:#333;font-size:12px;height:16px"></div>
+<canvas id="hm" style="width:100%;border:1px solid #eee;border-radius:12px;cursor:crosshair"></canvas>
+<div id="hmleg" style="font-size:12px;color:#555"></div>
+{'<h2>Slowest cores</h2><table>' + "".join(f'<tr><td class="k">cpu {c["cpu"]} (pkg {c["pkg"]}, core {c["core"]})</td><td>avg {c["mean"]:.0f} MHz · min {c["min"]:.0f} MHz · {c["delta_pct"]:+.1f}% vs median</td></tr>' for c in slow) + '</table>' if slow else ""}
+</div>
 <div style="color:#777;margin-top:10px;font-size:12px">Generated at {now()}</div>
 </div>
 <script>{js}
-var svg=document.getElementById('svg'),W=900,H=260,pL=50,pR=12,pT=16,pB=28;
-function map(v,a,b,c,d){{return c+(v-a)*(d-c)/(b-a)}}
-function path(pts){{if(!pts.length)return'';var s='M';for(var i=0;i<pts.length;i++)s+=pts[i][0]+','+pts[i][1]+(i?' L':' ');return s}}
-if(data.length>1){{
-  var t0=data[0][0],t1=data[data.length-1][0],y0=data[0][1],y1=y0;
-  for(var i=0;i<data.length;i++){{y0=Math.min(y0,data[i][1]);y1=Math.max(y1,data[i][1]);}}
-  if(y0==y1){{y0=Math.max(0,y0-100);y1=y1+100;}}
-  var pts=[];for(var i=0;i<data.length;i++){{var x=map(data[i][0],t0,t1,pL,W-pR),y=map(data[i][1],y0,y1,H-pB,pT);pts.push([x,y]);}}
-  var p=document.createElementNS('http://www.w3.org/2000/svg','path');p.setAttribute('class','path');p.setAttribute('d',path(pts));svg.appendChild(p);
-  function tx(x,y,t){{var e=document.createElementNS('http://www.w3.org/2000/svg','text');e.setAttribute('x',x);e.setAttribute('y',y);e.textContent=t;svg.appendChild(e)}}
-  function ln(x1,y1,x2,y2){{var e=document.createElementNS('http://www.w3.org/2000/svg','line');e.setAttribute('x1',x1);e.setAttribute('y1',y1);e.setAttribute('x2',x2);e.setAttribute('y2',y2);e.setAttribute('stroke','#ccc');svg.appendChild(e)}}
-  for(var k=0;k<=4;k++){{var v=y0+(y1-y0)*k/4,y=map(v,y0,y1,H-pB,pT);ln(pL,y,W-pR,y);tx(6,y+4,Math.round(v));}}
-  for(var k=0;k<=4;k++){{var tt=Math.round(t0+(t1-t0)*k/4),x=map(tt,t0,t1,pL,W-pR);ln(x,pT,x,H-pB);tx(x-10,H-6,(tt-t0)+'s');}}
-}}else{{var t=document.createElementNS('http://www.w3.org/2000/svg','text');t.setAttribute('x',20);t.setAttribute('y',40);t.textContent='No turbostat data.';svg.appendChild(t);}}
+var NS='http://www.w3.org/2000/svg',W=900,H=220,pL=50,pR=12,pT=14,pB=24,T0=Infinity,T1=-Infinity,view;
+function dec(s){{var b=atob(s),u=new Uint8Array(b.length);for(var i=0;i<b.length;i++)u[i]=b.charCodeAt(i);return new Float32Array(u.buffer)}}
+CH.forEach(function(c){{c.series.forEach(function(s){{s.levels.forEach(function(l){{l.t=dec(l.t);l.v=dec(l.v);if(l.n){{T0=Math.min(T0,l.t[0]);T1=Math.max(T1,l.t[l.n-1]);}}}})}})}});
+{HEATMAP_JS}view=[T0,T1];
+function el(n,a,p){{var e=document.createElementNS(NS,n);for(var k in a)e.setAttribute(k,a[k]);if(p)p.appendChild(e);return e}}
+function lb(a,x){{var lo=0,hi=a.length;while(lo<hi){{var m=(lo+hi)>>1;if(a[m]<x)lo=m+1;else hi=m}}return lo}}
+function pick(s){{var f=(view[1]-view[0])/Math.max(1e-9,T1-T0),best=s.levels[0];s.levels.forEach(function(l){{if(l.n*f<=4000)best=l}});return best}}
+function draw(c){{
+  var svg=c.svg;while(svg.firstChild)svg.removeChild(svg.firstChild);
+  var a=view[0],b=view[1],y0=Infinity,y1=-Infinity,segs=[];
+  c.series.forEach(function(s){{var l=pick(s),i=Math.max(0,lb(l.t,a)-1),j=Math.min(l.n,lb(l.t,b)+1);segs.push([l,i,j]);for(var k=i;k<j;k++){{y0=Math.min(y0,l.v[k]);y1=Math.max(y1,l.v[k])}}}});
+  if(!(y1>=y0)){{el('text',{{x:20,y:40}},svg).textContent='No data in range.';return}}
+  if(y0==y1){{y0-=1;y1+=1}}var pad=(y1-y0)*.05;y0-=pad;y1+=pad;
+  function X(t){{return pL+(t-a)*(W-pL-pR)/Math.max(1e-9,b-a)}}function Y(v){{return H-pB-(v-y0)*(H-pT-pB)/(y1-y0)}}
+  for(var k=0;k<=4;k++){{var v=y0+(y1-y0)*k/4,y=Y(v);el('line',{{x1:pL,y1:y,x2:W-pR,y2:y,stroke:'#eee'}},svg);el('text',{{x:4,y:y+4}},svg).textContent=v.toFixed(v<100?1:0)}}
+  for(var k=0;k<=4;k++){{var t=a+(b-a)*k/4,x=X(t);el('line',{{x1:x,y1:pT,x2:x,y2:H-pB,stroke:'#eee'}},svg);el('text',{{x:x-12,y:H-6}},svg).textContent=Math.round(t-T0)+'s'}}
+  segs.forEach(function(g,si){{var l=g[0],d='';for(var k=g[1];k<g[2];k++)d+=(d?'L':'M')+X(l.t[k]).toFixed(1)+','+Y(l.v[k]).toFixed(1);el('path',{{'class':'path',d:d,stroke:COL[si%COL.length]}},svg)}});
+  c.sel=el('rect',{{x:0,y:pT,width:0,height:H-pT-pB,fill:'rgba(59,130,246,.12)'}},svg);
+}}
+function redraw(){{CH.forEach(draw);if(HM.length)drawHM()}}
+function tAt(c,ev){{var r=c.svg.getBoundingClientRect(),x=(ev.clientX-r.left)*W/r.width;return view[0]+(x-pL)*(view[1]-view[0])/(W-pL-pR)}}
+var host=document.getElementById('charts');
+if(!CH.length&&!HM.length){{host.textContent='No turbostat / telemetry data.'}}
+CH.forEach(function(c){{
+  var h=document.createElement('h2');h.textContent=c.title+' ('+c.unit+')';host.appendChild(h);
+  var lg=document.createElement('div');lg.className='legend';c.series.forEach(function(s,i){{var sp=document.createElement('span');sp.style.color=COL[i%COL.length];sp.textContent='■ '+s.name;lg.appendChild(sp)}});host.appendChild(lg);
+  c.svg=el('svg',{{viewBox:'0 0 '+W+' '+H,preserveAspectRatio:'none'}},host);
+  var s0=null;
+  c.svg.addEventListener('mousedown',function(e){{s0=tAt(c,e)}});
+  c.svg.addEventListener('mousemove',function(e){{if(s0===null)return;var r=c.svg.getBoundingClientRect(),x0=pL+(s0-view[0])*(W-pL-pR)/(view[1]-view[0]),x1=(e.clientX-r.left)*W/r.width;c.sel.setAttribute('x',Math.min(x0,x1));c.sel.setAttribute('width',Math.abs(x1-x0))}});
+  c.svg.addEventListener('mouseup',function(e){{if(s0===null)return;var s1=tAt(c,e),a=Math.max(T0,Math.min(s0,s1)),b=Math.min(T1,Math.max(s0,s1));s0=null;if(b-a>(view[1]-view[0])/200)view=[a,b];redraw()}});
+  c.svg.addEventListener('dblclick',function(){{view=[T0,T1];redraw()}});
+}});
+document.getElementById('reset').onclick=function(){{view=[T0,T1];redraw()}};
+redraw();
 </script>
 """
     with open(html, "w", encoding="utf-8") as f: f.write(tpl)
 
+# ====== Perf-per-watt：workload throughput × 同一段時間的能耗 ======
+# throughput：stress-ng --metrics-brief 的 bogo ops（只有總數）、內建 soaker 每核每視窗的 ops、
+# PTU 狀態列的 PTU_OPS_KEY 欄位（速率）。能耗：workload 那段牆鐘時間內 RAPL package 功耗的積分，
+# 沒有 RAPL 用 turbostat PkgWatt。穩定度 = 各視窗 ops/s 與 ops/J 的變異係數（CV %）。
+STRESS_METRIC_RE = re.compile(r"stress-ng:\s+(?:info|metrc):\s+\[\d+\]\s+([a-z][\w-]*)\s+(\d+)\s+(\d+(?:\.\d+)?)\s")
+
+class StressMetrics(object):
+    # 接在 stress-ng 輸出上（proc_stage 的 on_line）：stressor -> (bogo ops, real time s)
+    def __init__(self): self.ops = {}
+
+    def feed(self, line):
+        m = STRESS_METRIC_RE.search(line)
+        if m: self.ops[m.group(1)] = (int(m.group(2)), float(m.group(3)))
+
+    def total(self): return sum(o for o,_ in self.ops.values())
+
+def integrate_step(t, v, a, b):
+    # 每個樣本代表「上一個樣本到它」這段的平均值（RAPL / turbostat 的語意）→ (積分, 有資料的秒數)
+    tot = cov = 0.0
+    i = max(1, bisect.bisect_right(t, a))
+    while i < len(t) and i < len(v):
+        lo, hi = max(t[i-1], a), min(t[i], b)
+        if hi > lo and v[i] == v[i]:
+            tot += v[i]*(hi - lo); cov += hi - lo
+        if t[i] >= b: break
+        i += 1
+    return tot, cov
+
+def _cv(xs):
+    xs = [x for x in xs if x == x]
+    if len(xs) < 2: return None
+    m = sum(xs)/len(xs)
+    return (sum((x - m)**2 for x in xs)/(len(xs) - 1))**0.5/m*100 if m else None
+
+def _thru(workload, unit, rate_unit, eff_unit, t0, t1, shards, ops, series=(), per_cpu=()):
+    tot = sum(ops.values())
+    if not tot or t1 <= t0: return None
+    return {"workload": workload, "unit": unit, "rate_unit": rate_unit, "eff_unit": eff_unit, "t0": t0, "t1": t1,
+            "cpus": sum(len(sh["cpus"]) for sh in shards), "ops": tot, "shards": ops, "series": list(series), "per_cpu": list(per_cpu)}
+
+def stress_throughput(mets, shards, t0, t1):
+    return _thru("stress-ng", "bogo-ops", "bogo-ops/s", "bogo-ops/J", t0, t1, shards,
+                 {sh["name"]: mets[sh["name"]].total() for sh in shards})
+
+def soak_throughput(res, shards):
+    # 各核的視窗以 index 對齊（worker 幾乎同時起跑），加總成整體 ops/s 時序：(視窗結束時間, 視窗秒數, ops/s)
+    if not res: return None
+    win, t0 = res[0]["win"], min(r["t0"] for r in res)
+    n = max(len(r["wins"]) for r in res)
+    series = [(t0 + (i+1)*win, win, sum(r["wins"][i] for r in res if i < len(r["wins"]))/win) for i in range(n)]
+    u = SOAK_UNITS.get(res[0]["kernel"], "ops")
+    return _thru("soaker", u, f"{u}/s", f"{u}/J", t0, max(r["t0"] + r["wall_s"] for r in res), shards,
+                 {sh["name"]: sum(r["ops"] for r in res if r["cpu"] in set(sh["cpus"])) for sh in shards},
+                 series, [(r["cpu"], r["ops_s"]) for r in res])
+
+def ptu_throughput(status, shards, t0, t1):
+    # PTU 的數值是速率：總量 = 在 workload 時段內積分；多個 shard 取各自最新值相加成一條時序
+    keys = {st.ops_key for st in status.values() if st.ops}
+    if len(keys) != 1: return None
+    key = keys.pop()
+    ops = {}
+    for sh in shards:
+        o = status[sh["name"]].ops
+        tot, cov = integrate_step(array("d", (x for x,_ in o)), array("d", (y for _,y in o)), t0, t1)
+        ops[sh["name"]] = tot/cov*(t1 - t0) if cov else 0.0
+    last, series, tp = {}, [], t0
+    for t,name,v in sorted((t, name, v) for name,st in status.items() for t,v in st.ops):
+        last[name] = v
+        if len(last) == len(status) and t > tp:
+            series.append((t, t - tp, sum(last.values()))); tp = t
+    return _thru("ptu", key, key, f"{key}/W", t0, t1, shards, ops, series)
+
+def power_series(rapl_csv=None, rapl_wall0=None, tstat=None, tstat_wall0=None):
+    # → (來源, 牆鐘時間軸, package 總功耗 W, {package: W})
+    rt, rc = load_rapl_csv(rapl_csv)
+    if rc.get("package_total_W") and rapl_wall0 is not None:
+        pk = {int(k.split("-")[1]): c for k,c in rc.items() if re.match(r"package-\d+$", k)}
+        return "RAPL", array("d", (x + rapl_wall0 for x in rt)), rc["package_total_W"], pk
+    pw = tstat.series("PkgWatt") if tstat is not None else None
+    if pw and tstat_wall0 is not None:
+        pk = {p: d["PkgWatt"] for p,d in tstat.pkg.items() if d.get("PkgWatt")}
+        return "turbostat PkgWatt", array("d", (x + tstat_wall0 for x in tstat.t)), pw, pk
+    return None
+
+def perf_per_watt(thru, pw=None, origin=0.0):
+    if not thru: return None
+    a, b = thru["t0"], thru["t1"]
+    dur, ops = b - a, thru["ops"]
+    def avg_w(v, lo, hi):
+        e, cov = integrate_step(pw[1], v, lo, hi)
+        return e/cov if cov >= 0.5*(hi - lo) and e > 0 else None     # 功耗樣本蓋不到一半的時段不算
+    eff = {k: thru[k] for k in ("workload", "unit", "rate_unit", "eff_unit", "cpus", "ops")}
+    eff.update(window_s=round(dur, 1), ops_s=ops/dur, ops_s_per_cpu=ops/dur/max(1, thru["cpus"]),
+               power_source=None, avg_w=None, energy_j=None, ops_j=None)
+    w = avg_w(pw[2], a, b) if pw else None
+    if w:
+        eff.update(power_source=pw[0], avg_w=round(w, 2), energy_j=round(w*dur, 1), ops_j=ops/(w*dur))
+    rates = [r for _,_,r in thru["series"]]
+    effs = []
+    if w:
+        for t,win,r in thru["series"]:
+            ww = avg_w(pw[2], t - win, t)
+            effs.append(r/ww if ww else NAN)
+    eff["stability"] = {"windows": len(rates), "ops_s_cv_pct": _cv(rates), "ops_s_min": min(rates) if rates else None,
+                        "ops_s_max": max(rates) if rates else None, "ops_j_cv_pct": _cv(effs)}
+    eff["shards"] = []
+    shards = thru["shards"] if len(thru["shards"]) > 1 else {}
+    for name,o in sorted(shards.items()):
+        m = re.match(r"pkg(\d+)$", name)
+        sw = avg_w(pw[3][int(m.group(1))], a, b) if pw and m and int(m.group(1)) in pw[3] else None
+        eff["shards"].append({"name": name, "ops_s": o/dur, "ops_j": o/(sw*dur) if sw else None, "avg_w": round(sw, 2) if sw else None})
+    pc = sorted(thru["per_cpu"], key=lambda x: x[1])
+    eff["per_cpu"] = {"min": pc[0], "median": pc[len(pc)//2], "max": pc[-1]} if pc else None
+    eff["series"] = (array("f", (t - origin for t,_,_ in thru["series"])), array("f", rates), array("f", effs))
+    return eff
+
+def efficiency_lines(eff):
+    # (標題, 內容)；Overview.txt 與 HTML 共用
+    if not eff: return []
+    g = lambda v: "n/a" if v is None else f"{v:.4g}"
+    st, pc = eff["stability"], eff["per_cpu"]
+    out = [("Workload", f"{eff['workload']} ({eff['unit']}), {eff['window_s']:.0f} s window, {eff['cpus']} CPUs"),
+           ("Throughput", f"{g(eff['ops_s'])} {eff['rate_unit']} ({g(eff['ops_s_per_cpu'])} per CPU); " +
+            (f"CV {st['ops_s_cv_pct']:.1f}% over {st['windows']} windows, min {g(st['ops_s_min'])}" if st["ops_s_cv_pct"] is not None
+             else "stability n/a (totals only)")),
+           ("Energy", f"avg {eff['avg_w']:.1f} W, {eff['energy_j']:.0f} J ({eff['power_source']})" if eff["avg_w"]
+            else "n/a (no RAPL / PkgWatt during the workload)"),
+           ("Efficiency", "n/a" if eff["ops_j"] is None else
+            f"{g(eff['ops_j'])} {eff['eff_unit']}" + (f"; CV {st['ops_j_cv_pct']:.1f}%" if st["ops_j_cv_pct"] is not None else ""))]
+    if pc:
+        out.append(("Per CPU", f"min {g(pc['min'][1])} (cpu{pc['min'][0]}) · median {g(pc['median'][1])} · max {g(pc['max'][1])} (cpu{pc['max'][0]}) {eff['rate_unit']}"))
+    out += [(s["name"], f"{g(s['ops_s'])} {eff['rate_unit']}" + (f", {g(s['ops_j'])} {eff['eff_unit']} at {s['avg_w']:.1f} W" if s["ops_j"] else ""))
+            for s in eff["shards"]]
+    return out
+
+def efficiency_charts(eff):
+    if not eff or not len(eff["series"][0]): return []
+    t, r, e = eff["series"]
+    out = []
+    for title, unit, v in (("Throughput", eff["rate_unit"], r), ("Efficiency", eff["eff_unit"], e)):
+        s = chart_series(eff["workload"], t, v) if len(v) else None
+        if s: out.append({"title": title, "unit": unit, "series": [s]})
+    return out
+
+# ====== sysinfo：並行收集（以 boot_id 快取） ======
+# 每個 collector 一個 thread、各自有 timeout；能直接讀 /proc、/sys 就不 fork。
+# 同一次開機內不會變的（lscpu / dmidecode / cpuinfo / numactl…）快取在 LOG_BASE/.sysinfo_cache/<boot_id>/，
+# campaign 的後續步驟與同一次開機的重跑直接複製。只快取成功的結果（沒裝、rc≠0、timeout 下次都重試），
+# 快取目錄的 index.json 記每筆的來源狀態，不在 index 裡的檔案不算快取。背景執行，不擋 workload 開跑。
+SYSINFO_TIMEOUT_S_DEFAULT = 10
+SYSINFO_INDEX = "index.json"
+BOOT_ID = "/proc/sys/kernel/random/boot_id"
+CPU_SYS = "/sys/devices/system/cpu"
+NODE_SYS = "/sys/devices/system/node"
+DMI_SYS = "/sys/class/dmi/id"
+SYSINFO_CMDS = (        # (輸出檔, 指令, 可快取)
+    ("lscpu.txt", "lscpu", True),
+    ("dmidecode.txt", "dmidecode -t bios -t system -t processor -t memory", True),
+    ("numactl.txt", "numactl --hardware", True),
+    ("cpupower.txt", "cpupower frequency-info", False),
+)
+SYSINFO_FILES = (       # (輸出檔, 來源檔, 可快取)
+    ("cpuinfo.txt", ("/proc/cpuinfo",), True),
+    ("kernel.txt", ("/proc/version", "/proc/cmdline", "/etc/os-release"), True),
+    ("meminfo.txt", ("/proc/meminfo",), False),
+    ("modules.txt", ("/proc/modules",), False),
+)
+
+def run_timeout(cmd, timeout):
+    p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         universal_newlines=True, start_new_session=True)
+    try:
+        o,e = p.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        try: os.killpg(p.pid, signal.SIGKILL)
+        except OSError: pass
+        p.communicate()
+        return None, "", "timeout"
+    return p.returncode, o, e
+
+def _group_cpus(rows):
+    # {cpu: 描述} → 相同描述的 CPU 合併成 cpulist
+    out = {}
+    for c in sorted(rows): out.setdefault(rows[c], []).append(c)
+    lines = []
+    for desc, cs in out.items():
+        rng, a = [], cs[0]
+        for x, y in zip(cs, cs[1:] + [None]):
+            if y != x + 1:
+                rng.append(str(a) if a == x else f"{a}-{x}")
+                a = y
+        lines.append(f"cpu {','.join(rng)}: {desc}\n")
+    return "".join(lines)
+
+def sys_cpufreq(root=CPU_SYS):
+    rows = {}
+    for c in online_cpus(root):
+        d = os.path.join(root, f"cpu{c}", "cpufreq")
+        rows[c] = " ".join(f"{k}={_read_str(os.path.join(d, k), '-')}" for k in
+                           ("scaling_driver", "scaling_governor", "scaling_min_freq", "scaling_max_freq", "cpuinfo_max_freq"))
+    extra = "".join(f"{p}={_read_str(os.path.join(root, p), '-')}\n" for p in
+                    ("intel_pstate/status", "intel_pstate/no_turbo", "intel_pstate/min_perf_pct",
+                     "intel_pstate/max_perf_pct", "cpufreq/boost", "smt/active"))
+    return _group_cpus(rows) + extra
+
+def sys_numa(root=NODE_SYS):
+    nodes = sorted(int(x[4:]) for x in os.listdir(root) if re.match(r"node\d+$", x)) if os.path.isdir(root) else []
+    out = []
+    for n in nodes:
+        mt = re.search(r"MemTotal:\s+(\d+)", _read_str(os.path.join(root, f"node{n}", "meminfo")))
+        out.append(f"node{n}: cpus={_read_str(os.path.join(root, f'node{n}', 'cpulist'), '-')} "
+                   f"mem_kB={mt.group(1) if mt else '-'} distance={_read_str(os.path.join(root, f'node{n}', 'distance'), '-')}\n")
+    return "".join(out)
+
+def sys_powercap(root=RAPL_ROOT):
+    out = []
+    for z in rapl_zones(root):
+        d = os.path.dirname(z["energy"])
+        cons = []
+        for i in itertools.count():
+            name = _read_str(os.path.join(d, f"constraint_{i}_name"))
+            if not name: break
+            cons.append(f"{name}={int(_read_str(os.path.join(d, f'constraint_{i}_power_limit_uw'), '0') or 0)/1e6:g}W"
+                        f"/{_read_str(os.path.join(d, f'constraint_{i}_time_window_us'), '-')}us")
+        out.append(f"{z['label']}: enabled={_read_str(os.path.join(d, 'enabled'), '-')} {' '.join(cons)}\n")
+    return "".join(out)
+
+def sys_dmi(root=DMI_SYS):
+    return "".join(f"{k}={_read_str(os.path.join(root, k), '-')}\n" for k in
+                   ("sys_vendor", "product_name", "board_name", "bios_vendor", "bios_version", "bios_date"))
+
+SYSINFO_FUNCS = (       # (輸出檔, 函式, 可快取)
+    ("cpufreq.txt", sys_cpufreq, False),
+    ("numa.txt", sys_numa, True),
+    ("powercap.txt", sys_powercap, False),
+    ("dmi.txt", sys_dmi, True),
+)
+
+def sysinfo_facts(d):
+    # 報告要用的重點欄位（從剛收集的檔案再取，不重讀系統）
+    def rd(name):
+        try:
+            with open(os.path.join(d, name), encoding="utf-8", errors="replace") as f: return f.read()
+        except OSError: return ""
+    def kv(text, key):
+        m = re.search(rf"^{re.escape(key)}\s*[:=]\s*(.*)$", text, re.M)
+        return m.group(1).strip() if m else None
+    cpuinfo, dmi, kern, cf = rd("cpuinfo.txt"), rd("dmi.txt"), rd("kernel.txt"), rd("cpufreq.txt")
+    m = re.search(r"^cpu [\d,-]+: scaling_driver=(\S+) scaling_governor=(\S+)", cf, re.M)
+    osr = re.search(r'^PRETTY_NAME="?([^"\n]*)', kern, re.M)
+    return {"cpu_model": kv(cpuinfo, "model name"), "microcode": kv(cpuinfo, "microcode"),
+            "logical_cpus": len(re.findall(r"^processor\s*:", cpuinfo, re.M)),
+            "kernel": (kern.split() + ["", "", ""])[2] or None, "os": osr.group(1) if osr else None,
+            "bios": " ".join(x for x in (kv(dmi, "bios_version"), kv(dmi, "bios_date")) if x and x != "-") or None,
+            "system": " ".join(x for x in (kv(dmi, "sys_vendor"), kv(dmi, "product_name")) if x and x != "-") or None,
+            "numa_nodes": len(re.findall(r"^node\d+:", rd("numa.txt"), re.M)),
+            "driver": m.group(1) if m and m.group(1) != "-" else None,
+            "governor": m.group(2) if m and m.group(2) != "-" else None}
+
+class SysInfo(threading.Thread):
+    def __init__(self, out_dir, cache_root=None, timeout=SYSINFO_TIMEOUT_S_DEFAULT, log=None):
+        super().__init__(name="sysinfo", daemon=True)
+        self.out_dir, self.timeout, self.log = out_dir, timeout, log
+        boot = _read_str(BOOT_ID)
+        self.cache = os.path.join(cache_root, boot) if cache_root and boot else None
+        self.status, self.facts, self.elapsed = {}, {}, 0.0
+        self.index = {}                         # 快取的 metadata：name -> 收集時的狀態（只有成功的才會進來）
+        self.child_cpu_s = 0.0                  # 這段時間回收的子行程 CPU（lscpu / dmidecode…；近似，期間結束的 workload 也會算進來）
+
+    def _cmd(self, cmd):
+        if not have(cmd.split()[0]): return "", "not installed"
+        rc, o, e = run_timeout(cmd, self.timeout)
+        if rc is None: return "", "timeout"
+        if rc: return o, (e.strip().splitlines() or [f"rc={rc}"])[-1]
+        return o, None
+
+    def _files(self, paths):
+        out = []
+        for p in paths:
+            try:
+                with open(p, encoding="utf-8", errors="replace") as f: out.append(f.read())
+            except OSError: pass
+        return "".join(out), None if out else "unreadable"
+
+    def _one(self, name, fn, cacheable):
+        t0 = time.monotonic()
+        dst = os.path.join(self.out_dir, name)
+        cached = os.path.join(self.cache, name) if cacheable and self.cache else None
+        meta = self.index.get(name)
+        if cached and meta is not None and os.path.exists(cached):
+            shutil.copyfile(cached, dst)
+            return dict(meta, src="cache", s=round(time.monotonic() - t0, 3))
+        try: text, err = fn()
+        except (OSError, ValueError) as e: text, err = "", str(e)
+        with open(dst, "w", encoding="utf-8") as f: f.write(text)
+        st = {"src": "run", "s": round(time.monotonic() - t0, 3)}
+        if err: st["err"] = err
+        elif cached:
+            mkdir_p(self.cache)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f: f.write(text)
+            os.replace(tmp, cached)
+            self.index[name] = {"cached_at": now(), "err": None}
+        return st
+
+    def run(self):
+        from concurrent.futures import ThreadPoolExecutor
+        label_thread(self.name)                 # pool thread 與指令都繼承名稱和綁核
+        t0, ru0 = time.monotonic(), resource.getrusage(resource.RUSAGE_CHILDREN)
+        mkdir_p(self.out_dir)
+        if self.cache and os.path.isdir(os.path.dirname(self.cache)):
+            for old in os.listdir(os.path.dirname(self.cache)):       # 只留這次開機的快取
+                if old != os.path.basename(self.cache): shutil.rmtree(os.path.join(os.path.dirname(self.cache), old), True)
+        if self.cache:
+            try:
+                with open(os.path.join(self.cache, SYSINFO_INDEX), encoding="utf-8") as f: self.index = json.load(f)
+            except (OSError, ValueError): self.index = {}         # 沒有 index（含舊版快取）= 全部重新收集
+        jobs = [(n, (lambda c=c: self._cmd(c)), k) for n, c, k in SYSINFO_CMDS] + \
+               [(n, (lambda p=p: self._files(p)), k) for n, p, k in SYSINFO_FILES] + \
+               [(n, (lambda f=f: (f(), None)), k) for n, f, k in SYSINFO_FUNCS]
+        with ThreadPoolExecutor(max_workers=len(jobs)) as ex:
+            futs = [(n, ex.submit(self._one, n, fn, k)) for n, fn, k in jobs]
+            for n, fu in futs:
+                try: self.status[n] = fu.result()
+                except OSError as e: self.status[n] = {"src": "run", "err": str(e)}
+        if self.cache and self.index:
+            try: _save_state(os.path.join(self.cache, SYSINFO_INDEX), self.index)
+            except OSError: pass
+        self.facts = sysinfo_facts(self.out_dir)
+        self.elapsed = time.monotonic() - t0
+        ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.child_cpu_s = ru.ru_utime + ru.ru_stime - ru0.ru_utime - ru0.ru_stime
+        with open(os.path.join(self.out_dir, "sysinfo.json"), "w", encoding="utf-8") as f:
+            json.dump({"boot_id": _read_str(BOOT_ID), "elapsed_s": round(self.elapsed, 3), "facts": self.facts,
+                       "collectors": self.status}, f, indent=1)
+        if self.log:
+            hit = sum(1 for s in self.status.values() if s.get("src") == "cache")
+            bad = [n for n, s in self.status.items() if s.get("err")]
+            self.log(f"{now()} | [INFO] sysinfo: {len(jobs)} collectors in {self.elapsed:.2f}s ({hit} cached)"
+                     f"{', unavailable: ' + ', '.join(bad) if bad else ''}\n")
+
+# ====== CPU 拓撲與分片（sysfs） ======
+# CORES 選擇器（逗號分隔、可混用）：all、CPU 清單（0-15,32-47）、pkgN / nodeN（可寫範圍 pkg0-1）、smt0（每個 core 的第一個 thread）；
+# 前面加 ^ 表示排除（pkg1,^smt1、^0-1）。SHARD=pkg / node：每個 package / NUMA node 各跑一份綁核的 workload，
+# 有 numactl 就連記憶體一起綁在本地 node（--membind），沒有就 taskset（記憶體靠 first-touch）。
+SHARD_DEFAULT = "none"                  # none / pkg / node
+SHARD_KEYS = {"pkg": "pkg", "node": "node", "smt": "thread"}
+
+def _sysint(s, default):
+    return int(s) if s.isdigit() else default          # -1（VM 常見）或讀不到 → default
+
+def cpu_topology(cpu_root=CPU_SYS, node_root=NODE_SYS):
+    # cpu -> {pkg, die, core, node, thread}；thread = 在 SMT 兄弟中的序號（0 = 第一個）
+    node_of = {}
+    if os.path.isdir(node_root):
+        for d in os.listdir(node_root):
+            if re.match(r"node\d+$", d):
+                for c in parse_cpulist(_read_str(os.path.join(node_root, d, "cpulist"))): node_of[c] = int(d[4:])
+    topo = {}
+    for c in online_cpus(cpu_root):
+        d = os.path.join(cpu_root, f"cpu{c}", "topology")
+        sib = parse_cpulist(_read_str(os.path.join(d, "thread_siblings_list"))) or [c]
+        topo[c] = {"pkg": _sysint(_read_str(os.path.join(d, "physical_package_id")), 0),
+                   "die": _sysint(_read_str(os.path.join(d, "die_id")), 0),
+                   "core": _sysint(_read_str(os.path.join(d, "core_id")), c),
+                   "node": node_of.get(c, 0), "thread": sib.index(c) if c in sib else 0}
+    return topo
+
+def format_cpulist(cpus):
+    out, cs = [], sorted(cpus)
+    for k,g in itertools.groupby(enumerate(cs), lambda x: x[1] - x[0]):
+        g = [c for _,c in g]
+        out.append(str(g[0]) if len(g) == 1 else f"{g[0]}-{g[-1]}")
+    return ",".join(out)
+
+def select_cpus(cores, topo=None):
+    allowed = set(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else set(online_cpus())
+    if cores in ("", "all"): return sorted(allowed)
+    topo = cpu_topology() if topo is None else topo
+    sel = None
+    for tok in cores.replace(" ", "").split(","):
+        if not tok: continue
+        neg, tok = tok.startswith("^"), tok.lstrip("^")
+        m = re.match(r"(pkg|node|smt)(\d+)(?:-(\d+))?$", tok)
+        if tok == "all": cs = allowed
+        elif m:
+            key, lo = SHARD_KEYS[m.group(1)], int(m.group(2))
+            hi = int(m.group(3) or lo)
+            cs = {c for c,t in topo.items() if lo <= t[key] <= hi}
+        elif re.match(r"[\d,-]+$", tok): cs = set(parse_cpulist(tok))
+        else: raise ValueError(f"bad CORES selector: {tok}")
+        if sel is None: sel = set(allowed) if neg else set()
+        sel = sel - cs if neg else sel | cs
+    return sorted((sel or set()) & allowed)
+
+def make_shards(cpus, mode, topo):
+    # [{name, cpus, nodes}]；none → 一份涵蓋全部選到的 CPU
+    if mode in ("", "none"):
+        return [{"name": "all", "cpus": list(cpus), "nodes": sorted({topo[c]["node"] for c in cpus if c in topo})}]
+    if mode not in ("pkg", "node"): raise ValueError(f"bad SHARD: {mode} (none / pkg / node)")
+    groups = {}
+    for c in cpus: groups.setdefault(topo[c][mode] if c in topo else 0, []).append(c)
+    return [{"name": f"{mode}{k}", "cpus": v, "nodes": sorted({topo[c]["node"] for c in v if c in topo})}
+            for k,v in sorted(groups.items())]
+
+def pin_cmd(cmd, cpus, nodes=None):
+    if nodes and have("numactl"):
+        return f"numactl --physcpubind={format_cpulist(cpus)} --membind={','.join(map(str, nodes))} {cmd}"
+    return f"taskset -c {format_cpulist(cpus)} {cmd}"
+
+# ====== Live metrics：本機 HTTP（JSON + Prometheus） ======
+# RunMonitor 每解析完一個樣本就丟進記憶體 ring（加鎖只做 append），HTTP thread 只讀 ring 的快照，
+# 不碰 telemetry 檔、不擋取樣。METRICS_ADDR 空＝不開；只給 port 就只綁 127.0.0.1。
+METRICS_ADDR_DEFAULT = ""               # 例："9109"、"127.0.0.1:9109"、"0.0.0.0:9109"
+METRICS_RING_DEFAULT = 600              # 保留的最近樣本數
+
+class LiveMetrics(object):
+    def __init__(self, ring=METRICS_RING_DEFAULT):
+        self.ring = deque(maxlen=ring)
+        self.state = {"host": socket.gethostname(), "stage": "idle"}
+        self.domains = []
+        self.seq = 0
+        self._lock = threading.Lock()
+
+    def begin(self, domains=(), **info):
+        with self._lock:
+            self.ring.clear()
+            self.domains = list(domains)
+            self.state.update(info, stage="starting", started=time.time(), events=0, verdict=None, rc=None, overhead_pct=None)
+
+    def set(self, **kv):
+        with self._lock: self.state.update(kv)
+
+    def elapsed(self, wall):
+        # 樣本的 t 一律是這次 run 的經過秒數（與 state 的 elapsed_s 同一條軸）
+        st = self.state.get("started")
+        return wall - st if st else 0.0
+
+    def push(self, t, summ, cpus=None, power=None):
+        busy = summ.get("Busy%")
+        if busy is None and cpus:
+            vs = [d["Busy%"] for d in cpus.values() if "Busy%" in d]
+            busy = sum(vs)/len(vs) if vs else None
+        s = {"t": round(t, 3), "avg_mhz": summ.get("Avg_MHz"), "bzy_mhz": summ.get("Bzy_MHz"), "busy_pct": busy,
+             "pkg_temp_c": summ.get("PkgTmp"), "core_temp_c": summ.get("CoreTmp"), "pkg_watt": summ.get("PkgWatt")}
+        if power:
+            s["power_w"] = round(power[2], 3)
+            s["domains_w"] = [round(w, 3) if w == w else None for w in power[1]]
+        with self._lock:
+            self.seq += 1
+            s["seq"] = self.seq
+            self.ring.append(s)
+
+    def snapshot(self, since=0):
+        with self._lock:
+            st, doms = dict(self.state), list(self.domains)
+            rows = [s for s in self.ring if s["seq"] > since]
+        el = time.time() - st["started"] if st.get("started") else None
+        st["elapsed_s"] = round(el, 1) if el is not None else None
+        st["remaining_s"] = round(max(0.0, st["duration"] - el), 1) if el is not None and st.get("duration") else None
+        return {"state": st, "domains": doms, "seq": rows[-1]["seq"] if rows else since, "latest": rows[-1] if rows else None,
+                "samples": rows}
+
+    def prometheus(self):
+        snap = self.snapshot(self.seq - 1 if self.seq else 0)
+        st, s = snap["state"], snap["latest"] or {}
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        base = f'host="{esc(st["host"])}",run="{esc(st.get("ts", ""))}"'
+        out = []
+        def g(name, val, help_, extra=""):
+            if val is None or val != val: return
+            if not out or not out[-1].startswith(f"{name}{{"): out.append(f"# HELP {name} {help_}\n# TYPE {name} gauge")
+            out.append(f"{name}{{{base}{extra}}} {val}")
+        g("ptu_info", 1, "Current run (labels only).", f',stage="{esc(st["stage"])}",profile="{esc(st.get("profile", ""))}"')
+        g("ptu_workload_running", 1 if st["stage"] in ("ptu", "stress-ng", "soaker") else 0, "1 while a workload is running.")
+        g("ptu_elapsed_seconds", st["elapsed_s"], "Seconds since the current step started.")
+        g("ptu_remaining_seconds", st["remaining_s"], "Seconds left of DURATION.")
+        g("ptu_duration_seconds", st.get("duration"), "Configured DURATION.")
+        g("ptu_load_percent", st.get("load"), "Configured LOAD.")
+        g("ptu_events_total", st.get("events"), "Online-analysis events so far.")
+        g("ptu_cpu_frequency_mhz", s.get("avg_mhz"), "CPU frequency (turbostat summary).", ',kind="avg"')
+        g("ptu_cpu_frequency_mhz", s.get("bzy_mhz"), "CPU frequency (turbostat summary).", ',kind="busy"')
+        g("ptu_cpu_busy_percent", s.get("busy_pct"), "CPU utilization.")
+        g("ptu_temperature_celsius", s.get("pkg_temp_c"), "Temperature.", ',sensor="package"')
+        g("ptu_temperature_celsius", s.get("core_temp_c"), "Temperature.", ',sensor="core"')
+        g("ptu_power_watts", s.get("power_w"), "RAPL power.", ',domain="package_total"')
+        for lab, w in zip(snap["domains"], s.get("domains_w") or ()):
+            g("ptu_power_watts", w, "RAPL power.", f',domain="{esc(lab)}"')
+        g("ptu_turbostat_pkg_watts", s.get("pkg_watt"), "Package power reported by turbostat.")
+        g("ptu_harness_cpu_percent", st.get("overhead_pct"), "CPU used by the harness itself (% of one CPU, last interval).")
+        return "\n".join(out) + "\n"
+
+class _LiveHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        u = urllib.parse.urlsplit(self.path)
+        live = self.server.live
+        if u.path == "/metrics":
+            body, ctype = live.prometheus().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        elif u.path in ("/", "/live.json"):
+            try: since = int(urllib.parse.parse_qs(u.query).get("since", ["0"])[0])
+            except ValueError: since = 0
+            body, ctype = json.dumps(live.snapshot(since), separators=(",", ":")).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404); return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *a): pass
+
+class LiveServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def start_live_server(addr, live):
+    host, _, port = addr.rpartition(":")
+    srv = LiveServer((host or "127.0.0.1", int(port)), _LiveHandler)
+    srv.live = live
+    threading.Thread(target=lambda: (label_thread("live-http", pin=False), srv.serve_forever()), name="live-http", daemon=True).start()
+    return srv
+
+# ====== Harness 自身開銷：量自己、守預算 ======
+# 工具跟 workload 用同一批 CPU：每個取樣 thread 開頭 label_thread() 命名（/proc/thread-self/comm，子 thread 與子行程會繼承），
+# 量測期間依名稱累計 /proc/self/task/*（CPU 時間、context switch、I/O），turbostat 等子行程讀 /proc/<pid>，
+# 已結束的 thread 用整個 process 的總量扣掉（exited）。取樣 thread 與 turbostat 綁到 housekeeping CPU
+# （auto：沒被測的 online CPU；全部都在測就不綁）。整個 harness 超過 OVERHEAD_BUDGET_PCT（單顆 CPU 的 %）
+# 就把可調的取樣間隔加倍（最多 ×8），降到預算一半以下再逐步縮回；turbostat 的 --interval 啟動後改不了。
+OVERHEAD_BUDGET_PCT_DEFAULT = 1.0       # 0 = 只量不調
+OVERHEAD_INTERVAL_S = 2.0
+OVERHEAD_MAX_SCALE = 8
+HOUSEKEEPING_CPUS_DEFAULT = "auto"      # auto / off / CPU 清單
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+USAGE_KEYS = ("cpu_s", "vcsw", "ivcsw", "read_b", "write_b", "syscalls")
+_HK = {"cpus": None}                    # 這個 step 的 housekeeping CPU（label_thread 綁核用）
+
+def label_thread(name, pin=True):
+    try:
+        with open("/proc/thread-self/comm", "w") as f: f.write(name[:15])
+    except OSError: pass
+    if pin and _HK["cpus"]:
+        try: os.sched_setaffinity(0, _HK["cpus"])      # 0 = 呼叫的這個 thread
+        except OSError: pass
+
+def housekeeping_cpus(spec, measured, online=None):
+    if spec in ("", "off", "none"): return []
+    online = set(online_cpus() if online is None else online)
+    if spec == "auto": return sorted(online - set(measured))
+    return sorted(set(parse_cpulist(spec)) & online)
+
+def _kv(text):
+    out = {}
+    for ln in text.splitlines():
+        k, _, v = ln.partition(":")
+        try: out[k.strip()] = int(v.split()[0])
+        except (ValueError, IndexError): pass
+    return out
+
+def task_usage(d, kids=False):
+    # d = /proc/self/task/<tid> 或 /proc/<pid>；kids=True 連它已回收的子行程一起算（只有 stat 的 tick 有）。
+    # thread 用 schedstat 的 ns 執行時間：tick 是 10ms 解析度，取樣 thread 一次才幾十 µs
+    st = _read_str(os.path.join(d, "stat"))
+    f = st[st.rfind(")") + 2:].split()
+    try: ticks = int(f[11]) + int(f[12]) + (int(f[13]) + int(f[14]) if kids else 0)
+    except (IndexError, ValueError): return None
+    ss = _read_str(os.path.join(d, "schedstat")).split()
+    cpu = int(ss[0])/1e9 if ss and ss[0].isdigit() and not kids else ticks/CLK_TCK
+    sv, io = _kv(_read_str(os.path.join(d, "status"))), _kv(_read_str(os.path.join(d, "io")))
+    return {"cpu_s": cpu, "vcsw": sv.get("voluntary_ctxt_switches", 0), "ivcsw": sv.get("nonvoluntary_ctxt_switches", 0),
+            "read_b": io.get("rchar", 0), "write_b": io.get("wchar", 0), "syscalls": io.get("syscr", 0) + io.get("syscw", 0)}
+
+def self_usage():
+    # 整個 process（含已結束的 thread）
+    ru, io = resource.getrusage(resource.RUSAGE_SELF), _kv(_read_str("/proc/self/io"))
+    return {"cpu_s": ru.ru_utime + ru.ru_stime, "vcsw": ru.ru_nvcsw, "ivcsw": ru.ru_nivcsw,
+            "read_b": io.get("rchar", 0), "write_b": io.get("wchar", 0), "syscalls": io.get("syscr", 0) + io.get("syscw", 0)}
+
+class OverheadMonitor(threading.Thread):
+    def __init__(self, budget_pct=OVERHEAD_BUDGET_PCT_DEFAULT, interval=OVERHEAD_INTERVAL_S, log=None, live=None):
+        super().__init__(name="overhead", daemon=True)
+        self.budget, self.interval, self.log, self.live = max(0.0, budget_pct), interval, log, live
+        self.adaptive = []                      # (名稱, 物件, 基準 interval)：物件每輪重讀自己的 .interval
+        self.children = {}                      # 名稱 -> pid（turbostat 等 harness 子行程）
+        self.pinned = set()
+        self.scale, self.peak, self.changes = 1, 0.0, []
+        self._kid_last = {}                     # 子行程結束後 /proc 就沒了，留最後一次讀到的
+        self._stop_ev = threading.Event()
+        self._lock = threading.Lock()
+        self.end = None
+        self.begin = self.snapshot()
+        self._tick = (self.begin["t"], self.begin["self"]["cpu_s"])
+
+    def watch(self, name, pid): self.children[name] = pid
+
+    def adapt(self, name, obj):
+        self.adaptive.append((name, obj, obj.interval))
+
+    def snapshot(self):
+        main, tasks = _read_str("/proc/self/comm"), {}
+        try: tids = os.listdir("/proc/self/task")
+        except OSError: tids = []
+        for tid in tids:
+            u = task_usage(f"/proc/self/task/{tid}")
+            if u is None: continue
+            name = _read_str(f"/proc/self/task/{tid}/comm")
+            u["name"] = "main" if name == main else name
+            tasks[tid] = u
+        with self._lock:
+            for name, pid in self.children.items():
+                u = task_usage(f"/proc/{pid}", kids=True)
+                if u: self._kid_last[name] = u
+            kids = {k: dict(v) for k,v in self._kid_last.items()}
+        return {"t": time.monotonic(), "self": self_usage(), "tasks": tasks, "kids": kids}
+
+    def tick(self):
+        snap = self.snapshot()
+        cpu = snap["self"]["cpu_s"] + sum(u["cpu_s"] for u in snap["kids"].values())
+        t0, c0 = self._tick
+        self._tick = (snap["t"], cpu)
+        pct = 100.0*(cpu - c0)/max(1e-6, snap["t"] - t0)
+        self.peak = max(self.peak, pct)
+        if self.live: self.live.set(overhead_pct=round(pct, 3))
+        flush_logs()
+        if not self.budget or not self.adaptive: return
+        if pct > self.budget and self.scale < OVERHEAD_MAX_SCALE: new = self.scale*2
+        elif self.scale > 1 and pct*2 < self.budget*0.8: new = self.scale//2
+        else: return
+        self.scale = new
+        for _, obj, base in self.adaptive: obj.interval = base*new
+        self.changes.append({"t": round(snap["t"] - self.begin["t"], 1), "scale": new, "pct": round(pct, 3)})
+        if self.log:
+            self.log(f"{now()} | [INFO] Harness overhead {pct:.2f}% of a CPU (budget {self.budget:g}%) — sampling intervals ×{new} "
+                     f"({', '.join(f'{n} {o.interval:g}s' for n,o,_ in self.adaptive)})\n")
+
+    def run(self):
+        label_thread("overhead")
+        while not self._stop_ev.wait(self.interval): self.tick()
+        self.end = self.snapshot()              # 自己還活著時拍，才不會被算進 exited
+
+    def stop(self):
+        # 量測窗口到這裡為止（在 turbostat 收掉之前呼叫）
+        self._stop_ev.set()
+        if self.is_alive(): self.join(timeout=self.interval + 5)
+        if self.end is None: self.end = self.snapshot()
+        for _, obj, base in self.adaptive: obj.interval = base
+
+    def summary(self, measured=0, extra=None):
+        b, e = self.begin, self.end or self.snapshot()
+        win = max(1e-6, e["t"] - b["t"])
+        comp = {}
+        def add(name, u1, u0):
+            c = comp.setdefault(name, dict.fromkeys(USAGE_KEYS, 0))
+            for k in USAGE_KEYS: c[k] += u1[k] - (u0[k] if u0 else 0)
+        for tid, u in e["tasks"].items(): add(u["name"], u, b["tasks"].get(tid))
+        live = {k: sum(c[k] for c in comp.values()) for k in USAGE_KEYS}
+        ex = {k: max(0, e["self"][k] - b["self"][k] - live[k]) for k in USAGE_KEYS}
+        if ex["cpu_s"] >= 0.01: comp["exited"] = ex
+        for name, u in e["kids"].items(): add(name, u, b["kids"].get(name))
+        for name, cpu_s in (extra or {}).items():
+            if cpu_s: add(name, dict(dict.fromkeys(USAGE_KEYS, 0), cpu_s=cpu_s), None)
+        rows = []
+        for name, c in sorted(comp.items(), key=lambda x: -x[1]["cpu_s"]):
+            c = {k: max(0, v) for k,v in c.items()}
+            rows.append(dict(c, name=name, cpu_s=round(c["cpu_s"], 3), cpu_pct=round(100.0*c["cpu_s"]/win, 3),
+                             csw_s=round((c["vcsw"] + c["ivcsw"])/win, 2), pinned=name in self.pinned))
+        tot = {k: sum(r[k] for r in rows) for k in USAGE_KEYS}
+        return dict(tot, window_s=round(win, 1), cpu_s=round(tot["cpu_s"], 3), cpu_pct=round(100.0*tot["cpu_s"]/win, 3),
+                    peak_pct=round(self.peak, 3), budget_pct=self.budget, wakeups_s=round(tot["vcsw"]/win, 2),
+                    csw_s=round((tot["vcsw"] + tot["ivcsw"])/win, 2), measured_cpus=measured,
+                    measured_share_pct=round(100.0*sum(r["cpu_s"] for r in rows if not r["pinned"])/win/measured, 4) if measured else None,
+                    scale_max=max([1] + [c["scale"] for c in self.changes]), changes=self.changes, components=rows)
+
+def overhead_lines(ovh, hk=None):
+    # (key, value) 給 txt / html
+    if not ovh: return []
+    st = "within budget" if not ovh["budget_pct"] or ovh["peak_pct"] <= ovh["budget_pct"] else \
+         f"over budget (intervals up to ×{ovh['scale_max']})" if ovh["scale_max"] > 1 else "over budget"
+    out = [("Harness", f"{ovh['cpu_pct']:.3f}% of one CPU ({ovh['cpu_s']:.2f} s CPU over {ovh['window_s']:.0f} s), "
+                       f"peak {ovh['peak_pct']:.2f}%, budget {ovh['budget_pct']:g}% — {st}"),
+           ("Wakeups", f"{ovh['wakeups_s']:.1f}/s voluntary, {ovh['csw_s']:.1f}/s context switches; "
+                       f"I/O read {ovh['read_b']/1e6:.1f} MB, write {ovh['write_b']/1e6:.1f} MB, {ovh['syscalls']} syscalls"),
+           ("Housekeep", f"CPUs {format_cpulist(hk)} (pinned: {', '.join(r['name'] for r in ovh['components'] if r['pinned']) or '-'})"
+                         if hk else "none — harness shares the measured CPUs")]
+    if ovh["measured_share_pct"] is not None:
+        out.append(("On measured", f"≤{ovh['measured_share_pct']:.4f}% of the measured CPUs' time (unpinned components)"))
+    if ovh["changes"]:
+        out.append(("Intervals", ", ".join(f"×{c['scale']} @ {c['t']:.0f}s ({c['pct']:.2f}%)" for c in ovh["changes"])))
+    out += [(r["name"], f"{r['cpu_s']:.2f} s ({r['cpu_pct']:.3f}%), {r['csw_s']:.1f} csw/s, "
+                        f"write {r['write_b']/1e6:.2f} MB{' · pinned' if r['pinned'] else ''}") for r in ovh["components"]]
+    return out
+
 # ====== 主流程 ======
-def main():
-    os.environ["PATH"] = "/usr/sbin:/sbin:" + os.environ.get("PATH","")
+def load_config(env=None):
+    # 允許用環境變數覆寫（沿用 Albert Style）；campaign 每一步也是用合併後的 env 重新算一次
+    env = dict(os.environ if env is None else env)
+    return {
+        "env": env,
+        "log_base": env.get("LOG_BASE", LOG_BASE_DEFAULT),
+        "duration": int(env.get("DURATION", DURATION_DEFAULT)),
+        "load": int(env.get("LOAD", LOAD_DEFAULT)),
+        "governor": env.get("GOVERNOR", GOVERNOR_DEFAULT),   # keep/performance
+        "cores": env.get("CORES", CORES_DEFAULT),             # all、CPU 清單或 pkgN / nodeN 選擇器
+        "shard": env.get("SHARD", SHARD_DEFAULT),
+        "ptu_ops_key": env.get("PTU_OPS_KEY", PTU_OPS_KEY_DEFAULT),
+        "profile": env.get("PROFILE", PROFILE_DEFAULT),
+        "ptu_bin": env.get("PTU_BIN", "") or autodetect_ptu(),
+        "ptu_tpl": env.get("PTU_TEMPLATE", PTU_TEMPLATE_DEFAULT),
+        "rapl_interval": float(env.get("RAPL_INTERVAL", RAPL_INTERVAL_DEFAULT)),
+        "freq_mode": env.get("FREQ_SAMPLER", FREQ_SAMPLER_DEFAULT),
+        "soak_kernel": env.get("SOAK_KERNEL", SOAK_KERNEL_DEFAULT),
+        "sysinfo_cache": env.get("SYSINFO_CACHE", os.path.join(env.get("LOG_BASE", LOG_BASE_DEFAULT), ".sysinfo_cache")),
+        "sysinfo_timeout": float(env.get("SYSINFO_TIMEOUT_S", SYSINFO_TIMEOUT_S_DEFAULT)),
+        "metrics_addr": env.get("METRICS_ADDR", METRICS_ADDR_DEFAULT),
+        "telemetry_bin": env.get("TELEMETRY_BIN", "1") not in ("0", "off", "no"),
+        "package": env.get("PACKAGE_COMPRESS", PACKAGE_COMPRESS_DEFAULT),
+        "housekeeping": env.get("HOUSEKEEPING_CPUS", HOUSEKEEPING_CPUS_DEFAULT),
+        "overhead_budget": float(env.get("OVERHEAD_BUDGET_PCT", OVERHEAD_BUDGET_PCT_DEFAULT)),
+    }
 
-    # 允許用環境變數覆寫（沿用 Albert Style）
-    log_base = os.environ.get("LOG_BASE", LOG_BASE_DEFAULT)
-    duration = int(os.environ.get("DURATION", DURATION_DEFAULT))
-    load = int(os.environ.get("LOAD", LOAD_DEFAULT))
-    governor = os.environ.get("GOVERNOR", GOVERNOR_DEFAULT)   # keep/performance
-    cores = os.environ.get("CORES", CORES_DEFAULT)             # all 或 start-end
-    profile = os.environ.get("PROFILE", PROFILE_DEFAULT)
-    ptu_bin = os.environ.get("PTU_BIN", "") or autodetect_ptu()
-    ptu_tpl = os.environ.get("PTU_TEMPLATE", PTU_TEMPLATE_DEFAULT)
+def check_selection(cfg):
+    # CORES / SHARD 寫錯或選不到 CPU：開跑前就停，不要等到 workload 才發現
+    try:
+        topo = cpu_topology()
+        cpus = select_cpus(cfg["cores"], topo)
+        make_shards(cpus, cfg["shard"], topo)
+    except ValueError as e:
+        raise SystemExit(f"[FAIL] {e}")
+    if not cpus: raise SystemExit(f"[FAIL] CORES={cfg['cores']} selects no online CPU")
 
-    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    run_dir = os.path.join(log_base, f"run_{ts}")
-    for sub in ("", "sysinfo", "telemetry", "workload"): mkdir_p(os.path.join(run_dir, sub))
+_TERM = threading.Event()               # 收尾階段收到 SIGTERM：記下來，campaign 不再開下一步
 
-    console_log = os.path.join(run_dir, f"console_{ts}.log")
+def _on_term_late(signum, frame): _TERM.set()
+
+def setup_host(cfg, log):
+    # 整個 run / campaign 只做一次：governor、RAPL zone 探索
+    shared = {"restore_gov": False, "zones": rapl_zones(),
+              "orig_gov": _read_str("/sys/devices/system/cpu/cpu0/cpufreq/scaling_governor") or "ondemand"}
+    if cfg["governor"] == "performance" and have("cpupower"):
+        run("cpupower frequency-set -g performance")
+        shared["restore_gov"] = True
+        log(f"{now()} | [INFO] Governor set to performance\n")
+    else:
+        log(f"{now()} | [INFO] Keeping current governor settings\n")
+    if cfg["metrics_addr"]:
+        shared["live"] = LiveMetrics()
+        try:
+            shared["live_srv"] = start_live_server(cfg["metrics_addr"], shared["live"])
+            h, p = shared["live_srv"].server_address[:2]
+            log(f"{now()} | [INFO] Live metrics: http://{h}:{p}/metrics (Prometheus), /live.json (JSON)\n")
+        except (OSError, ValueError) as e:
+            log(f"{now()} | [WARN] Live metrics server not started ({cfg['metrics_addr']}): {e}\n")
+    return shared
+
+def restore_host(shared, log):
+    srv = shared.pop("live_srv", None)
+    if srv:
+        srv.shutdown(); srv.server_close()
+    if shared["restore_gov"] and have("cpupower"):
+        run(f"cpupower frequency-set -g {shared['orig_gov']}")
+        shared["restore_gov"] = False
+        log(f"{now()} | [INFO] Restored governor to {shared['orig_gov']}\n")
+
+# 打包：tar 串流進多執行緒壓縮器（zstd -T0 → pigz → 單執行緒 gzip），先寫 .part 再改名，history 不會讀到半個檔
+PACKAGE_COMPRESS_DEFAULT = "auto"       # auto / zstd / pigz / gzip / off
+
+def package_dir(path, log, mode=PACKAGE_COMPRESS_DEFAULT):
+    if mode == "off": return None
+    tool = next((m for m in ("zstd", "pigz") if mode in ("auto", m) and have(m)), "gzip")
+    out = f"{path}.tar.zst" if tool == "zstd" else f"{path}.tar.gz"
+    comp = {"zstd": ["zstd", "-T0", "-3", "-q", "-c"], "pigz": ["pigz", "-c"], "gzip": ["gzip", "-c"]}[tool]
+    t0 = time.monotonic()
+    with open(out + ".part", "wb") as fo:
+        tar = subprocess.Popen(["tar", "-C", os.path.dirname(path), "-cf", "-", os.path.basename(path)], stdout=subprocess.PIPE)
+        cp = subprocess.Popen(comp, stdin=tar.stdout, stdout=fo)
+        tar.stdout.close()
+        rc = cp.wait(), tar.wait()
+        rc = rc[0] or rc[1]
+    if rc:
+        os.remove(out + ".part")
+        log(f"{now()} | [WARN] Packaging failed ({tool} rc={rc}) — results left in {path}\n")
+        return None
+    os.replace(out + ".part", out)
+    log(f"{now()} | [PASS] Results packaged: {out} ({os.path.getsize(out)/1e6:.1f} MB, {tool}, {time.monotonic() - t0:.1f}s)\n")
+    return out
+
+def write_header(console_log, cfg, run_dir):
     for line in [
         "========== PTU CPU Verify — Setup ==========\n",
         f"{now()} | [INFO] Script           : PTU_CPU_Verify.py (Albert v1.3.1)\n",
         f"{now()} | [INFO] Start            : {now()}\n",
-        f"{now()} | [INFO] Duration         : {duration}s\n",
-        f"{now()} | [INFO] Governor choice  : {governor}\n",
-        f"{now()} | [INFO] Cores            : {cores}\n",
+        f"{now()} | [INFO] Duration         : {cfg['duration']}s\n",
+        f"{now()} | [INFO] Governor choice  : {cfg['governor']}\n",
+        f"{now()} | [INFO] Cores            : {cfg['cores']}\n",
         f"{now()} | [INFO] Log dir          : {run_dir}\n",
-        f"{now()} | [INFO] PTU bin          : {ptu_bin or '<not set>'}\n",
-        f"{now()} | [INFO] Profile          : {profile}\n",
+        f"{now()} | [INFO] PTU bin          : {cfg['ptu_bin'] or '<not set>'}\n",
+        f"{now()} | [INFO] Profile          : {cfg['profile']}\n",
     ]: plain_write(console_log, line)
 
-    # Governor
-    restore_gov = False
-    if governor == "performance" and have("cpupower"):
-        run("cpupower frequency-set -g performance")
-        restore_gov = True
-        plain_write(console_log, f"{now()} | [INFO] Governor set to performance\n")
-    else:
-        plain_write(console_log, f"{now()} | [INFO] Keeping current governor settings\n")
-
-    # RAPL
-    rapl_files = []
-    for root,_,files in os.walk("/sys/class/powercap"):
-        for fn in files:
-            if fn == "energy_uj": rapl_files.append(os.path.join(root, fn))
-    def rapl_sum(files):
-        s=0
-        for f in files:
-            try: s += int(open(f).read().strip())
-            except: pass
-        return s
-    rapl_start = rapl_sum(rapl_files) if rapl_files else None
-    if not rapl_files:
-        plain_write(console_log, f"{now()} | [WARN] No RAPL energy_uj files found — avg power will be skipped.\n")
-
-    # turbostat
-    tstat_out = os.path.join(run_dir, "telemetry", f"turbostat_{ts}.txt")
-    tproc = start_turbostat(tstat_out, duration)
-    if tproc: plain_write(console_log, f"{now()} | [INFO] turbostat PID={tproc.pid}\n")
-    else:     plain_write(console_log, f"{now()} | [WARN] turbostat not found in PATH.\n")
-
-    # workload（依序降級）
-    work_log = os.path.join(run_dir, "workload", f"run_{ts}.txt")
-    with open(work_log, "w", encoding="utf-8") as wf:
-        wf.write(f"# Start: {now()}\n# Profile: {profile}\n")
-
-    def run_aff(cmd):
-        cmd2 = cmd if cores=="all" else f"taskset -c {cores} {cmd}"
-        return run(cmd2)
-
-    rc=127
-    if ptu_bin and os.path.exists(ptu_bin):
-        cmd = build_ptu_cmd(profile, ptu_bin, load, duration, ptu_tpl if profile=="custom" else None)
-        with open(work_log,"a",encoding="utf-8") as wf: wf.write(f"$ {cmd}\n")
-        rc,_,_ = run_aff(cmd)
-        plain_write(console_log, f"{now()} | [{'PASS' if rc==0 else 'WARN'}] PTU/PTAT rc={rc}\n")
-
-    if rc!=0 and have("stress-ng"):
-        cmd = f"stress-ng --cpu {detect_cpu_total()} --cpu-method matrixprod --timeout {duration}s --metrics-brief --verify"
-        with open(work_log,"a",encoding="utf-8") as wf: wf.write(f"$ {cmd}\n")
-        rc,_,_ = run_aff(cmd)
-        plain_write(console_log, f"{now()} | [{'PASS' if rc==0 else 'WARN'}] stress-ng rc={rc}\n")
-
-    if rc!=0:
-        procs=[]
-        for _ in range(detect_cpu_total()):
-            procs.append(subprocess.Popen(f"bash -lc 'timeout {duration}s yes > /dev/null'", shell=True))
-        for p in procs: p.wait()
-        rc = 0
-        plain_write(console_log, f"{now()} | [PASS] CPU soaker completed.\n")
-
-    # 等 turbostat
-    if tproc:
-        plain_write(console_log, f"{now()} | [INFO] Waiting turbostat (PID={tproc.pid})…\n")
-        try: tproc.wait(timeout=duration+15)
-        except: pass
-
-    # RAPL 平均功耗
-    avgW = "N/A"
-    if rapl_start is not None and rapl_files:
-        rapl_end = rapl_sum(rapl_files)
-        delta = max(0, rapl_end - rapl_start)
-        avgW = f"{(delta/1_000_000)/max(1,duration):.2f}"
-        with open(os.path.join(run_dir,"telemetry","rapl_summary.txt"),"w") as f:
-            f.write(f"duration_s={duration}\nenergy_delta_uj={delta}\navg_power_W={avgW}\n")
-        plain_write(console_log, f"{now()} | [INFO] Average package power (RAPL): {avgW} W\n")
-
-    # Overview
-    trend = parse_trend(tstat_out)
-    with open(os.path.join(run_dir,"Albert_Overview.txt"),"w",encoding="utf-8") as f:
-        f.write(f"""==== PTU CPU Verify — Albert Overview (TXT) ====
-Start time : {now()}
-Duration   : {duration}s
-Governor   : {governor}
-Profile    : {profile}
-PTU bin    : {ptu_bin or "<not set>"}
-Log folder : {run_dir}
+# ====== 單一步驟：asyncio 監督 workload / telemetry / 報告 ======
+# 一個 event loop 同時看 workload 降級鏈、turbostat、報告輸出；每個 stage 有 timeout。
+# SIGTERM / SIGINT（GUI Stop、Ctrl-C、fail-fast）只有一條取消路徑：取消 workload task →
+# 對每個子進程 group 送 SIGTERM（逾時 SIGKILL）→ 停 telemetry → 照常出報告；governor 由外層 finally 還原。
+WORKLOAD_GRACE_S_DEFAULT = 120          # workload 超過 DURATION 這麼久還沒結束 → 整個 group kill
+TELEMETRY_STOP_S = 10                   # workload 結束後等 turbostat 收尾的上限
+REPORT_TIMEOUT_S = 600
+KILL_WAIT_S = 5
+
+class StepRunner(object):
+    def __init__(self, cfg, run_dir, ts, shared, loop):
+        self.cfg, self.run_dir, self.ts, self.shared, self.loop = cfg, run_dir, ts, shared, loop
+        self.console_log = os.path.join(run_dir, f"console_{ts}.log")
+        self.work_log = os.path.join(run_dir, "workload", f"run_{ts}.txt")
+        self.tstat_out = os.path.join(run_dir, "telemetry", f"turbostat_{ts}.txt")
+        self.procs = {}
+        self.aborted = False
+        self.soak_stop = multiprocessing.Event()
+        self.main_task = None
+        self.rapl = self.fsamp = self.mon = self.tstat_task = None
+        self.heat, self.slow, self.pkgs = [], (None, []), []
+        self.thru = self.eff = None            # workload throughput → perf-per-watt
+        self.tel_wall0 = None
+        self.live = shared.get("live")
+        self.sysinfo = SysInfo(os.path.join(run_dir, "sysinfo"),
+                               None if cfg["sysinfo_cache"] in ("", "0", "off") else cfg["sysinfo_cache"],
+                               cfg["sysinfo_timeout"], log=self.log)
+        self.grace = max(0, int(cfg["env"].get("WORKLOAD_GRACE_S", WORKLOAD_GRACE_S_DEFAULT)))
+        self.topo = cpu_topology()
+        self.cpus = select_cpus(cfg["cores"], self.topo)
+        self.shards = make_shards(self.cpus, cfg["shard"], self.topo)
+        self.shard_rc = {sh["name"]: [] for sh in self.shards}     # 每個 shard：[(workload, rc), ...]
+        self.hk = housekeeping_cpus(cfg["housekeeping"], self.cpus)
+        self.ovh = self.ovh_sum = None
+
+    def log(self, s): plain_write(self.console_log, s)
+
+    # ---- 子進程 ----
+    def _killpg(self, p, sig=signal.SIGTERM):
+        try: os.killpg(p.pid, sig)
+        except OSError: pass
+
+    async def _pump(self, p, log_fp, on_line, prefix=""):
+        if log_fp:
+            with open(log_fp, "a", encoding="utf-8") as f:
+                buf = b""
+                while True:
+                    chunk = await p.stdout.read(65536)
+                    if not chunk: break
+                    parts = re.split(rb"\r\n|\r|\n", buf + chunk)
+                    buf = parts.pop()
+                    for raw in parts:
+                        ln = strip_ansi(raw.decode("utf-8", "replace")) + "\n"
+                        f.write(prefix + ln)
+                        if on_line: on_line(ln)
+                    f.flush()
+                if buf: f.write(prefix + strip_ansi(buf.decode("utf-8", "replace")) + "\n")
+        return await p.wait()
+
+    async def proc_stage(self, name, cmd, timeout, log_fp=None, on_line=None, prefix=""):
+        # workload 輸出邊產生邊寫進 log（記憶體固定）；新 session，取消/逾時時整個 group 一起收
+        pipe = asyncio.subprocess.PIPE if log_fp else asyncio.subprocess.DEVNULL
+        err = asyncio.subprocess.STDOUT if log_fp else asyncio.subprocess.DEVNULL
+        p = await asyncio.create_subprocess_shell(cmd, stdout=pipe, stderr=err, start_new_session=True)
+        self.procs[name] = p
+        if name == "turbostat" and self.ovh: self.ovh.watch(name, p.pid)
+        try:
+            return await asyncio.wait_for(self._pump(p, log_fp, on_line, prefix), timeout)
+        except asyncio.TimeoutError:
+            self.log(f"{now()} | [WARN] {name} exceeded {timeout}s — killing process group.\n")
+            await self._reap(p)
+            return 124
+        except asyncio.CancelledError:
+            await self._reap(p)
+            raise
+        finally:
+            self.procs.pop(name, None)
+
+    async def _reap(self, p, sig=signal.SIGTERM):
+        self._killpg(p, sig)
+        try: await asyncio.wait_for(p.wait(), KILL_WAIT_S)
+        except asyncio.TimeoutError:
+            self._killpg(p, signal.SIGKILL)
+            await p.wait()
+
+    def _on_signal(self):
+        _TERM.set()
+        if self.main_task and not self.main_task.done():
+            self.aborted = True
+            self.log(f"{now()} | [WARN] Run aborted by signal — stopping workload and telemetry.\n")
+            self.main_task.cancel()
+
+    # ---- telemetry ----
+    def start_telemetry(self):
+        cfg, run_dir, ts = self.cfg, self.run_dir, self.ts
+        self.tel_wall0 = time.time()
+        zones = self.shared["zones"]
+        if zones:
+            try:
+                self.rapl = RaplSampler(zones, cfg["rapl_interval"], os.path.join(run_dir, "telemetry", f"rapl_{ts}.csv"))
+                self.rapl.start()
+                self.log(f"{now()} | [INFO] RAPL sampler: {len(zones)} zones @ {self.rapl.interval}s ({', '.join(z['label'] for z in zones)})\n")
+            except OSError as e:
+                self.log(f"{now()} | [WARN] RAPL open failed: {e}\n")
+        if not self.rapl:
+            self.log(f"{now()} | [WARN] No RAPL energy_uj files found — avg power will be skipped.\n")
+
+        freq_mode = cfg["freq_mode"]
+        tcmd = turbostat_cmd(self.tstat_out, cfg["duration"]) if freq_mode in ("auto", "off") else None
+        if tcmd:
+            if self.hk and have("taskset"): tcmd = pin_cmd(tcmd, self.hk)
+            self.tstat_task = asyncio.ensure_future(self.proc_stage("turbostat", tcmd, cfg["duration"] + self.grace))
+            self.log(f"{now()} | [INFO] turbostat started\n")
+        elif freq_mode == "auto":
+            self.log(f"{now()} | [WARN] turbostat not found in PATH.\n")
+        if not tcmd and freq_mode != "off":
+            self.tstat_out = os.path.join(run_dir, "telemetry", f"freq_{ts}.txt")
+            try:
+                self.fsamp = FreqSampler(self.tstat_out, mode="auto" if freq_mode == "auto" else freq_mode)
+                self.fsamp.start()
+                self.log(f"{now()} | [INFO] Built-in frequency sampler: {self.fsamp.mode}, {len(self.fsamp.cpus)} CPUs\n")
+            except (OSError, ValueError) as e:
+                self.log(f"{now()} | [WARN] Built-in frequency sampler unavailable: {e}\n")
+
+        store = None
+        if cfg["telemetry_bin"] and (tcmd or self.fsamp):
+            try: store = TelemetryStore(os.path.join(run_dir, "telemetry", f"telemetry_{ts}.ptc"))
+            except OSError as e: self.log(f"{now()} | [WARN] Telemetry store not created: {e}\n")
+        acfg = analysis_config(cfg["env"])
+        an = Analyzer(acfg, self.cpus, cfg["load"], rapl_pl1_w(zones) if self.rapl else None)
+        self.mon = RunMonitor(self.tstat_out, an, self.rapl, log=self.log, live=self.live, store=store, wall0=self.tel_wall0)
+        self.mon.start()
+        for name, obj in (("monitor", self.mon), ("rapl", self.rapl), ("freq", self.fsamp)):
+            if obj: self.ovh.adapt(name, obj)
+        self.ovh.start()
+        self.log(f"{now()} | [INFO] Online analysis: warmup {acfg['warmup_s']}s, drop {acfg['freq_drop_pct']}%/{acfg['sustain_s']}s, "
+                 f"temp {acfg['temp_limit_c']}°C, fail-fast {'ON' if acfg['failfast'] else 'off'}\n")
+
+    async def stop_telemetry(self):
+        self.ovh.stop()                         # 量測窗口到 workload 結束為止
+        _HK["cpus"] = None
+        if self.rapl: self.rapl.stop()
+        if self.fsamp: self.fsamp.stop()
+        if self.tstat_task and not self.tstat_task.done():
+            # workload 已結束：不再等滿 DURATION，SIGINT 讓 turbostat 正常收尾
+            p = self.procs.get("turbostat")
+            if p: self._killpg(p, signal.SIGINT)
+            try: await asyncio.wait_for(asyncio.shield(self.tstat_task), TELEMETRY_STOP_S)
+            except asyncio.TimeoutError:
+                self.tstat_task.cancel()
+                await asyncio.gather(self.tstat_task, return_exceptions=True)     # 等它真的收尾（finally 裡的清理）才往下走
+            except asyncio.CancelledError: pass
+        self.mon.stop()
+
+    # ---- workload 降級鏈：失敗就立刻換下一個 ----
+    def _aff(self, cmd, sh):
+        if len(self.shards) > 1: return pin_cmd(cmd, sh["cpus"], sh["nodes"])
+        return cmd if self.cfg["cores"] in ("", "all") else pin_cmd(cmd, sh["cpus"])
+
+    async def _sharded(self, name, cmd_for, limit, status=None):
+        # 每個 shard 一個綁核的 instance 同時跑；任一個失敗就整段換下一個 workload（各 shard 用同一種負載才能比）
+        multi = len(self.shards) > 1
+        async def one(sh):
+            cmd = self._aff(cmd_for(sh), sh)
+            self._wlog(f"$ {cmd}\n")
+            tag = f"{name}[{sh['name']}]" if multi else name
+            rc = await self.proc_stage(tag, cmd, limit, self.work_log, status[sh["name"]].feed if status else None,
+                                       prefix=f"[{sh['name']}] " if multi else "")
+            self.shard_rc[sh["name"]].append((name, rc))
+            if multi: self.log(f"{now()} | [{'PASS' if rc==0 else 'WARN'}] {tag} rc={rc} (cpus {format_cpulist(sh['cpus'])})\n")
+            return rc
+        rcs = await asyncio.gather(*[one(sh) for sh in self.shards])
+        return next((rc for rc in rcs if rc), 0)
+
+    def _stage(self, stage, **kv):
+        if self.live: self.live.set(stage=stage, **kv)
+
+    def _wlog(self, s):
+        with open(self.work_log,"a",encoding="utf-8") as wf: wf.write(s)
+
+    async def workload(self):
+        cfg = self.cfg
+        duration, load, profile, ptu_bin = cfg["duration"], cfg["load"], cfg["profile"], cfg["ptu_bin"]
+        limit = duration + self.grace
+        rc = 127
+        if ptu_bin and os.path.exists(ptu_bin):
+            cmd = build_ptu_cmd(profile, ptu_bin, load, duration, cfg["ptu_tpl"] if profile=="custom" else None)
+            sfx = (lambda sh: f"_{sh['name']}") if len(self.shards) > 1 else (lambda sh: "")
+            ptu_status = {sh["name"]: PtuStatus(os.path.join(self.run_dir, "telemetry", f"ptu_status_{self.ts}{sfx(sh)}.csv"), cfg["ptu_ops_key"])
+                          for sh in self.shards}
+            self._stage("ptu")
+            t0 = time.time()
+            try: rc = await self._sharded("ptu", lambda sh: cmd, limit, ptu_status)
+            finally:
+                for st in ptu_status.values(): st.close()
+            if rc == 0: self.thru = ptu_throughput(ptu_status, self.shards, t0, time.time())
+            self.log(f"{now()} | [{'PASS' if rc==0 else 'WARN'}] PTU/PTAT rc={rc} ({sum(st.rows for st in ptu_status.values())} status values)\n")
+
+        if rc!=0 and have("stress-ng"):
+            self._stage("stress-ng")
+            mets, t0 = {sh["name"]: StressMetrics() for sh in self.shards}, time.time()
+            rc = await self._sharded("stress-ng", lambda sh: f"stress-ng --cpu {len(sh['cpus'])} --cpu-method matrixprod "
+                                                             f"--timeout {duration}s --metrics-brief --verify", limit, mets)
+            self.log(f"{now()} | [{'PASS' if rc==0 else 'WARN'}] stress-ng rc={rc}\n")
+            if rc == 0: self.thru = stress_throughput(mets, self.shards, t0, time.time())
+
+        if rc!=0:
+            kind = cfg["soak_kernel"]
+            cpus = self.cpus                    # 每顆 CPU 一個綁核 process，記憶體 first-touch 就在本地 node
+            self._wlog(f"$ <built-in soaker> kernel={kind} load={load}% cpus={len(cpus)}\n")
+            self._stage("soaker")
+            try:
+                res = await self.loop.run_in_executor(None, run_soaker, cpus, duration, load, kind, self.soak_stop)
+            except asyncio.CancelledError:
+                self.soak_stop.set()
+                raise
+            self._wlog("".join(f"cpu{r['cpu']:<4} util={r['util']:6.1f}% ops/s={r['ops_s']:.4g}\n" for r in res))
+            rc = 0 if len(res) == len(cpus) else 1
+            self.thru = soak_throughput(res, self.shards)
+            if res:
+                util = sum(r["util"] for r in res)/len(res)
+                self.log(f"{now()} | [{'PASS' if rc==0 else 'WARN'}] CPU soaker ({kind}) completed: {len(res)}/{len(cpus)} cores, "
+                         f"avg util {util:.1f}% (target {load}%), total {sum(r['ops_s'] for r in res):.4g} ops/s\n")
+            else:
+                self.log(f"{now()} | [WARN] CPU soaker returned no results.\n")
+            for sh in self.shards:
+                mine = set(sh["cpus"])
+                rs = [x for x in res if x["cpu"] in mine]
+                self.shard_rc[sh["name"]].append(("soaker", 0 if len(rs) == len(mine) else 1))
+                if len(self.shards) > 1 and rs:
+                    self.log(f"{now()} | [INFO] soaker[{sh['name']}]: {len(rs)}/{len(mine)} cores, avg util {sum(x['util'] for x in rs)/len(rs):.1f}%, "
+                             f"{sum(x['ops_s'] for x in rs):.4g} ops/s\n")
+        return rc
+
+    # ---- 報告（各自在 executor 裡並行） ----
+    def write_rapl_summary(self, rsum):
+        with open(os.path.join(self.run_dir,"telemetry","rapl_summary.txt"),"w") as f:
+            f.write(f"duration_s={rsum['elapsed_s']:.1f}\nenergy_delta_uj={int(rsum['energy_j']*1e6)}\navg_power_W={rsum['avg_w']:.2f}\n"
+                    f"peak_power_W={rsum['peak_w']:.2f}\nsamples={rsum['samples']}\nwraps={rsum['wraps']}\n")
+            for d in rsum["domains"]:
+                f.write(f"domain[{d['label']}]=avg {d['avg_w']:.2f} W, peak {d['peak_w']:.2f} W, {d['energy_j']:.1f} J\n")
+
+    def write_overview_txt(self, r, tstat, ana, rsum):
+        cfg = self.cfg
+        tstat_lines = []
+        for m in ("Avg_MHz","Bzy_MHz","Busy%","PkgWatt","PkgTmp","CoreTmp"):
+            st = col_stats(tstat.series(m))
+            if st: tstat_lines.append(f"{m:<11} : avg={st[0]:.1f} min={st[1]:.1f} max={st[2]:.1f}\n")
+        ana_lines = [f"{k:<9}: mean={v['mean']:.1f} std={v['std']:.1f} min={v['min']:.1f} max={v['max']:.1f} (n={v['n']})\n" for k,v in ana["stats"].items()]
+        ana_lines += [f"[{e['t']:>6.0f}s] {e['kind']}: {e['detail']}\n" for e in ana["events"]]
+        rapl_lines = [f"{d['label']:<18}: avg={d['avg_w']:.2f} W peak={d['peak_w']:.2f} W\n" for d in (rsum or {}).get("domains", [])]
+        si = self.sysinfo.facts
+        slow_lines = [f"cpu{c['cpu']:<5} pkg {c['pkg']} core {c['core']:<4}: avg={c['mean']:.0f} min={c['min']:.0f} ({c['delta_pct']:+.1f}%)\n"
+                      for c in self.slow[1]]
+        pkg_lines = [f"pkg{r['pkg']:<3} ({r['cpus'] or '?'} CPUs): {pkg_line(r)}\n" for r in self.pkgs]
+        imb = package_imbalance(self.pkgs)
+        if imb: pkg_lines.append(f"Imbalance  : {imbalance_line(imb)}\n")
+        shard_lines = [f"{sh['name']:<6}: cpus {format_cpulist(sh['cpus'])}, nodes {','.join(map(str, sh['nodes'])) or '-'} — "
+                       f"{', '.join(f'{w} rc={rc}' for w,rc in self.shard_rc[sh['name']]) or 'not run'}\n" for sh in self.shards]
+        eff_lines = [f"{k:<11}: {v}\n" for k,v in efficiency_lines(self.eff)]
+        ovh_lines = [f"{k:<11}: {v}\n" for k,v in overhead_lines(self.ovh_sum, self.hk)]
+        with open(os.path.join(self.run_dir,"Albert_Overview.txt"),"w",encoding="utf-8") as f:
+            f.write(f"""==== PTU CPU Verify — Albert Overview (TXT) ====
+Start time : {r["start"]}
+Duration   : {cfg["duration"]}s
+Governor   : {cfg["governor"]}
+Profile    : {cfg["profile"]}
+PTU bin    : {cfg["ptu_bin"] or "<not set>"}
+Log folder : {self.run_dir}
+CPU        : {si.get("cpu_model") or "N/A"} (microcode {si.get("microcode") or "N/A"}, {si.get("logical_cpus") or "?"} CPUs, {si.get("numa_nodes") or "?"} NUMA nodes)
+System     : {si.get("system") or "N/A"} / BIOS {si.get("bios") or "N/A"}
+Kernel     : {si.get("kernel") or "N/A"} ({si.get("os") or "N/A"}), {si.get("driver") or "N/A"}/{si.get("governor") or "N/A"}
+CPUs used  : {format_cpulist(self.cpus)} ({len(self.cpus)} CPUs, CORES={cfg["cores"]}, SHARD={cfg["shard"]})
 
 -- Result Summary --
-Workload RC : {rc}
-Avg Power W : {avgW}
-Turbostat   : {os.path.basename(tstat_out)}
-Workload log: {os.path.basename(work_log)}
-""")
-    make_html(run_dir, duration, governor, profile, ptu_bin, avgW, trend)
-
-    # 還原 governor
-    if restore_gov and have("cpupower"):
-        run("cpupower frequency-set -g ondemand")
-        plain_write(console_log, f"{now()} | [INFO] Restored governor to ondemand\n")
-
-    # 打包
-    tgz = f"{run_dir}.tar.gz"
-    subprocess.call(["tar","-C", os.path.dirname(run_dir), "-czf", tgz, os.path.basename(run_dir)])
-    plain_write(console_log, f"{now()} | [PASS] Results packaged: {tgz}\n")
-    plain_write(console_log, f"{now()} | [{'PASS' if rc==0 else 'FAIL'}] CPU verification run {'completed' if rc==0 else 'encountered issues'} (rc={rc}).\n")
+Verdict     : {r["verdict"]}{"" if not r["reasons"] else " — " + "; ".join(r["reasons"])}
+Workload RC : {r["rc"]}{' (aborted)' if r["aborted"] else ''}
+Avg Power W : {r["avgW"]}
+Peak Power W: {f"{rsum['peak_w']:.2f}" if rsum else "N/A"}
+Turbostat   : {os.path.basename(self.tstat_out)}
+Workload log: {os.path.basename(self.work_log)}
+
+-- Turbostat ({len(tstat)} samples, {len(tstat.cpu)} CPUs, {len(tstat.pkg)} packages) --
+{"".join(tstat_lines) or "(no data)"}
+-- RAPL domains --
+{"".join(rapl_lines) or "(no data)"}
+-- Efficiency (perf per watt) --
+{"".join(eff_lines) or "(no workload throughput)"}
+-- Harness overhead (self, during the workload) --
+{"".join(ovh_lines) or "(not measured)"}
+-- Online analysis (baseline {f"{ana['base_mhz']:.0f} MHz" if ana['base_mhz'] else "n/a"}) --
+{"".join(ana_lines) or "(no data)"}
+-- Slowest cores ({self.slow[0] or "n/a"} mean, vs median of all CPUs) --
+{"".join(slow_lines) or "(no per-CPU data)"}
+-- Per package ({len(self.pkgs)}) --
+{"".join(pkg_lines) or "(no per-package data)"}
+{f"-- Shards ({len(self.shards)}) --{chr(10)}" + "".join(shard_lines) if len(self.shards) > 1 else ""}""")
+
+    def write_html(self, r, tstat, rsum):
+        cfg = self.cfg
+        make_html(self.run_dir, cfg["duration"], cfg["governor"], cfg["profile"], cfg["ptu_bin"], r["avgW"],
+                  build_charts(tstat, self.rapl.out_csv if self.rapl else None) + efficiency_charts(self.eff), rsum, r["verdict"], r["reasons"],
+                  self.heat, self.pkgs, self.eff, self.ovh_sum, self.hk)
+
+    def write_summary_json(self, r, tstat, ana, rsum):
+        # 機器可讀摘要（run history 索引直接讀這個，不必再解析 telemetry）
+        cfg = self.cfg
+        fcol = tstat.series("Bzy_MHz") or tstat.series("Avg_MHz")
+        pct = percentiles(fcol)
+        tmp = col_stats(tstat.series("PkgTmp")) or col_stats(tstat.series("CoreTmp"))
+        tt, tv = downsample_minmax(tstat.t, fcol, 150) if fcol else ((), ())
+        summ = {"schema": 1, "ts": self.ts, "host": socket.gethostname(), "start": r["start"], "end": now(),
+                "profile": cfg["profile"], "load": cfg["load"], "cores": cfg["cores"], "duration": cfg["duration"],
+                "governor": cfg["governor"], "ptu_bin": cfg["ptu_bin"], "rc": r["rc"], "aborted": r["aborted"],
+                "verdict": r["verdict"], "reasons": r["reasons"], "samples": len(tstat), "cpus": len(tstat.cpu),
+                "p1_mhz": pct[0] if pct else None, "p50_mhz": pct[1] if pct else None, "p99_mhz": pct[2] if pct else None,
+                "avg_mhz": r["avg_mhz"], "min_mhz": r["min_mhz"], "avg_w": r["avg_w"], "peak_w": r["peak_w"],
+                "energy_j": rsum["energy_j"] if rsum else None,
+                "ops_s": r["ops_s"], "ops_j": r["ops_j"], "ops_unit": f"{self.eff['workload']}:{self.eff['unit']}" if self.eff else None,
+                "efficiency": {k:v for k,v in self.eff.items() if k != "series"} if self.eff else None,
+                "ovh_pct": self.ovh_sum["cpu_pct"] if self.ovh_sum else None, "overhead": self.ovh_sum,
+                "housekeeping": format_cpulist(self.hk) or None,
+                "avg_temp_c": tmp[0] if tmp else None, "max_temp_c": tmp[2] if tmp else None,
+                "throttle_s": ana["throttle_s"], "events": ana["events"],
+                "domains": (rsum or {}).get("domains", []), "sysinfo": self.sysinfo.facts,
+                "slow_cores": self.slow[1], "cpus_used": format_cpulist(self.cpus), "shard": cfg["shard"],
+                "packages": self.pkgs, "imbalance": package_imbalance(self.pkgs),
+                "shards": [{"name": sh["name"], "cpus": format_cpulist(sh["cpus"]), "nodes": sh["nodes"],
+                            "runs": [{"workload": w, "rc": rc} for w,rc in self.shard_rc[sh["name"]]]} for sh in self.shards],
+                "trend": {"t": [round(x, 1) for x in tt], "mhz": [round(x, 1) for x in tv]}}
+        with open(os.path.join(self.run_dir, "Albert_Summary.json"), "w", encoding="utf-8") as f: json.dump(summ, f)
+
+    async def reports(self, r):
+        rsum = self.rapl.summary() if self.rapl else None
+        r["avgW"] = f"{rsum['avg_w']:.2f}" if rsum else "N/A"
+        r["avg_w"], r["peak_w"] = (rsum["avg_w"], rsum["peak_w"]) if rsum else (None, None)
+        if rsum:
+            self.write_rapl_summary(rsum)
+            self.log(f"{now()} | [INFO] Average package power (RAPL): {r['avgW']} W, peak {rsum['peak_w']:.2f} W\n")
+        ana = self.mon.an.summary()
+        ex = lambda fn, *a: self.loop.run_in_executor(None, fn, *a)
+        mx = CpuMatrix(os.path.join(self.run_dir, "telemetry"))
+        store, t0 = self.mon.store, time.monotonic()
+        if store and store.closed and store.rows:
+            tstat = await ex(load_telemetry, store.path, (), mx)
+            self.log(f"{now()} | [INFO] Telemetry loaded from {os.path.basename(store.path)}: {len(tstat)} samples, "
+                     f"{os.path.getsize(store.path)/1e6:.1f} MB, {time.monotonic() - t0:.1f}s\n")
+        else:
+            tstat = await ex(parse_turbostat, self.tstat_out, (), mx)
+        fst = col_stats(tstat.series("Bzy_MHz")) or col_stats(tstat.series("Avg_MHz"))
+        r["avg_mhz"], r["min_mhz"] = (fst[0], fst[1]) if fst else (None, None)
+        self.heat = await ex(build_heatmaps, mx)
+        self.slow = next(((h["metric"], h["slow"]) for h in self.heat if h["unit"] == "MHz"), (None, []))
+        self.pkgs = package_rows(self.heat, tstat, rsum)
+        if self.thru:
+            tw0 = self.mon.tstat._t0 if self.mon.tstat._t0 is not None else self.tel_wall0 + self.mon.tstat.interval
+            pw = await ex(power_series, self.rapl.out_csv if self.rapl else None, self.rapl.wall0 if self.rapl else None, tstat, tw0)
+            self.eff = await ex(perf_per_watt, self.thru, pw, tw0)
+            e = self.eff
+            ej = f"{e['ops_j']:.4g} {e['eff_unit']}" if e["ops_j"] else "no energy data"
+            self.log(f"{now()} | [INFO] Throughput ({e['workload']}): {e['ops_s']:.4g} {e['rate_unit']}, {ej}\n")
+        r["ops_s"], r["ops_j"] = (self.eff["ops_s"], self.eff["ops_j"]) if self.eff else (None, None)
+        await ex(self.sysinfo.join, self.sysinfo.timeout + 5)
+        self.ovh_sum = self.ovh.summary(len(self.cpus), {"sysinfo-cmds": self.sysinfo.child_cpu_s})
+        o = self.ovh_sum
+        r["ovh_pct"] = o["cpu_pct"]
+        top = ", ".join(f"{c['name']} {c['cpu_pct']:.3f}%" for c in o["components"][:3])
+        self.log(f"{now()} | [INFO] Harness overhead: {o['cpu_pct']:.3f}% of a CPU ({o['cpu_s']:.2f} s CPU, peak {o['peak_pct']:.2f}%), "
+                 f"{o['wakeups_s']:.1f} wakeups/s, {o['write_b']/1e6:.1f} MB written — {top}\n")
+        await asyncio.gather(ex(self.write_overview_txt, r, tstat, ana, rsum), ex(self.write_html, r, tstat, rsum),
+                             ex(self.write_summary_json, r, tstat, ana, rsum))
+
+    async def run(self):
+        for sub in ("", "sysinfo", "telemetry", "workload"): mkdir_p(os.path.join(self.run_dir, sub))
+        with open(self.work_log, "w", encoding="utf-8") as wf:
+            wf.write(f"# Start: {now()}\n# Profile: {self.cfg['profile']}\n")
+        r = {"ts": self.ts, "run_dir": self.run_dir, "profile": self.cfg["profile"], "load": self.cfg["load"],
+             "cores": self.cfg["cores"], "duration": self.cfg["duration"], "start": now()}
+        _HK["cpus"] = set(self.hk) or None
+        self.ovh = OverheadMonitor(self.cfg["overhead_budget"], log=self.log, live=self.live)
+        if self.hk: self.ovh.pinned = {"rapl-sampler", "run-monitor", "freq-sampler", "overhead", "sysinfo", "sysinfo-cmds", "turbostat"}
+        self.log(f"{now()} | [INFO] Harness overhead budget {self.cfg['overhead_budget']:g}% of a CPU; housekeeping CPUs: "
+                 f"{format_cpulist(self.hk) if self.hk else 'none (samplers share the measured CPUs)'}\n")
+        self.sysinfo.start()
+        if self.live:
+            self.live.begin([z["label"] for z in self.shared["zones"]], ts=self.ts, profile=self.cfg["profile"],
+                            load=self.cfg["load"], cores=self.cfg["cores"], duration=self.cfg["duration"])
+        self.start_telemetry()
+        self.main_task = asyncio.ensure_future(self.workload())
+        if _TERM.is_set(): self._on_signal()
+        try:
+            rc = await self.main_task
+        except asyncio.CancelledError:
+            rc = 130
+            self.soak_stop.set()
+        await self.stop_telemetry()
+
+        ana = self.mon.an.summary()
+        tripped = self.mon.tripped
+        verdict = "PASS" if rc==0 and not ana["events"] else "FAIL"
+        reasons = ([f"fail-fast: {tripped}"] if tripped else []) + \
+                  [f"{e['kind']} @ {e['t']:.0f}s: {e['detail']}" for e in ana["events"] if not tripped] + \
+                  ([f"workload rc={rc}"] if rc != 0 and not tripped else [])
+        r.update(rc=rc, aborted=self.aborted, tripped=tripped, verdict=verdict, reasons=reasons)
+        self._stage("reports", rc=rc, verdict=verdict)
+        try:
+            await asyncio.wait_for(self.reports(r), REPORT_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            self.log(f"{now()} | [WARN] Report stage exceeded {REPORT_TIMEOUT_S}s — reports may be incomplete.\n")
+        self._stage("aborted" if self.aborted else "done")
+        self.log(f"{now()} | [{verdict}] CPU verification step {'completed' if verdict=='PASS' else 'encountered issues'} (rc={rc}).\n")
+        r.pop("avgW", None)
+        return r
+
+def run_step(cfg, run_dir, ts, shared):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    sr = StepRunner(cfg, run_dir, ts, shared, loop)
+    for sig in (signal.SIGTERM, signal.SIGINT): loop.add_signal_handler(sig, sr._on_signal)
+    try:
+        return loop.run_until_complete(sr.run())
+    finally:
+        flush_logs(close=True)
+        for sig in (signal.SIGTERM, signal.SIGINT): loop.remove_signal_handler(sig)
+        signal.signal(signal.SIGTERM, _on_term_late)
+        loop.close()
+        asyncio.set_event_loop(None)
+
+# ====== Campaign：PROFILE × LOAD × CORES 矩陣一次跑完 ======
+# CAMPAIGN=檔案路徑或直接寫 spec：
+#   inline  ：PROFILE=serverlab|avx2;LOAD=50|100;CORES=all|0-15   （; 或換行分隔，| 分隔值）
+#   JSON    ：{"base": {"DURATION": 3600}, "matrix": {"PROFILE": [...], "LOAD": [...]}} 或明列 [{...}, {...}]
+# 步驟放在同一個 campaign_<ts>/ 底下；governor / RAPL 探索只做一次；每步完成即寫 campaign_state.json，
+# 中斷後用 CAMPAIGN_DIR=<目錄> 重跑會從下一個未完成的步驟接續。
+# 建立時把下列環境變數（run 的設定）存進 state 的 base；接續時以 base 為準，不吃當下環境，
+# 當下環境明確設了不同的值就拒絕接續（結果才能跟前面的步驟比）。
+CAMPAIGN_STATE = "campaign_state.json"
+CAMPAIGN_ENV = ("LOG_BASE", "DURATION", "LOAD", "PROFILE", "CORES", "SHARD", "GOVERNOR", "PTU_BIN", "PTU_TEMPLATE", "PTU_OPS_KEY",
+                "SOAK_KERNEL", "FREQ_SAMPLER", "RAPL_INTERVAL", "FAILFAST", "WARMUP_S", "FREQ_DROP_PCT", "SUSTAIN_S",
+                "TEMP_LIMIT_C", "PL_NEAR_PCT", "DEAD_BUSY_PCT", "DEAD_CORE_S", "WORKLOAD_GRACE_S", "TELEMETRY_BIN",
+                "PACKAGE_COMPRESS", "HOUSEKEEPING_CPUS", "OVERHEAD_BUDGET_PCT", "SYSINFO_CACHE", "SYSINFO_TIMEOUT_S")
+
+def parse_campaign(spec):
+    text = spec
+    if spec and os.path.isfile(spec):
+        with open(spec, encoding="utf-8") as f: text = f.read()
+    text = (text or "").strip()
+    if text[:1] in "[{":
+        d = json.loads(text)
+        if isinstance(d, list): return [{k: str(v) for k,v in st.items()} for st in d]
+        base, matrix = d.get("base", {}), d.get("matrix", {})
+    else:
+        base, matrix = {}, {}
+        for part in re.split(r"[;\n]", text):
+            part = part.strip()
+            if not part or part.startswith("#"): continue
+            k,_,v = part.partition("=")
+            matrix[k.strip()] = [x.strip() for x in v.split("|") if x.strip()]
+    keys = list(matrix)
+    steps = []
+    for combo in itertools.product(*[matrix[k] for k in keys]):
+        st = {k: str(v) for k,v in base.items()}
+        st.update({k: str(v) for k,v in zip(keys, combo)})
+        steps.append(st)
+    return steps
+
+def campaign_env(env, base):
+    # CAMPAIGN_ENV 全部換成 base 的值（base 沒有的 = 建立時沒設 → 用預設值，不用當下環境的）
+    out = {k: v for k,v in env.items() if k not in CAMPAIGN_ENV}
+    out.update(base)
+    return out
+
+def campaign_conflicts(env, base):
+    return sorted(k for k in CAMPAIGN_ENV if k in env and env[k] != base.get(k))
+
+def _save_state(fp, state):
+    tmp = fp + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f: json.dump(state, f, indent=2)
+    os.replace(tmp, fp)
+
+def write_campaign_summary(camp_dir, state):
+    cols = ("step","params","profile","load","cores","duration","status","verdict","rc","avg_mhz","min_mhz","avg_w","peak_w","ops_s","ops_j","ovh_pct","run_dir")
+    rows = []
+    for st in state["steps"]:
+        r = st.get("result") or {}
+        p = st["params"]
+        rows.append({"step": st["n"], "params": " ".join(f"{k}={v}" for k,v in p.items()), "profile": r.get("profile", p.get("PROFILE","")), "load": r.get("load", p.get("LOAD","")),
+                     "cores": r.get("cores", p.get("CORES","")), "duration": r.get("duration", p.get("DURATION","")),
+                     "status": st["status"], "verdict": r.get("verdict",""), "rc": r.get("rc",""),
+                     "avg_mhz": r.get("avg_mhz"), "min_mhz": r.get("min_mhz"), "avg_w": r.get("avg_w"), "peak_w": r.get("peak_w"),
+                     "ops_s": r.get("ops_s"), "ops_j": r.get("ops_j"), "ovh_pct": r.get("ovh_pct"), "run_dir": os.path.basename(r.get("run_dir") or st.get("run_dir") or "")})
+    fmt = lambda v: "" if v is None else (f"{v:.1f}" if isinstance(v, float) else str(v))
+    with open(os.path.join(camp_dir, "campaign_summary.csv"), "w", encoding="utf-8") as f:
+        f.write(",".join(cols) + "\n")
+        for r in rows: f.write(",".join(fmt(r[c]) for c in cols) + "\n")
+    w = {c: max([len(c)] + [len(fmt(r[c])) for r in rows]) for c in cols}
+    with open(os.path.join(camp_dir, "campaign_summary.txt"), "w", encoding="utf-8") as f:
+        f.write(f"==== PTU CPU Verify — Campaign Summary ====\nCampaign : {camp_dir}\nUpdated  : {now()}\n\n")
+        f.write("  ".join(c.ljust(w[c]) for c in cols) + "\n")
+        for r in rows: f.write("  ".join(fmt(r[c]).ljust(w[c]) for c in cols) + "\n")
+
+def run_campaign(cfg):
+    camp_dir = cfg["env"].get("CAMPAIGN_DIR") or os.path.join(cfg["log_base"], "campaign_" + datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+    mkdir_p(camp_dir)
+    state_fp = os.path.join(camp_dir, CAMPAIGN_STATE)
+    camp_log = os.path.join(camp_dir, "campaign.log")
+    log = lambda s: plain_write(camp_log, s)
+    if os.path.exists(state_fp):
+        with open(state_fp, encoding="utf-8") as f: state = json.load(f)
+        if "base" not in state:
+            state["base"] = {k: cfg["env"][k] for k in CAMPAIGN_ENV if k in cfg["env"]}
+            log(f"{now()} | [WARN] {CAMPAIGN_STATE} has no saved base settings (older version) — using the current environment\n")
+        bad = campaign_conflicts(cfg["env"], state["base"])
+        if bad:
+            raise SystemExit(f"[FAIL] Campaign {camp_dir} was created with different settings: " +
+                             ", ".join(f"{k}={state['base'].get(k, '<unset>')} (now {cfg['env'][k]})" for k in bad) +
+                             " — unset them to resume with the original values")
+        cfg = load_config(campaign_env(cfg["env"], state["base"]))
+        done = sum(1 for st in state["steps"] if st["status"] == "done")
+        log(f"{now()} | [INFO] Resuming campaign: {done}/{len(state['steps'])} steps done\n")
+    else:
+        steps = parse_campaign(cfg["env"].get("CAMPAIGN", ""))
+        if not steps: raise SystemExit("CAMPAIGN spec is empty")
+        for p in steps:
+            env = dict(cfg["env"]); env.update(p)
+            check_selection(load_config(env))
+        state = {"created": now(), "spec": cfg["env"].get("CAMPAIGN", ""),
+                 "base": {k: cfg["env"][k] for k in CAMPAIGN_ENV if k in cfg["env"]},
+                 "steps": [{"n": i+1, "params": p, "status": "pending"} for i,p in enumerate(steps)]}
+        _save_state(state_fp, state)
+        log(f"{now()} | [INFO] New campaign: {len(steps)} steps → {camp_dir}\n")
+
+    shared = setup_host(cfg, log)
+    try:
+        for st in state["steps"]:
+            if st["status"] == "done": continue
+            if _TERM.is_set(): break
+            old = st.get("run_dir")
+            if old and os.path.isdir(old):
+                # 中斷過的步驟重跑：殘缺的 run 目錄改名留著查，history 只認 run_* 所以不會多一筆
+                dst = os.path.join(camp_dir, "interrupted_" + os.path.basename(old))
+                if os.path.exists(dst): dst += f"_{len(st.get('abandoned', []))}"
+                os.rename(old, dst)
+                st.setdefault("abandoned", []).append(dst)
+                log(f"{now()} | [INFO] Step {st['n']}: partial run kept as {os.path.basename(dst)}\n")
+            env = dict(cfg["env"]); env.update(st["params"])
+            scfg = load_config(env)
+            ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            run_dir = os.path.join(camp_dir, f"run_{ts}_s{st['n']:02d}")
+            st.update(status="running", run_dir=run_dir, started=now())
+            _save_state(state_fp, state)
+            log(f"{now()} | [INFO] Step {st['n']}/{len(state['steps'])}: {st['params']} → {os.path.basename(run_dir)}\n")
+            mkdir_p(run_dir)
+            write_header(os.path.join(run_dir, f"console_{ts}.log"), scfg, run_dir)
+            res = run_step(scfg, run_dir, ts, shared)
+            st["result"] = res
+            st["status"] = "interrupted" if res["aborted"] and not res["tripped"] else "done"
+            _save_state(state_fp, state)
+            write_campaign_summary(camp_dir, state)
+            log(f"{now()} | [{res['verdict']}] Step {st['n']} rc={res['rc']}{' — ' + '; '.join(res['reasons']) if res['reasons'] else ''}\n")
+            if res["aborted"]:
+                log(f"{now()} | [WARN] Campaign stopped at step {st['n']} ({'fail-fast' if res['tripped'] else 'signal'}).\n")
+                break
+    finally:
+        restore_host(shared, log)
+        write_campaign_summary(camp_dir, state)
+    if all(st["status"] == "done" for st in state["steps"]):
+        package_dir(camp_dir, log, cfg["package"])
+    else:
+        log(f"{now()} | [INFO] Campaign incomplete — resume with CAMPAIGN_DIR={camp_dir}\n")
+
+def main():
+    os.environ["PATH"] = "/usr/sbin:/sbin:" + os.environ.get("PATH","")
+    signal.signal(signal.SIGTERM, _on_term_late)   # step 之外收到 SIGTERM：不中斷收尾，只記下來
+    cfg = load_config()
+    if cfg["env"].get("CAMPAIGN") or cfg["env"].get("CAMPAIGN_DIR"):
+        return run_campaign(cfg)
+
+    check_selection(cfg)
+    ts = cfg["env"].get("RUN_TS") or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")   # GUI 會指定，方便跟檔
+    run_dir = os.path.join(cfg["log_base"], f"run_{ts}")
+    mkdir_p(run_dir)
+    console_log = os.path.join(run_dir, f"console_{ts}.log")
+    log = lambda s: plain_write(console_log, s)
+    write_header(console_log, cfg, run_dir)
+    shared = setup_host(cfg, log)
+    try:
+        res = run_step(cfg, run_dir, ts, shared)
+    finally:
+        restore_host(shared, log)
+    package_dir(run_dir, log, cfg["package"])
+    log(f"{now()} | [{res['verdict']}] CPU verification run {'completed' if res['verdict']=='PASS' else 'encountered issues'} (rc={res['rc']}).\n")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# =============================================================================
+#  PTU_CPU_Verify_Bench.py  (Albert Style, 自身資料路徑 benchmark, Py3.6-compatible)
+#  - 不需要 turbostat / PTU / root：turbostat 輸出、RAPL csv、/sys/class/powercap 全部合成
+#  - turbostat：summary 或 per-CPU、1h/24h/72h、8–512 CPUs，中途換 header、含截斷行
+#  - powercap：package + core/uncore/dram 巢狀 zone、mmio 重複介面、小 max_energy_range_uj 逼出回捲
+#  - 每個 stage（parse / trend / online / load / heatmap / html / package / rapl / history）記錄時間、吞吐量、
+#    峰值 RSS（每個 case 一個子進程，stage 之間重設 VmHWM）、輸出大小；另做正確性檢查
+#  - 跟 baseline JSON 比，超過容忍度就標 REGRESSION，exit code 1；找不到 baseline 也是 exit code 1
+#    （baseline 跟機器綁定，先在參考機上跑一次 --update-baseline）
+#
+#  用法：
+#    python3 PTU_CPU_Verify_Bench.py                         # quick suite，跟 baseline 比
+#    python3 PTU_CPU_Verify_Bench.py --suite full --repeat 3
+#    python3 PTU_CPU_Verify_Bench.py --case cpu:24:512 --stages parse,heatmap
+#    python3 PTU_CPU_Verify_Bench.py --update-baseline       # 把這次結果存成 baseline
+#      case = kind:hours:cpus，kind 為 sum（只有 summary 列）或 cpu（summary + per-CPU）
+# =============================================================================
+import os, re, sys, json, time, shutil, socket, argparse, resource, multiprocessing
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+import PTU_CPU_Verify as core
+
+BENCH_WORK_DEFAULT = "/tmp/ptu_cpu_verify_bench"
+BASELINE_DEFAULT = HERE/"PTU_CPU_Verify_Bench.baseline.json"
+TOL_PCT_DEFAULT = 25.0                  # 時間
+RSS_TOL_PCT = 20.0
+SIZE_TOL_PCT = 10.0
+MIN_DELTA_S = 0.05                      # 比這小的時間差當雜訊
+MIN_DELTA_MB = 5.0
+GEN_VERSION = 1                         # 改了產生器就加一，舊 fixture 自動重建
+SLOW_CPU = 3                            # 產生器故意放慢的 CPU（heatmap 檢查用）
+RAPL_SAMPLES = 20000
+
+SUITES = {
+    "quick": ("sum:24:8", "cpu:1:64", "cpu:0.25:512"),
+    "full": ("sum:72:8", "cpu:24:8", "cpu:1:512", "cpu:24:512"),
+}
+STAGES = ("parse", "trend", "online", "load", "heatmap", "html", "package")
+
+# ====== 合成 fixture ======
+H1 = ["Time_Of_Day_Seconds", "Package", "Core", "CPU", "Avg_MHz", "Busy%", "Bzy_MHz", "TSC_MHz", "IRQ", "CoreTmp",
+      "PkgTmp", "PkgWatt", "RAMWatt"]
+H2 = ["Time_Of_Day_Seconds", "Package", "Core", "CPU", "Avg_MHz", "Busy%", "Bzy_MHz", "TSC_MHz", "SMI", "CoreTmp",
+      "CorWatt", "PkgTmp", "PkgWatt", "RAMWatt"]          # 後半段換 header：拿掉 IRQ、加 SMI / CorWatt
+PKG_COLS = 3                            # 最後幾欄是 package 層，非 package 首顆 CPU 的列不印（跟 turbostat 一樣）
+
+def parse_case(spec):
+    kind, hours, cpus = spec.split(":")
+    if kind not in ("sum", "cpu"): raise ValueError(f"bad case kind: {spec}")
+    return kind, float(hours), int(cpus)
+
+def case_samples(spec):
+    return int(parse_case(spec)[1]*3600)
+
+def gen_turbostat(fp, seconds, cpus, per_cpu):
+    pk = 2 if cpus >= 16 else 1
+    per_pkg = cpus // pk
+    t0 = 1700000000.0
+    tmp = f"{fp}.tmp"
+    with open(tmp, "w") as f:
+        for i in range(seconds):
+            hdr = H1 if i < seconds//2 else H2
+            tod = f"{t0 + i:.6f}"
+            base = 2900 + (i*7919) % 200
+            v = {"Time_Of_Day_Seconds": tod, "Package": "-", "Core": "-", "CPU": "-", "Avg_MHz": base - 50, "Busy%": "97.50",
+                 "Bzy_MHz": base, "TSC_MHz": 2000, "IRQ": 123456, "SMI": 0, "CoreTmp": 71, "CorWatt": "8.50",
+                 "PkgTmp": 78, "PkgWatt": 180 + i % 40, "RAMWatt": "12.25"}
+            rows = ["\t".join(hdr), "\t".join(str(v[h]) for h in hdr)]
+            if per_cpu:
+                for c in range(cpus):
+                    mhz = base - (c*104729) % 97 - (900 if c == SLOW_CPU and i > seconds//2 else 0)
+                    v.update(Package=c // per_pkg, Core=(c % per_pkg)//2, CPU=c, Avg_MHz=mhz - 40, Bzy_MHz=mhz,
+                             CoreTmp=60 + c % 20, PkgWatt=90 + i % 20)
+                    cols = hdr if c % per_pkg == 0 else hdr[:-PKG_COLS]
+                    rows.append("\t".join(str(v[h]) for h in cols))
+                if i == seconds//3: rows.insert(3, f"{tod}\t0\t0")       # 截斷的列
+            f.write("\n".join(rows) + "\n")
+        f.write(f"{t0 + seconds:.6f}\t-\t-\t-\t29")                    # 最後一行寫到一半
+    os.replace(tmp, fp)
+
+def gen_rapl_csv(fp, seconds, labels):
+    with open(fp, "w") as f:
+        f.write("t_s,package_total_W," + ",".join(labels) + "\n")
+        for i in range(seconds):
+            ws = [150.0 + (i*31 + j*17) % 40 if "/" not in lab else 20.0 + (i + j) % 9 for j, lab in enumerate(labels)]
+            tot = sum(w for w, lab in zip(ws, labels) if "/" not in lab)
+            f.write(f"{i + 1:.3f},{tot:.3f}," + ",".join(f"{w:.3f}" for w in ws) + "\n")
+
+def gen_powercap(root, packages=2, subs=("core", "uncore", "dram"), max_uj=2**32):
+    shutil.rmtree(root, True)
+    zones = []
+    def zone(zid, name):
+        d = os.path.join(root, zid)
+        os.makedirs(d)
+        for k, v in (("name", name), ("energy_uj", "0"), ("max_energy_range_uj", str(max_uj))):
+            with open(os.path.join(d, k), "w") as f: f.write(v + "\n")
+        zones.append(d)
+    os.makedirs(os.path.join(root, "intel-rapl"))                       # 控制型目錄：要被略過
+    for p in range(packages):
+        zone(f"intel-rapl:{p}", f"package-{p}")
+        for j, s in enumerate(subs): zone(f"intel-rapl:{p}:{j}", s)
+    zone("intel-rapl-mmio:0", "package-0")                             # mmio 重複介面：要被略過
+    return max_uj
+
+def case_dir(work, spec):
+    return os.path.join(work, f"case_{spec.replace(':', '_')}_v{GEN_VERSION}")
+
+def ensure_fixture(work, spec, log):
+    kind, hours, cpus = parse_case(spec)
+    d = case_dir(work, spec)
+    ts = os.path.join(d, "turbostat.txt")
+    if not os.path.exists(ts):
+        os.makedirs(d, exist_ok=True)
+        t = time.monotonic()
+        gen_turbostat(ts, case_samples(spec), cpus, kind == "cpu")
+        gen_rapl_csv(os.path.join(d, "rapl.csv"), case_samples(spec),
+                     ["package-0", "package-0/core", "package-0/dram", "package-1", "package-1/core", "package-1/dram"])
+        log(f"[gen] {spec}: {os.path.getsize(ts)/1e6:.1f} MB in {time.monotonic() - t:.1f}s\n")
+    return d
+
+# ====== 量測 ======
+def _hwm_reset():
+    try:
+        with open("/proc/self/clear_refs", "w") as f: f.write("5")
+    except OSError: pass
+
+def _hwm_mb():
+    try:
+        with open("/proc/self/status") as f: m = re.search(r"VmHWM:\s+(\d+)", f.read())
+        if m: return int(m.group(1))/1024
+    except OSError: pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+
+def _dir_bytes(d):
+    return sum(os.path.getsize(os.path.join(r, f)) for r, _, fs in os.walk(d) for f in fs)
+
+class Meter(object):
+    def __init__(self, stages):
+        self.stages, self.res, self.fail = stages, {}, []
+
+    def run(self, name, fn):
+        if name not in self.stages: return None
+        _hwm_reset()
+        t = time.perf_counter()
+        out, rec = fn()
+        rec["s"] = round(time.perf_counter() - t, 4)
+        rec["rss_mb"] = round(_hwm_mb(), 1)
+        self.res[name] = rec
+        return out
+
+    def check(self, ok, msg):
+        if not ok: self.fail.append(msg)
+
+def bench_case(work, spec, stages):
+    kind, hours, cpus = parse_case(spec)
+    n = case_samples(spec)
+    d = case_dir(work, spec)
+    ts_file, rapl_csv = os.path.join(d, "turbostat.txt"), os.path.join(d, "rapl.csv")
+    run_dir = os.path.join(d, "run")
+    shutil.rmtree(run_dir, True)
+    os.makedirs(os.path.join(run_dir, "telemetry"))
+    size = os.path.getsize(ts_file)
+    m = Meter(stages)
+
+    def parse():
+        mx = core.CpuMatrix(os.path.join(run_dir, "telemetry"))
+        ts = core.parse_turbostat(ts_file, (), mx)
+        return (ts, mx), {"in_bytes": size, "items": len(ts)}
+    ts, mx = m.run("parse", parse) or (None, None)
+    if ts is not None:
+        m.check(len(ts) == n, f"parse: {len(ts)} samples, expected {n}")
+        m.check(kind == "sum" or mx.rows == n and len(mx.cpus) == cpus, f"parse: matrix {mx.rows}x{len(mx.cpus or ())}")
+
+    tr = m.run("trend", lambda: (lambda t: (t, {"in_bytes": size, "items": len(t)}))(core.parse_trend(ts_file)))
+    if tr is not None: m.check(len(tr) == n, f"trend: {len(tr)} points, expected {n}")
+
+    ptc = os.path.join(run_dir, "telemetry", "telemetry.ptc")
+    def online():
+        an = core.Analyzer(core.analysis_config({}), list(range(cpus)), 100, None)
+        mon = core.RunMonitor(ts_file, an, store=core.TelemetryStore(ptc))
+        while mon.tail.off < size - 64: mon.poll()
+        mon.poll(final=True)
+        mon.store.close()
+        return an, {"in_bytes": size, "items": n, "out_bytes": os.path.getsize(ptc)}
+    an = m.run("online", online)
+    if an is not None: m.check(an.summary()["stats"], "online: no statistics")
+
+    def load():
+        lmx = core.CpuMatrix(os.path.join(run_dir, "load"))
+        return (core.load_telemetry(ptc, (), lmx), lmx), {"in_bytes": os.path.getsize(ptc), "items": n}
+    if an is not None:
+        lts, lmx = m.run("load", load) or (None, None)
+        if lts is not None:
+            m.check(len(lts) == n, f"load: {len(lts)} samples, expected {n}")
+            m.check(kind == "sum" or lmx.rows == n and len(lmx.cpus) == cpus, f"load: matrix {lmx.rows}x{len(lmx.cpus or ())}")
+            if ts is not None: m.check(len(lts.cpu) == len(ts.cpu), f"load: {len(lts.cpu)} CPUs, parse found {len(ts.cpu)}")
+
+    if ts is not None and kind == "cpu":
+        heat = m.run("heatmap", lambda: (lambda h: (h, {"items": mx.rows*len(mx.cpus),
+                                                         "out_bytes": sum(len(l["d"]) for x in h for l in x["levels"])}))(core.build_heatmaps(mx)))
+        if heat is not None:
+            m.check(heat and heat[0]["slow"] and heat[0]["slow"][0]["cpu"] == SLOW_CPU,
+                    f"heatmap: slowest cpu {heat[0]['slow'][0]['cpu'] if heat and heat[0]['slow'] else None}, expected {SLOW_CPU}")
+    else:
+        heat = ()
+
+    def html():
+        core.make_html(run_dir, n, "performance", "bench", "", "N/A", core.build_charts(ts, rapl_csv), None, "PASS", [], heat or ())
+        return None, {"items": n, "out_bytes": os.path.getsize(os.path.join(run_dir, "Albert_Overview.html"))}
+    if ts is not None: m.run("html", html)
+
+    def package():
+        shutil.copy(ts_file, os.path.join(run_dir, "telemetry", "turbostat.txt"))
+        src = _dir_bytes(run_dir)
+        tgz = core.package_dir(run_dir, lambda s: None)
+        return None, {"in_bytes": src, "out_bytes": os.path.getsize(tgz)}
+    m.run("package", package)
+    return m.res, m.fail
+
+def bench_rapl(work, samples=RAPL_SAMPLES):
+    root = os.path.join(work, "powercap")
+    max_uj = gen_powercap(root)
+    zones = core.rapl_zones(root)
+    m = Meter(("rapl",))
+    m.check(len(zones) == 8 and sum(z["top"] for z in zones) == 2, f"rapl: {len(zones)} zones discovered, expected 8 (2 packages)")
+    watts = [230.0 if z["top"] else 35.0 for z in zones]
+    vals = [0]*len(zones)
+    paths = [z["energy"] for z in zones]
+
+    def run():
+        s = core.RaplSampler(zones, 1.0, os.path.join(work, "rapl_bench.csv"))
+        s.open_csv()
+        spent, wraps = 0.0, 0
+        for _ in range(samples):
+            for i, p in enumerate(paths):                 # 寫入不計時：模擬 1 秒的能量增量
+                vals[i] += int(watts[i]*1e6)
+                if vals[i] >= max_uj: vals[i] -= max_uj; wraps += 1
+                with open(p, "w") as f: f.write(f"{vals[i]}\n")
+            t = time.perf_counter(); s.sample(); spent += time.perf_counter() - t
+        s.close()
+        return (s.summary(), wraps, spent), {"items": samples}
+    _hwm_reset()
+    (rs, wraps, spent), rec = run()
+    rec["s"], rec["rss_mb"] = round(spent, 4), round(_hwm_mb(), 1)
+    want = sum(w for w, z in zip(watts, zones) if z["top"])*samples
+    m.check(abs(rs["energy_j"] - want) <= want*1e-6, f"rapl: package energy {rs['energy_j']:.1f} J, expected {want:.1f} J")
+    m.check(rs["wraps"] == wraps, f"rapl: {rs['wraps']} wraps detected, expected {wraps}")
+    return {"rapl": rec}, m.fail
+
+def bench_history(work, steps=4):
+    # campaign 打包成一個 tarball 後，每個步驟都要各自索引成一筆（ts / step 各自的）
+    import PTU_CPU_Verify_History as hist
+    root = os.path.join(work, "history")
+    shutil.rmtree(root, True)
+    camp = os.path.join(root, "campaign_20250101_000000")
+    for i in range(1, steps + 1):
+        rd = os.path.join(camp, f"run_20250101_00{i:02d}00_s{i:02d}")
+        os.makedirs(rd)
+        with open(os.path.join(rd, hist.SUMMARY_FILE), "w", encoding="utf-8") as f:
+            json.dump({"schema": 1, "ts": f"20250101_00{i:02d}00", "host": "bench", "profile": "bench", "load": 25*i, "verdict": "PASS"}, f)
+    core.package_dir(camp, lambda s: None)
+    shutil.rmtree(camp)
+    m = Meter(("history",))
+
+    def run():
+        con = hist.connect(os.path.join(root, "history.sqlite"))
+        hist.index(root, con, log=lambda s: None)
+        rows = [tuple(r) for r in con.execute("SELECT ts, step, load FROM runs ORDER BY step")]
+        con.close()
+        return rows, {"items": steps}
+    rows = m.run("history", run)
+    want = [(f"20250101_00{i:02d}00", i, 25*i) for i in range(1, steps + 1)]
+    m.check(rows == want, f"history: campaign tarball indexed as {rows}, expected {steps} steps")
+    return m.res, m.fail
+
+def _child(fn, args, conn):
+    try: conn.send(fn(*args))
+    except Exception as e: conn.send(({}, [f"{type(e).__name__}: {e}"]))
+    conn.close()
+
+def isolated(fn, *args):
+    # 每個 case 一個子進程：峰值 RSS 不受產生器 / 前一個 case 影響
+    ctx = multiprocessing.get_context("fork")
+    a, b = ctx.Pipe(False)
+    p = ctx.Process(target=_child, args=(fn, args, b))
+    p.start(); b.close()
+    try: out = a.recv()
+    except EOFError: out = ({}, [f"worker died (exit {p.exitcode})"])
+    p.join()
+    return out
+
+# ====== baseline ======
+def throughput(rec):
+    s = max(rec["s"], 1e-9)
+    out = []
+    if rec.get("in_bytes"): out.append(f"{rec['in_bytes']/1e6/s:,.1f} MB/s")
+    if rec.get("items"): out.append(f"{rec['items']/s:,.0f} items/s")
+    return " · ".join(out)
+
+def regressions(cur, base, tol):
+    out = []
+    for key, rec in sorted(cur.items()):
+        b = base.get(key)
+        if not b: continue
+        if rec["s"] > b["s"]*(1 + tol/100) and rec["s"] - b["s"] > MIN_DELTA_S:
+            out.append(f"{key}: time {b['s']:.3f}s → {rec['s']:.3f}s (+{(rec['s']/b['s'] - 1)*100:.0f}%)")
+        if rec["rss_mb"] > b["rss_mb"]*(1 + RSS_TOL_PCT/100) and rec["rss_mb"] - b["rss_mb"] > MIN_DELTA_MB:
+            out.append(f"{key}: peak RSS {b['rss_mb']:.0f} → {rec['rss_mb']:.0f} MB")
+        if b.get("out_bytes") and rec.get("out_bytes", 0) > b["out_bytes"]*(1 + SIZE_TOL_PCT/100):
+            out.append(f"{key}: output {b['out_bytes']/1e6:.2f} → {rec['out_bytes']/1e6:.2f} MB")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark PTU_CPU_Verify data paths on synthetic fixtures")
+    ap.add_argument("--suite", choices=sorted(SUITES), default="quick")
+    ap.add_argument("--case", action="append", help="kind:hours:cpus（可重複；給了就不跑 suite）")
+    ap.add_argument("--stages", default=",".join(STAGES + ("rapl", "history")), help="逗號分隔")
+    ap.add_argument("--repeat", type=int, default=1, help="每個 case 跑幾次取最快")
+    ap.add_argument("--work", default=os.environ.get("BENCH_WORK", BENCH_WORK_DEFAULT), help="fixture 與輸出目錄（會重用 fixture）")
+    ap.add_argument("--baseline", default=str(BASELINE_DEFAULT))
+    ap.add_argument("--update-baseline", action="store_true")
+    ap.add_argument("--tol", type=float, default=TOL_PCT_DEFAULT, help="時間容忍度 %%")
+    ap.add_argument("--json", help="另存這次結果")
+    a = ap.parse_args()
+    log = lambda s: (sys.stdout.write(s), sys.stdout.flush())
+    stages = tuple(s.strip() for s in a.stages.split(",") if s.strip())
+    cases = a.case or list(SUITES[a.suite])
+    os.makedirs(a.work, exist_ok=True)
+
+    results, fails = {}, []
+    for spec in cases:
+        parse_case(spec)
+        ensure_fixture(a.work, spec, log)
+        best = {}
+        for _ in range(max(1, a.repeat)):
+            res, fl = isolated(bench_case, a.work, spec, stages)
+            fails += [f"{spec} {x}" for x in fl if f"{spec} {x}" not in fails]
+            for st, rec in res.items():
+                if st not in best or rec["s"] < best[st]["s"]: best[st] = rec
+        for st in STAGES:
+            if st in best:
+                results[f"{spec}/{st}"] = best[st]
+                log(f"{spec:<14} {st:<8} {best[st]['s']:>9.3f}s  {best[st]['rss_mb']:>7.1f} MB"
+                    f"{'  out ' + format(best[st]['out_bytes']/1e6, '.2f') + ' MB' if best[st].get('out_bytes') else '':<18}  {throughput(best[st])}\n")
+    if "rapl" in stages:
+        best = None
+        for _ in range(max(1, a.repeat)):
+            res, fl = isolated(bench_rapl, a.work)
+            fails += [x for x in fl if x not in fails]
+            if res and (best is None or res["rapl"]["s"] < best["s"]): best = res["rapl"]
+        if best:
+            results["powercap/rapl"] = best
+            log(f"{'powercap':<14} {'rapl':<8} {best['s']:>9.3f}s  {best['rss_mb']:>7.1f} MB{'':<18}  {throughput(best)}\n")
+    if "history" in stages:
+        res, fl = isolated(bench_history, a.work)
+        fails += fl
+        if res:
+            results["campaign/history"] = res["history"]
+            log(f"{'campaign':<14} {'history':<8} {res['history']['s']:>9.3f}s  {res['history']['rss_mb']:>7.1f} MB{'':<18}  {throughput(res['history'])}\n")
+
+    doc = {"host": socket.gethostname(), "python": sys.version.split()[0], "numpy": core.np is not None,
+           "when": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}
+    if a.json:
+        with open(a.json, "w") as f: json.dump(doc, f, indent=1)
+    for x in fails: log(f"[FAIL] {x}\n")
+
+    regs = []
+    if a.update_baseline:
+        base = {}
+        if os.path.exists(a.baseline):
+            with open(a.baseline) as f: base = json.load(f).get("results", {})
+        base.update(results)
+        doc["results"] = base
+        with open(a.baseline, "w") as f: json.dump(doc, f, indent=1)
+        log(f"[INFO] baseline updated: {a.baseline}\n")
+    elif os.path.exists(a.baseline):
+        with open(a.baseline) as f: bd = json.load(f)
+        if bd.get("host") != doc["host"] or bd.get("numpy") != doc["numpy"]:
+            log(f"[WARN] baseline from {bd.get('host')} (numpy={bd.get('numpy')}) — timings may not be comparable\n")
+        regs = regressions(results, bd.get("results", {}), a.tol)
+        for x in regs: log(f"[REGRESSION] {x}\n")
+        if not regs: log(f"[PASS] no regressions vs {a.baseline} (tol {a.tol:g}%)\n")
+    else:
+        # 沒 baseline 就沒有回歸比較可言：當成失敗，免得 CI 一直綠燈卻什麼都沒比
+        regs = [f"no baseline at {a.baseline}"]
+        log(f"[FAIL] no baseline at {a.baseline} — run once with --update-baseline on the reference host\n")
+    sys.exit(1 if fails or regs else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+# =============================================================================
+#  PTU_CPU_Verify_Fleet.py  (Albert Style, 多節點同時燒機, Py3.6-compatible)
+#  - inventory 裡每台機器同時跑 PTU_CPU_Verify.py（--parallel 限制同時幾台），整個 fleet 只花一個燒機時間
+#  - transport：ssh（正式；ControlMaster 共用連線）/ local（本機子行程，測試用），只差在指令怎麼送出去
+#  - 核心在節點上以 setsid + nohup 背景跑，控制端斷線不影響燒機；控制端定期輪詢：
+#    心跳（輪詢成功的時間）、進度（DURATION 走了多少 + console log 最後一行）、run 目錄增量拉回
+#    （每次只拉新增的 bytes，一次往返拉完所有檔案；結束時不用再整包打包傳回）
+#  - 全部結束後合併每台的 Albert_Summary.json → Fleet_Report.txt / .html / .json，
+#    依頻率、功耗、溫度、降頻秒數、ops/J 與 fleet 中位數的差距（robust z）排出異常節點
+#
+#  用法：
+#    python3 PTU_CPU_Verify_Fleet.py hosts.txt --env DURATION=3600 --env PROFILE=avx512
+#    python3 PTU_CPU_Verify_Fleet.py hosts.txt --transport local --parallel 4      # 本機模擬多台
+#    python3 PTU_CPU_Verify_Fleet.py --report /path/to/fleet_20251001_093000        # 只重出報告
+#      hosts.txt：一行一台，`名稱 [ssh=user@addr] [KEY=VAL ...]`（KEY=VAL 只套用在這台），# 後為註解
+# =============================================================================
+import os, re, sys, json, time, shlex, signal, asyncio, argparse, datetime, statistics, tempfile
+from pathlib import Path
+from html import escape
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+import PTU_CPU_Verify as core          # now / plain_write / 預設值共用
+
+CORE_FILE = "PTU_CPU_Verify.py"
+REMOTE_DIR_DEFAULT = "/tmp/ptu_cpu_verify"      # 節點上放核心與 LOG_BASE（LOG_BASE 可用 --env 改）
+FLEET_PARALLEL_DEFAULT = 64
+POLL_S_DEFAULT = 15                     # 每台多久輪詢一次（心跳 + 增量拉回）
+STATUS_S = 30                           # 多久印一次整體進度、寫 fleet_state.json
+HEARTBEAT_LOST_S = 120                  # 這麼久輪詢都失敗 → lost（之後恢復會回到 running）
+EXEC_TIMEOUT_S = 60                     # 放核心、啟動、送訊號
+PULL_TIMEOUT_S = 300
+PULL_CAP_BYTES = 64 << 20               # 每台每次輪詢最多拉這麼多，其餘下一輪
+PULL_CHUNK_BYTES = 8 << 20              # 單一檔案每次最多
+DEADLINE_PAD_S = 900                    # DURATION + WORKLOAD_GRACE_S 之外再給的時間（setup、報告、打包）
+STOP_WAIT_S = 300                       # 送 SIGTERM 後等核心收尾的上限
+SSH_OPTS = ("-o", "BatchMode=yes", "-o", "ConnectTimeout=10", "-o", "ServerAliveInterval=15", "-o", "ServerAliveCountMax=4",
+            "-o", "ControlMaster=auto", "-o", "ControlPersist=120",
+            "-o", "ControlPath=" + os.path.join(tempfile.gettempdir(), "ptu-fleet-%C"))
+# 控制端的這些環境變數原樣帶到每台（其他用 --env KEY=VAL）
+FORWARD_ENV = ("DURATION", "LOAD", "PROFILE", "CORES", "SHARD", "GOVERNOR", "PTU_BIN", "PTU_TEMPLATE", "PTU_OPS_KEY",
+               "SOAK_KERNEL", "FREQ_SAMPLER", "RAPL_INTERVAL", "FAILFAST", "WARMUP_S", "FREQ_DROP_PCT", "SUSTAIN_S",
+               "TEMP_LIMIT_C", "PL_NEAR_PCT", "DEAD_BUSY_PCT", "DEAD_CORE_S", "WORKLOAD_GRACE_S", "TELEMETRY_BIN", "PACKAGE_COMPRESS")
+
+# 在節點上跑（python3 -c）：確認核心還活著、列出 run 目錄，回傳每個檔案從上次 offset 之後新增的 bytes。
+# 輸出：一行 JSON {alive, files}，之後每段是一行 JSON [相對路徑, offset, 長度] + 原始 bytes。
+PULL_PY = r'''
+import os, sys, json
+a = json.loads(sys.stdin.readline())
+try:
+    with open("/proc/%d/cmdline" % a["pid"], "rb") as f: alive = b"PTU_CPU_Verify" in f.read()
+except (OSError, TypeError):
+    alive = False
+fs = []
+for root in a["roots"]:
+    p = os.path.join(a["base"], root)
+    walk = [(a["base"], [], [root])] if os.path.isfile(p) else os.walk(p)
+    for d, _, ns in walk:
+        for n in ns:
+            try: fs.append((os.path.relpath(os.path.join(d, n), a["base"]), os.stat(os.path.join(d, n)).st_size))
+            except OSError: pass
+out = sys.stdout.buffer
+out.write((json.dumps({"alive": alive, "files": fs}) + "\n").encode())
+cap = a["cap"]
+for rel, size in fs:
+    o = a["off"].get(rel, 0)
+    if o > size: o = 0
+    n = min(size - o, cap, a["chunk"])
+    if n <= 0: continue
+    try:
+        with open(os.path.join(a["base"], rel), "rb") as f:
+            f.seek(o); data = f.read(n)
+    except OSError:
+        continue
+    out.write((json.dumps([rel, o, len(data)]) + "\n").encode())
+    out.write(data)
+    cap -= len(data)
+'''
+
+# ====== transport：只負責把一段 shell 指令送到節點上執行 ======
+class LocalTransport(object):
+    kind = "local"
+    def __init__(self, target): self.target = target
+    def argv(self, cmd): return ["sh", "-c", cmd]
+
+class SshTransport(object):
+    kind = "ssh"
+    def __init__(self, target, opts=()): self.target, self.opts = target, list(SSH_OPTS) + list(opts)
+    def argv(self, cmd): return ["ssh"] + self.opts + [self.target, cmd]
+
+TRANSPORTS = {"ssh": SshTransport, "local": LocalTransport}
+
+# ====== inventory ======
+def load_inventory(fp):
+    hosts, seen = [], set()
+    with open(fp, encoding="utf-8") as f:
+        for no, ln in enumerate(f, 1):
+            tok = ln.split("#", 1)[0].split()
+            if not tok: continue
+            name, kv = tok[0], {}
+            for t in tok[1:]:
+                if "=" not in t: raise SystemExit(f"{fp}:{no}: expected KEY=VAL, got {t!r}")
+                k, v = t.split("=", 1)
+                kv[k] = v
+            if not re.match(r"[\w.@:-]+$", name): raise SystemExit(f"{fp}:{no}: bad host name {name!r}")
+            if name in seen: raise SystemExit(f"{fp}:{no}: duplicate host {name}")
+            seen.add(name)
+            hosts.append({"name": name, "target": kv.pop("ssh", name), "env": kv})
+    if not hosts: raise SystemExit(f"{fp}: no hosts")
+    return hosts
+
+# ====== 每台的狀態 ======
+class Host(object):
+    def __init__(self, name, target, env, transport, remote_dir, out_dir):
+        self.name, self.target, self.env, self.tr = name, target, env, transport
+        self.remote_dir, self.out_dir = remote_dir, out_dir
+        self.base = env["LOG_BASE"]
+        self.duration = int(env.get("DURATION", core.DURATION_DEFAULT))
+        self.status = "queued"          # queued / staging / running / lost / stopping / done / failed / timeout / skipped
+        self.pid = self.started = self.ended = self.killed = None
+        self.last_seen = None
+        self.offsets = {}               # 相對路徑 -> 已拉回的 bytes
+        self.pulled = 0
+        self.last_line = ""
+        self.error = ""
+
+    def state(self):
+        t = time.time()
+        return {"host": self.name, "target": self.target, "transport": self.tr.kind, "status": self.status, "pid": self.pid,
+                "started": self.started, "ended": self.ended, "heartbeat_age_s": round(t - self.last_seen, 1) if self.last_seen else None,
+                "progress_pct": self.progress(), "pulled_bytes": self.pulled, "last_line": self.last_line, "error": self.error}
+
+    def progress(self):
+        if not self.started: return 0.0
+        if self.status in ("done", "failed", "timeout"): return 100.0
+        return round(min(99.0, (time.time() - self.started)/max(1, self.duration)*100), 1)
+
+# ====== 控制端：asyncio 同時看所有節點 ======
+class Fleet(object):
+    def __init__(self, hosts, out_dir, ts, parallel=FLEET_PARALLEL_DEFAULT, poll_s=POLL_S_DEFAULT, python="python3"):
+        self.hosts, self.out_dir, self.ts = hosts, out_dir, ts
+        self.parallel, self.poll_s, self.python = max(1, parallel), max(1.0, poll_s), python
+        self.core_src = (HERE / CORE_FILE).read_bytes()
+        self.fleet_log = os.path.join(out_dir, "fleet.log")
+        self.stopping = False
+        self.main_task = None
+        self._wake = None
+
+    def log(self, s):
+        line = f"{core.now()} | {s}\n"
+        core.plain_write(self.fleet_log, line)
+        sys.stdout.write(line); sys.stdout.flush()
+
+    async def exec(self, h, cmd, stdin=None, timeout=EXEC_TIMEOUT_S):
+        p = await asyncio.create_subprocess_exec(*h.tr.argv(cmd), stdin=asyncio.subprocess.PIPE if stdin is not None else asyncio.subprocess.DEVNULL,
+                                                 stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            out, err = await asyncio.wait_for(p.communicate(stdin), timeout)
+        except asyncio.TimeoutError:
+            p.kill(); await p.wait()
+            raise RuntimeError(f"timed out after {timeout}s")
+        return p.returncode, out.decode("utf-8", "replace"), err.decode("utf-8", "replace")
+
+    # ---- 放核心、背景啟動 ----
+    async def start(self, h):
+        h.status = "staging"
+        rd = shlex.quote(h.remote_dir)
+        rc, _, err = await self.exec(h, f"mkdir -p {rd} && cat > {rd}/{CORE_FILE}", stdin=self.core_src)
+        if rc: raise RuntimeError(f"staging failed (rc={rc}): {err.strip()[-200:]}")
+        env = " ".join(shlex.quote(f"{k}={v}") for k,v in sorted(h.env.items()))
+        out = shlex.quote(os.path.join(h.base, f"fleet_{self.ts}.out"))
+        rc, so, err = await self.exec(h, f"mkdir -p {shlex.quote(h.base)} && cd {rd} && S=$(command -v setsid); "
+                                         f"$S nohup env {env} {self.python} {rd}/{CORE_FILE} > {out} 2>&1 < /dev/null & echo $!")
+        try: h.pid = int(so.split()[-1])
+        except (ValueError, IndexError): raise RuntimeError(f"start failed (rc={rc}): {(err or so).strip()[-200:]}")
+        h.started = h.last_seen = time.time()
+        h.status = "running"
+        self.log(f"[INFO] {h.name}: started pid {h.pid} on {h.target} ({h.tr.kind})")
+
+    async def kill(self, h, why):
+        h.killed, h.status = time.time(), "stopping"
+        self.log(f"[WARN] {h.name}: {why} — sending SIGTERM (core still writes its reports)")
+        try: await self.exec(h, f"kill -TERM {h.pid}")
+        except (OSError, RuntimeError) as e: self.log(f"[WARN] {h.name}: kill failed: {e}")
+
+    # ---- 增量拉回 ----
+    async def pull(self, h):
+        req = {"base": h.base, "roots": [f"run_{self.ts}", f"fleet_{self.ts}.out"], "off": h.offsets, "pid": h.pid,
+               "cap": PULL_CAP_BYTES, "chunk": PULL_CHUNK_BYTES}
+        p = await asyncio.create_subprocess_exec(*h.tr.argv(f"{self.python} -c {shlex.quote(PULL_PY)}"), stdin=asyncio.subprocess.PIPE,
+                                                 stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        p.stdin.write((json.dumps(req) + "\n").encode()); p.stdin.close()
+        try:
+            return await asyncio.wait_for(self._recv(h, p), PULL_TIMEOUT_S)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+            if p.returncode is None: p.kill()
+            raise
+        finally:
+            await p.wait()
+
+    def _local(self, h, rel):
+        if os.path.isabs(rel) or ".." in Path(rel).parts: raise ValueError(f"bad path from node: {rel}")
+        fp = os.path.join(h.out_dir, rel)
+        core.mkdir_p(os.path.dirname(fp))
+        return fp
+
+    async def _recv(self, h, p):
+        head = json.loads((await p.stdout.readline()).decode() or "null")
+        if not isinstance(head, dict): raise ValueError("no reply from node")
+        got = 0
+        for rel, size in head["files"]:
+            if size == 0 and rel not in h.offsets:          # 空檔案不會有資料段，先建好
+                open(self._local(h, rel), "wb").close()
+                h.offsets[rel] = 0
+        while True:
+            ln = await p.stdout.readline()
+            if not ln: break
+            rel, off, n = json.loads(ln.decode())
+            data = await p.stdout.readexactly(n)
+            fp = self._local(h, rel)
+            with open(fp, "r+b" if off and os.path.exists(fp) else "wb") as f:
+                f.seek(off); f.write(data)
+            h.offsets[rel] = off + n
+            got += n
+            if os.path.basename(rel).startswith("console_"):
+                tail = [x for x in data.decode("utf-8", "replace").splitlines() if x.strip()]
+                if tail: h.last_line = tail[-1][:200]
+        h.pulled += got
+        return head["alive"], got
+
+    # ---- 一台從頭到尾 ----
+    async def one(self, h, sem):
+        async with sem:
+            if self.stopping:
+                h.status = "skipped"; return
+            try:
+                await self.start(h)
+                await self.watch(h)
+            except (OSError, RuntimeError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                h.status, h.error = "failed", str(e) or type(e).__name__
+                self.log(f"[FAIL] {h.name}: {e}")
+            h.ended = h.ended or time.time()
+
+    async def watch(self, h):
+        deadline = h.started + h.duration + int(h.env.get("WORKLOAD_GRACE_S", core.WORKLOAD_GRACE_S_DEFAULT)) + DEADLINE_PAD_S
+        timed_out = False
+        while True:
+            if self._wake.done(): await asyncio.sleep(self.poll_s)
+            else:
+                try: await asyncio.wait_for(asyncio.shield(self._wake), self.poll_s)
+                except asyncio.TimeoutError: pass
+            t = time.time()
+            try:
+                alive, _ = await self.pull(h)
+            except (OSError, RuntimeError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                if h.status in ("running", "stopping") and t - h.last_seen > HEARTBEAT_LOST_S:
+                    h.status = "lost"
+                    self.log(f"[WARN] {h.name}: no heartbeat for {t - h.last_seen:.0f}s ({e})")
+                alive = True
+            else:
+                if h.status == "lost": self.log(f"[INFO] {h.name}: heartbeat back after {t - h.last_seen:.0f}s")
+                h.last_seen = t
+                if h.status == "lost": h.status = "stopping" if h.killed else "running"
+            if not alive:
+                while (await self.pull(h))[1]: pass           # 收尾：拉到沒有新資料為止
+                break
+            if h.killed is None and (self.stopping or t > deadline):
+                timed_out = not self.stopping
+                await self.kill(h, "fleet stopping" if self.stopping else f"still running {t - h.started:.0f}s after start")
+            elif h.killed is not None and t - h.killed > STOP_WAIT_S:
+                h.error = f"did not exit within {STOP_WAIT_S}s of SIGTERM"
+                self.log(f"[FAIL] {h.name}: {h.error}")
+                h.status, h.ended = "timeout", t
+                return
+        h.ended = time.time()
+        summ = os.path.join(h.out_dir, f"run_{self.ts}", "Albert_Summary.json")
+        if timed_out: h.status = "timeout"
+        elif os.path.exists(summ): h.status = "done"
+        else:
+            try:
+                with open(os.path.join(h.out_dir, f"fleet_{self.ts}.out"), encoding="utf-8", errors="replace") as f:
+                    tail = [x.strip() for x in f.read().splitlines() if x.strip()][-1:]
+            except OSError: tail = []
+            h.status, h.error = "failed", f"no Albert_Summary.json" + (f" — {tail[0][:200]}" if tail else f" (see fleet_{self.ts}.out)")
+        verdict = "FAIL"
+        if h.status == "done":
+            try:
+                with open(summ, encoding="utf-8") as f: verdict = json.load(f).get("verdict") or "FAIL"
+            except (OSError, ValueError): pass
+        self.log(f"[{verdict}] {h.name}: {h.status} after {h.ended - h.started:.0f}s, "
+                 f"{h.pulled/1e6:.1f} MB pulled")
+
+    # ---- 整體進度 ----
+    def write_state(self):
+        st = {"ts": self.ts, "updated": core.now(), "hosts": [h.state() for h in self.hosts]}
+        tmp = os.path.join(self.out_dir, "fleet_state.json.part")
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(st, f, indent=1)
+        os.replace(tmp, os.path.join(self.out_dir, "fleet_state.json"))
+
+    def status_line(self):
+        cnt = {}
+        for h in self.hosts: cnt[h.status] = cnt.get(h.status, 0) + 1
+        run = [h for h in self.hosts if h.status in ("running", "lost", "stopping")]
+        prog = sum(h.progress() for h in run)/len(run) if run else 0.0
+        return ", ".join(f"{k} {v}" for k,v in sorted(cnt.items())) + (f" — avg progress {prog:.0f}%" if run else "")
+
+    async def ticker(self):
+        while True:
+            await asyncio.sleep(STATUS_S)
+            self.write_state()
+            self.log(f"[INFO] fleet: {self.status_line()}")
+            for h in self.hosts:
+                if h.status == "lost": self.log(f"[WARN]   {h.name}: lost, last heartbeat {time.time() - h.last_seen:.0f}s ago")
+            core.flush_logs()                   # plain_write 是緩衝寫入，fleet.log 至少每 STATUS_S 寫出一次
+
+    def stop(self):
+        if self.stopping:
+            self.log("[WARN] second interrupt — leaving remaining nodes running")
+            if self.main_task: self.main_task.cancel()
+            return
+        self.stopping = True
+        self.log("[WARN] interrupt — stopping all nodes (SIGTERM), waiting for their reports")
+        if not self._wake.done(): self._wake.set_result(True)
+
+    async def run(self):
+        self._wake = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)().create_future()    # stop() 時叫醒所有輪詢（3.6 沒有 get_running_loop）
+        sem = asyncio.Semaphore(self.parallel)
+        tick = asyncio.ensure_future(self.ticker())
+        try:
+            await asyncio.gather(*[self.one(h, sem) for h in self.hosts])
+        finally:
+            tick.cancel()
+            self.write_state()
+
+# ====== fleet 報告：合併每台摘要，依與中位數的差距排名 ======
+# robust z = (值 − 中位數) / max(1.4826·MAD, 中位數的 MIN_SPREAD_PCT%, 絕對下限)；方向 −1 越低越差、+1 越高越差、0 兩邊都算
+RANK_METRICS = (("p50_mhz", -1, "freq p50", 10.0), ("p1_mhz", -1, "freq p1", 10.0), ("avg_w", 0, "power", 2.0),
+                ("max_temp_c", +1, "temp max", 1.0), ("throttle_s", +1, "throttle", 5.0), ("ops_j", -1, "ops/J", 0.0))
+OUTLIER_Z = 3.5
+MIN_SPREAD_PCT = 1.0
+FAIL_SCORE = 100.0                      # 沒跑完 / FAIL 的節點排最前面
+
+def load_fleet(out_dir):
+    st_fp = os.path.join(out_dir, "fleet_state.json")
+    with open(st_fp, encoding="utf-8") as f: st = json.load(f)
+    rows = []
+    for hs in st["hosts"]:
+        s = None
+        fp = os.path.join(out_dir, hs["host"], f"run_{st['ts']}", "Albert_Summary.json")
+        if os.path.exists(fp):
+            try:
+                with open(fp, encoding="utf-8") as f: s = json.load(f)
+            except ValueError: s = None
+        rows.append({"host": hs["host"], "state": hs, "s": s})
+    return st, rows
+
+def rank_fleet(rows):
+    for r in rows:
+        r.update(score=0.0, flags=[], z={})
+        if r["state"]["status"] != "done" or not r["s"]:
+            r["score"] += FAIL_SCORE
+            r["flags"].append(f"{r['state']['status']}{': ' + r['state']['error'] if r['state'].get('error') else ''}")
+        elif r["s"].get("verdict") != "PASS":
+            r["score"] += FAIL_SCORE
+            r["flags"].append("verdict FAIL: " + "; ".join(r["s"].get("reasons") or [])[:200])
+    units = [r["s"].get("ops_unit") for r in rows if r["s"] and r["s"].get("ops_unit")]
+    unit = max(set(units), key=units.count) if units else None       # ops/J 只比跑同一種 workload 的節點
+    med = {}
+    for key, sign, label, floor in RANK_METRICS:
+        have = [r for r in rows if r["s"] and r["s"].get(key) is not None and (key != "ops_j" or r["s"].get("ops_unit") == unit)]
+        if len(have) < 3: continue
+        vals = [float(r["s"][key]) for r in have]
+        m = statistics.median(vals)
+        scale = max(1.4826*statistics.median([abs(v - m) for v in vals]), abs(m)*MIN_SPREAD_PCT/100.0, floor, 1e-9)
+        med[key] = m
+        for r, v in zip(have, vals):
+            z = (v - m)/scale
+            bad = abs(z) if sign == 0 else max(0.0, sign*z)
+            r["z"][key] = round(z, 2)
+            r["score"] += bad
+            if bad >= OUTLIER_Z: r["flags"].append(f"{label} {v:.4g} vs fleet {m:.4g} ({z:+.1f}σ)")
+    rows.sort(key=lambda r: -r["score"])
+    return med
+
+REPORT_COLS = ("host", "status", "verdict", "p1_mhz", "p50_mhz", "avg_w", "peak_w", "max_temp_c", "throttle_s", "ops_s", "ops_j")
+
+def _cell(r, c):
+    v = r["state"]["status"] if c == "status" else r["host"] if c == "host" else (r["s"] or {}).get(c)
+    return "-" if v is None else (f"{v:.4g}" if c.startswith("ops_") else f"{v:.1f}" if isinstance(v, float) else str(v))
+
+def write_fleet_report(out_dir, log=print):
+    st, rows = load_fleet(out_dir)
+    med = rank_fleet(rows)
+    ok = [r for r in rows if r["state"]["status"] == "done" and r["s"]]
+    npass = sum(1 for r in ok if r["s"].get("verdict") == "PASS")
+    outl = [r for r in rows if r["flags"]]
+    t0 = min((r["state"]["started"] for r in rows if r["state"].get("started")), default=None)
+    t1 = max((r["state"]["ended"] for r in rows if r["state"].get("ended")), default=None)
+    fmt_t = lambda t: datetime.datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S") if t else "-"
+    head = [f"Fleet      : {out_dir}",
+            f"Hosts      : {len(rows)} ({len(ok)} finished, {len(rows) - len(ok)} not) · PASS {npass} · FAIL {len(ok) - npass}",
+            f"Window     : {fmt_t(t0)} → {fmt_t(t1)}" + (f" ({(t1 - t0)/60:.1f} min)" if t0 and t1 else ""),
+            "Median     : " + (", ".join(f"{k} {v:.4g}" for k,v in med.items()) or "n/a (need ≥3 finished hosts)"),
+            f"Outliers   : {len(outl)} (|robust z| ≥ {OUTLIER_Z} or not PASS)"]
+    w = {c: max([len(c)] + [len(_cell(r, c)) for r in rows]) for c in REPORT_COLS}
+    lines = ["  ".join(["rank"] + [c.ljust(w[c]) for c in REPORT_COLS] + ["score  flags"])]
+    for i, r in enumerate(rows, 1):
+        lines.append("  ".join([f"{i:<4}"] + [_cell(r, c).ljust(w[c]) for c in REPORT_COLS] + [f"{r['score']:<5.1f}  " + "; ".join(r["flags"])]))
+    with open(os.path.join(out_dir, "Fleet_Report.txt"), "w", encoding="utf-8") as f:
+        f.write("==== PTU CPU Verify — Fleet Report ====\n" + "\n".join(head) + "\n\n-- Ranking (worst first) --\n" + "\n".join(lines) + "\n")
+    with open(os.path.join(out_dir, "Fleet_Report.json"), "w", encoding="utf-8") as f:
+        json.dump({"ts": st["ts"], "hosts": len(rows), "finished": len(ok), "pass": npass, "median": med,
+                   "ranking": [{"rank": i, "host": r["host"], "status": r["state"]["status"], "score": round(r["score"], 2),
+                                "flags": r["flags"], "z": r["z"], **{c: (r["s"] or {}).get(c) for c in REPORT_COLS[2:]},
+                                "run_dir": os.path.join(r["host"], f"run_{st['ts']}")} for i, r in enumerate(rows, 1)]}, f, indent=1)
+    trs = "".join("<tr%s><td>%d</td>%s<td>%.1f</td><td>%s</td></tr>" % (' class="bad"' if r["flags"] else "", i,
+                  "".join(f"<td>{escape(_cell(r, c))}</td>" for c in REPORT_COLS), r["score"], "<br>".join(escape(x) for x in r["flags"]))
+                  for i, r in enumerate(rows, 1))
+    doc = f"""<!doctype html><meta charset="utf-8"><title>Albert Fleet Report</title>
+<style>body{{font-family:system-ui,Segoe UI,Roboto,Arial,sans-serif;background:#fafafa;margin:24px}}
+.card{{background:#fff;border-radius:16px;box-shadow:0 6px 20px rgba(0,0,0,.08);padding:20px;max-width:1200px}}
+table{{border-collapse:collapse;width:100%}}td,th{{padding:6px 8px;border-bottom:1px solid #eee;font-size:13px;text-align:left;vertical-align:top}}
+tr.bad{{background:#fff5f5}}pre{{font-size:13px;color:#444}}</style>
+<div class="card"><h2>PTU CPU Verify — Fleet Report</h2><pre>{escape(chr(10).join(head))}</pre>
+<table><tr><th>rank</th>{"".join(f"<th>{c}</th>" for c in REPORT_COLS)}<th>score</th><th>flags</th></tr>{trs}</table>
+<div style="color:#777;margin-top:10px;font-size:12px">Generated at {core.now()}</div></div>"""
+    with open(os.path.join(out_dir, "Fleet_Report.html"), "w", encoding="utf-8") as f: f.write(doc)
+    log(f"Fleet report: {os.path.join(out_dir, 'Fleet_Report.txt')} — {len(ok)}/{len(rows)} finished, {npass} PASS, {len(outl)} flagged")
+    for r in outl[:10]: log(f"  {r['host']}: {'; '.join(r['flags'])}")
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run PTU_CPU_Verify on many nodes at once and merge the results")
+    ap.add_argument("inventory", nargs="?", help="hosts file：`名稱 [ssh=user@addr] [KEY=VAL ...]`")
+    ap.add_argument("--transport", choices=sorted(TRANSPORTS), default="ssh")
+    ap.add_argument("--parallel", type=int, default=FLEET_PARALLEL_DEFAULT, help="同時跑幾台")
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VAL", help="帶給每台的環境變數（可重複）")
+    ap.add_argument("--remote-dir", default=REMOTE_DIR_DEFAULT, help="節點上放核心的目錄（local transport 會再加 /<名稱>）")
+    ap.add_argument("--python", default="python3", help="節點上的 python3")
+    ap.add_argument("--ssh-opt", action="append", default=[], help="額外的 ssh 參數（可重複，例如 --ssh-opt=-p2222）")
+    ap.add_argument("--poll", type=float, default=POLL_S_DEFAULT, help="每台輪詢間隔（秒）")
+    ap.add_argument("--out", help="結果目錄（預設 LOG_BASE/fleet_YYYYmmdd_HHMMSS）")
+    ap.add_argument("--report", metavar="FLEET_DIR", help="只用已拉回的結果重出報告")
+    a = ap.parse_args(argv)
+    if a.report:
+        write_fleet_report(a.report)
+        return
+    if not a.inventory: ap.error("inventory is required")
+
+    env = {k: os.environ[k] for k in FORWARD_ENV if k in os.environ}
+    for kv in a.env:
+        if "=" not in kv: ap.error(f"--env expects KEY=VAL, got {kv!r}")
+        k, v = kv.split("=", 1)
+        env[k] = v
+    if env.get("CAMPAIGN") or env.get("CAMPAIGN_DIR"): raise SystemExit("CAMPAIGN is not supported by the fleet runner")
+    env.pop("METRICS_ADDR", None)           # 每台各自的 port 沒人會連，不開
+
+    ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    out_dir = a.out or os.path.join(os.environ.get("LOG_BASE", core.LOG_BASE_DEFAULT), f"fleet_{ts}")
+    core.mkdir_p(out_dir)
+    hosts = []
+    for d in load_inventory(a.inventory):
+        tr = SshTransport(d["target"], a.ssh_opt) if a.transport == "ssh" else LocalTransport(d["target"])
+        rdir = os.path.join(a.remote_dir, d["name"]) if a.transport == "local" else a.remote_dir
+        henv = dict(env, RUN_TS=ts)
+        henv.update(d["env"])
+        henv.setdefault("LOG_BASE", os.path.join(rdir, "PtuLog"))
+        hosts.append(Host(d["name"], d["target"], henv, tr, rdir, os.path.join(out_dir, d["name"])))
+
+    fleet = Fleet(hosts, out_dir, ts, a.parallel, a.poll, a.python)
+    fleet.log(f"[INFO] Fleet {ts}: {len(hosts)} hosts via {a.transport}, parallel {fleet.parallel}, poll {fleet.poll_s:.0f}s → {out_dir}")
+    loop = asyncio.new_event_loop()                 # 跟核心 run_step 一樣自己建 loop，不靠 get_event_loop 的隱式建立
+    asyncio.set_event_loop(loop)
+    for sig in (signal.SIGINT, signal.SIGTERM): loop.add_signal_handler(sig, fleet.stop)
+    fleet.main_task = loop.create_task(fleet.run())
+    try:
+        loop.run_until_complete(fleet.main_task)
+    except asyncio.CancelledError:
+        fleet.write_state()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM): loop.remove_signal_handler(sig)
+        loop.close()
+        asyncio.set_event_loop(None)
+    rows = write_fleet_report(out_dir, log=lambda s: fleet.log(f"[INFO] {s}"))
+    sys.exit(0 if all(not r["flags"] for r in rows) else 1)
+
+if __name__ == "__main__":
+    main()
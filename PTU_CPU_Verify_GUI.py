@@ -6,34 +6,84 @@
 #  - 內建常用預設：serverlab / 100% / performance / all cores
 #  - 一鍵 1h / 6h / 12h / 24h；也可自訂秒數
 #  - 儲存/載入上次參數（~/.ptu_cpu_verify_gui.json）
-#  - 內建「檢視目前進程」：pgrep -af 'ptat|turbostat|stress-ng|yes'
+#  - 內建「檢視目前進程」：直接掃 /proc/*/cmdline（同 pgrep -af 'ptat|turbostat|stress-ng|yes'，不 fork，不擾動量測）
+#  - 即時監看：保留核心 process handle，依 byte offset 追 console/telemetry，畫頻率/功耗曲線；Stop 乾淨收尾
+#  - 核心開 METRICS_ADDR（本機隨機 port）時，曲線直接讀 /live.json（背景 thread 抓，UI 不會被慢的核心卡住），不再追 telemetry 檔
 # =============================================================================
-import os, json, subprocess, sys, tkinter as tk
+import os, re, json, time, queue, signal, socket, threading, importlib.util, subprocess, sys, urllib.request, tkinter as tk
+from collections import deque
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
 
 APP_TITLE = "PTU CPU Verify — Albert GUI (Tk)"
 STATE_FILE = Path.home()/".ptu_cpu_verify_gui.json"
 CORE_FILE = "PTU_CPU_Verify.py"   # 與核心同資料夾
+POLL_MS = 1000                    # 即時監看輪詢間隔
+CHART_POINTS = 900                # 圖上保留的最近點數（記憶體固定）
+STOP_GRACE_S = 30                 # Stop 後等核心收尾的秒數，逾時才強制 kill
+LIVE_TIMEOUT_S = 0.3              # 讀核心 /live.json 的 timeout（本機，通常 <10ms）
+PROC_PATTERN = "ptat|turbostat|stress-ng|yes"   # 「檢視目前進程」比對完整命令列
 
 def which(cmd):
     from shutil import which as _w
     return _w(cmd)
 
 def run_cmd(cmd, env=None):
-    return subprocess.Popen(cmd, shell=True, env=env)
+    # 新 session：Stop 時可以只對核心送 SIGTERM，逾時再收整個 group
+    return subprocess.Popen(cmd, shell=True, env=env, start_new_session=True)
 
-def pgrep_snapshot():
+def free_port():
+    s = socket.socket()
     try:
-        out = subprocess.check_output(
-            "pgrep -af 'ptat|turbostat|stress-ng|yes'",
-            shell=True,
-            universal_newlines=True,  # Py3.6 相容
-            stderr=subprocess.STDOUT
-        )
-        return out.strip()
-    except subprocess.CalledProcessError:
-        return ""
+        s.bind(("127.0.0.1", 0)); return s.getsockname()[1]
+    finally:
+        s.close()
+
+def live_url(addr):
+    host, _, port = addr.rpartition(":")
+    return f"http://{'127.0.0.1' if host in ('', '0.0.0.0') else host}:{port}/live.json"
+
+class LiveFetcher(threading.Thread):
+    # 背景抓 /live.json，結果丟進 queue；Tk 主執行緒只在 after() 裡取，核心再慢也不會卡住 UI
+    def __init__(self, url, interval):
+        super().__init__(name="live-fetch", daemon=True)
+        self.url, self.interval, self.seq = url, interval, 0
+        self.q = queue.Queue()
+        self._stop_ev = threading.Event()
+
+    def run(self):
+        while not self._stop_ev.is_set():
+            try:
+                with urllib.request.urlopen(f"{self.url}?since={self.seq}", timeout=LIVE_TIMEOUT_S) as r:
+                    d = json.loads(r.read().decode("utf-8"))
+                self.seq = d["seq"]
+                self.q.put(d)
+            except (OSError, ValueError, KeyError):
+                pass
+            self._stop_ev.wait(self.interval)
+
+    def stop(self): self._stop_ev.set()
+
+def load_core(path):
+    # 借用核心的 FileTail / turbostat 串流解析（Tstat）；載入失敗回 None
+    try:
+        spec = importlib.util.spec_from_file_location("ptu_cpu_verify_core", path)
+        mod = importlib.util.module_from_spec(spec); spec.loader.exec_module(mod)
+        return mod
+    except Exception:
+        return None
+
+def proc_snapshot(pattern=PROC_PATTERN):
+    # 輸出跟 pgrep -af 一樣（pid 命令列），但只讀 /proc，不 fork
+    rx, me, out = re.compile(pattern), os.getpid(), []
+    for d in os.listdir("/proc"):
+        if not d.isdigit() or int(d) == me: continue
+        try:
+            with open(f"/proc/{d}/cmdline", "rb") as f: cmd = f.read().rstrip(b"\0").replace(b"\0", b" ").decode("utf-8", "replace")
+        except OSError:
+            continue
+        if cmd and rx.search(cmd): out.append((int(d), cmd))
+    return "\n".join(f"{pid} {cmd}" for pid, cmd in sorted(out))
 
 def load_state():
     if STATE_FILE.exists():
@@ -67,8 +117,8 @@ class App(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title(APP_TITLE)
-        self.geometry("760x520")
-        self.minsize(720, 500)
+        self.geometry("860x720")
+        self.minsize(760, 620)
 
         self.state = load_state()
 
@@ -78,10 +128,24 @@ class App(tk.Tk):
         self.var_load = tk.StringVar(value=str(self.state.get("LOAD", 100)))
         self.var_governor = tk.StringVar(value=self.state.get("GOVERNOR", "performance"))
         self.var_cores = tk.StringVar(value=self.state.get("CORES", "all"))
+        self.var_shard = tk.StringVar(value=self.state.get("SHARD", "none"))
         self.var_profile = tk.StringVar(value=self.state.get("PROFILE", "serverlab"))
         self.var_template = tk.StringVar(value=self.state.get("PTU_TEMPLATE", '"{PTU_BIN}" -ct 3 -cp {LOAD} -t {DURATION} -y -q'))
 
+        self.proc = None
+        self.run_dir = None
+        self.tails = {}
+        self.tstat = None
+        self.freq = deque(maxlen=CHART_POINTS)
+        self.power = deque(maxlen=CHART_POINTS)
+        self._ts_n = 0
+        self._stop_t = None
+        self.fetch = None
+        self._live_ok = False
+        self._stage = ""
+
         self._build()
+        self.protocol("WM_DELETE_WINDOW", self.quit_app)
 
     def _build(self):
         frm = ttk.Frame(self, padding=12)
@@ -112,8 +176,10 @@ class App(tk.Tk):
         gov_cb.grid(row=r, column=2, sticky="w")
         r += 1
 
-        ttk.Label(frm, text="Cores (all or start-end)").grid(row=r, column=0, sticky="w")
+        ttk.Label(frm, text="Cores (all, 0-15,32-47, pkg0, node1, ^smt1)").grid(row=r, column=0, sticky="w")
         ttk.Entry(frm, textvariable=self.var_cores, width=20).grid(row=r, column=1, sticky="w", padx=8)
+        ttk.Label(frm, text="Shard").grid(row=r, column=1, sticky="e")
+        ttk.Combobox(frm, values=["none","pkg","node"], textvariable=self.var_shard, width=14, state="readonly").grid(row=r, column=2, sticky="w")
         r += 1
 
         ttk.Label(frm, text="PTU profile").grid(row=r, column=0, sticky="w")
@@ -126,13 +192,22 @@ class App(tk.Tk):
         r += 1
 
         btn_row = ttk.Frame(frm); btn_row.grid(row=r, column=0, columnspan=3, pady=8, sticky="we")
-        ttk.Button(btn_row, text="Start", command=self.start).pack(side="left")
+        self.btn_start = ttk.Button(btn_row, text="Start", command=self.start); self.btn_start.pack(side="left")
+        self.btn_stop = ttk.Button(btn_row, text="Stop", command=self.stop, state="disabled"); self.btn_stop.pack(side="left", padx=8)
         ttk.Button(btn_row, text="View processes", command=self.show_processes).pack(side="left", padx=8)
         ttk.Button(btn_row, text="Save defaults", command=self.save_defaults).pack(side="left", padx=8)
-        ttk.Button(btn_row, text="Quit", command=self.destroy).pack(side="right")
+        ttk.Button(btn_row, text="Quit", command=self.quit_app).pack(side="right")
         r += 1
 
-        self.txt = tk.Text(frm, height=14); self.txt.grid(row=r, column=0, columnspan=3, sticky="nsew", pady=(8,0))
+        self.var_status = tk.StringVar(value="Idle")
+        ttk.Label(frm, textvariable=self.var_status).grid(row=r, column=0, columnspan=3, sticky="w")
+        r += 1
+        self.chart = tk.Canvas(frm, height=200, background="#fcfcff", highlightthickness=1, highlightbackground="#ddd")
+        self.chart.grid(row=r, column=0, columnspan=3, sticky="we", pady=(4,0))
+        self.chart.bind("<Configure>", lambda e: self._draw_chart())
+        r += 1
+
+        self.txt = tk.Text(frm, height=12); self.txt.grid(row=r, column=0, columnspan=3, sticky="nsew", pady=(8,0))
         frm.grid_rowconfigure(r, weight=1); frm.grid_columnconfigure(1, weight=1)
 
         self._append("提示：這個 GUI 只是一層殼，會以 root 身份啟動 PTU_CPU_Verify.py（Albert Style）。\n")
@@ -156,6 +231,7 @@ class App(tk.Tk):
             "LOAD": int(self.var_load.get() or "100"),
             "GOVERNOR": self.var_governor.get(),
             "CORES": self.var_cores.get(),
+            "SHARD": self.var_shard.get(),
             "PROFILE": self.var_profile.get(),
             "PTU_TEMPLATE": self.var_template.get(),
         }
@@ -163,8 +239,8 @@ class App(tk.Tk):
         messagebox.showinfo("Saved", f"已儲存預設到 {STATE_FILE}")
 
     def show_processes(self):
-        out = pgrep_snapshot() or "(無相關進程)"
-        self._append("\n=== pgrep -af 'ptat|turbostat|stress-ng|yes' ===\n"+out+"\n")
+        out = proc_snapshot() or "(無相關進程)"
+        self._append(f"\n=== /proc 進程（{PROC_PATTERN}） ===\n"+out+"\n")
 
     def start(self):
         if not ensure_root(): return
@@ -172,6 +248,11 @@ class App(tk.Tk):
         if not Path(core).exists():
             messagebox.showerror("Core not found", f"找不到核心：{core}\n請確認 {CORE_FILE} 與此 GUI 同資料夾。")
             return
+        mod = load_core(core)
+        if mod is None:
+            # 連 import 都失敗的核心也跑不起來：直接擋下，不啟動
+            messagebox.showerror("Core load failed", f"無法載入核心：{core}\n請用 python3 {CORE_FILE} 直接執行看錯誤訊息。")
+            return
         env = os.environ.copy()
         env["LOG_BASE"] = self.var_log.get().strip()
         if self.var_ptu.get().strip(): env["PTU_BIN"] = self.var_ptu.get().strip()
@@ -179,15 +260,23 @@ class App(tk.Tk):
         env["LOAD"] = str(int(self.var_load.get() or "100"))
         env["GOVERNOR"] = self.var_governor.get()
         env["CORES"] = self.var_cores.get().strip() or "all"
+        env["SHARD"] = self.var_shard.get() or "none"
         prof = self.var_profile.get()
         env["PROFILE"] = "simple" if prof=="sse" else prof
         if prof=="custom": env["PTU_TEMPLATE"] = self.var_template.get().strip()
 
+        env["RUN_TS"] = time.strftime("%Y%m%d_%H%M%S")
+        if not env.get("METRICS_ADDR"): env["METRICS_ADDR"] = f"127.0.0.1:{free_port()}"
+        if self.fetch: self.fetch.stop()
+        self.fetch, self._live_ok, self._stage = LiveFetcher(live_url(env["METRICS_ADDR"]), POLL_MS/1000.0), False, ""
+        self.run_dir = os.path.join(env["LOG_BASE"], f"run_{env['RUN_TS']}")
+
         cmd = f'python3 "{core}"'
         try:
-            run_cmd(cmd, env=env)
+            self.proc = run_cmd(cmd, env=env)
         except Exception as e:
             messagebox.showerror("Launch failed", str(e)); return
+        self.fetch.start()
 
         self._append("\n=== Launch ===\n")
         self._append(f"Core      : {core}\n")
@@ -196,10 +285,124 @@ class App(tk.Tk):
         self._append(f"Load      : {env['LOAD']} %\n")
         self._append(f"Governor  : {env['GOVERNOR']}\n")
         self._append(f"Cores     : {env['CORES']}\n")
+        self._append(f"Shard     : {env['SHARD']}\n")
         self._append(f"Profile   : {env['PROFILE']}\n")
         self._append(f"PTU bin   : {env.get('PTU_BIN','<auto>')}\n")
         if env.get("PTU_TEMPLATE"): self._append(f"Template  : {env['PTU_TEMPLATE']}\n")
-        self._append("已啟動。建議 5 秒後點「View processes」確認 ptat / turbostat 有在跑。\n")
+        self._append(f"Run dir   : {self.run_dir}\n")
+        self._append("已啟動。下方會即時顯示 console log 與頻率/功耗曲線；按 Stop 可提前乾淨結束。\n")
+
+        ts = env["RUN_TS"]
+        tel = os.path.join(self.run_dir, "telemetry")
+        self.tails = {
+            "console": mod.FileTail(os.path.join(self.run_dir, f"console_{ts}.log")),
+            "turbostat": mod.FileTail(os.path.join(tel, f"turbostat_{ts}.txt")),
+            "freq": mod.FileTail(os.path.join(tel, f"freq_{ts}.txt")),
+            "rapl": mod.FileTail(os.path.join(tel, f"rapl_{ts}.csv")),
+        }
+        self.tstat = mod.Tstat(cpu_metrics=())      # 只留 summary 列，記憶體固定小
+        self.freq.clear(); self.power.clear(); self._ts_n = 0; self._stop_t = None
+        self._t0 = time.time(); self._duration = int(env["DURATION"])
+        self.btn_start.config(state="disabled"); self.btn_stop.config(state="normal")
+        self.after(POLL_MS, self._poll)
+
+    def stop(self):
+        if not self.proc or self.proc.poll() is not None: return
+        if self._stop_t is None:
+            self._stop_t = time.time()
+            self.proc.send_signal(signal.SIGTERM)
+            self._append("\n=== Stop requested：等待核心收尾（workload / turbostat / governor）===\n")
+        elif messagebox.askyesno("Force stop", "核心還在收尾，要強制結束整個進程群組嗎？"):
+            self._kill()
+
+    def _kill(self):
+        try: os.killpg(self.proc.pid, signal.SIGKILL)
+        except OSError: pass
+
+    def quit_app(self):
+        if self.proc and self.proc.poll() is None:
+            if not messagebox.askyesno("Run in progress", "測試還在跑，要先 Stop 再離開嗎？（否＝保持背景執行）"):
+                self.destroy(); return
+            self.stop()
+            try: self.proc.wait(timeout=STOP_GRACE_S)
+            except subprocess.TimeoutExpired: self._kill()
+        self.destroy()
+
+    def _poll(self):
+        running = self.proc is not None and self.proc.poll() is None
+        for ln in self.tails["console"].lines(): self._append(ln)
+        self._drain_live()
+        if not self._live_ok:
+            # 核心沒開 live endpoint（或還沒起來）：退回追 telemetry 檔
+            if self.tstat is not None:
+                for key in ("turbostat", "freq"):
+                    for ln in self.tails[key].lines(): self.tstat.feed(ln)
+                self._take_freq(final=not running)
+            for ln in self.tails["rapl"].lines():
+                f = ln.split(",")
+                try: self.power.append((float(f[0]), float(f[1])))
+                except (ValueError, IndexError): pass
+        self._draw_chart()
+        el = int(time.time() - self._t0)
+        if running:
+            if self._stop_t and time.time() - self._stop_t > STOP_GRACE_S: self._kill()
+            self.var_status.set(f"Running  {el}s / {self._duration}s  ·  {self._stage + '  ·  ' if self._stage else ''}{self._last_text()}")
+            self.after(POLL_MS, self._poll)
+        else:
+            self.fetch.stop()
+            self.var_status.set(f"Finished (rc={self.proc.returncode})  ·  {self._last_text()}")
+            self.btn_start.config(state="normal"); self.btn_stop.config(state="disabled")
+
+    def _drain_live(self):
+        while self.fetch is not None:
+            try: d = self.fetch.q.get_nowait()
+            except queue.Empty: return
+            if not self._live_ok:
+                self._live_ok = True
+                self.freq.clear(); self.power.clear()     # ring 裡有這一步的完整近況，改用它
+            self._stage = d["state"].get("stage", "")
+            for s in d["samples"]:
+                if s.get("avg_mhz") is not None: self.freq.append((s["t"], s["avg_mhz"]))
+                if s.get("power_w") is not None: self.power.append((s["t"], s["power_w"]))
+
+    def _take_freq(self, final=False):
+        # 最後一個樣本可能還沒寫完，跑完才一起收
+        ts = self.tstat
+        col = ts.summary.get("Avg_MHz")
+        if col is None: return
+        n = len(col) if final else min(len(col), len(ts.t) - 1)
+        for i in range(self._ts_n, n):
+            if col[i] == col[i]: self.freq.append((ts.t[i], col[i]))
+        self._ts_n = max(self._ts_n, n)
+
+    def _last_text(self):
+        out = []
+        if self.freq: out.append(f"{self.freq[-1][1]:.0f} MHz")
+        if self.power: out.append(f"{self.power[-1][1]:.1f} W")
+        return "  ".join(out) or "waiting for telemetry…"
+
+    def _draw_chart(self):
+        c = self.chart
+        c.delete("all")
+        W, H = max(100, c.winfo_width()), max(80, c.winfo_height())
+        pL, pR, pT, pB = 50, 50, 12, 18
+        c.create_text(pL, 6, anchor="w", text="Avg MHz", fill="#3b82f6", font=("TkDefaultFont", 8))
+        c.create_text(W-pR, 6, anchor="e", text="Package W", fill="#f97316", font=("TkDefaultFont", 8))
+        for series, color, side in ((self.freq, "#3b82f6", "left"), (self.power, "#f97316", "right")):
+            if len(series) < 2: continue
+            t0, t1 = series[0][0], series[-1][0]
+            vs = [v for _,v in series]; y0, y1 = min(vs), max(vs)
+            if y1 - y0 < 1e-6: y0, y1 = y0 - 1, y1 + 1
+            sx = (W-pL-pR)/max(1e-6, t1-t0); sy = (H-pT-pB)/(y1-y0)
+            pts = []
+            for t,v in series: pts += [pL + (t-t0)*sx, H-pB - (v-y0)*sy]
+            c.create_line(*pts, fill=color, width=2)
+            x = 4 if side == "left" else W-4
+            a = "nw" if side == "left" else "ne"
+            c.create_text(x, pT, anchor=a, text=f"{y1:.0f}", fill=color, font=("TkDefaultFont", 8))
+            c.create_text(x, H-pB, anchor="s"+a[1], text=f"{y0:.0f}", fill=color, font=("TkDefaultFont", 8))
+        if len(self.freq) < 2 and len(self.power) < 2:
+            c.create_text(W/2, H/2, text="(no live telemetry yet)", fill="#999")
 
 def main():
     try:
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# =============================================================================
+#  PTU_CPU_Verify_History.py  (Albert Style, run history, Py3.6-compatible)
+#  - 把 LOG_BASE 底下所有 run_*（含 campaign_* 內的步驟、fleet_*/<節點>/ 拉回來的 run、只剩 .tar.gz / .tar.zst 的也算）索引進 SQLite
+#  - 增量：每個 run 只讀一次（路徑 + mtime 沒變就跳過），上千個 run 幾秒內掃完
+#  - 每個 run 存摘要：p1/p50/p99 頻率、平均/峰值功耗、溫度、降頻秒數、verdict，外加 300 點頻率縮圖
+#  - compare：多個 run 疊圖＋表格，超過容忍度的退步標紅
+#
+#  用法：
+#    python3 PTU_CPU_Verify_History.py index  [LOG_BASE]
+#    python3 PTU_CPU_Verify_History.py list   [--host H] [--profile P] [--last N]
+#    python3 PTU_CPU_Verify_History.py compare RUN RUN [RUN...] [--tol 3] [--html out.html]
+#      RUN = 資料庫 id、run 目錄名稱（run_YYYYmmdd_HHMMSS）或完整路徑；第一個當基準
+# =============================================================================
+import os, re, sys, json, time, sqlite3, tarfile, argparse, subprocess
+from html import escape
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+import PTU_CPU_Verify as core          # 舊 run 沒有 Albert_Summary.json 時借用核心的解析
+
+HISTORY_DB_NAME = "albert_history.sqlite"
+TOL_PCT_DEFAULT = 3.0
+SUMMARY_FILE = "Albert_Summary.json"
+TAR_EXTS = (".tar.gz", ".tar.zst")
+
+def _tar_ext(name): return next((x for x in TAR_EXTS if name.endswith(x)), None)
+
+COLS = ("ts","step","host","profile","load","cores","duration","verdict","rc","samples",
+        "p1_mhz","p50_mhz","p99_mhz","avg_mhz","avg_w","peak_w","avg_temp_c","max_temp_c","throttle_s","ops_unit","ops_s","ops_j","ovh_pct")
+ADDED_COLS = (("ops_unit", "TEXT"), ("ops_s", "REAL"), ("ops_j", "REAL"), ("ovh_pct", "REAL"), ("step", "INTEGER"))     # 舊資料庫開啟時補上
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs(
+  id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime REAL, indexed_at TEXT,
+  ts TEXT, step INTEGER, host TEXT, profile TEXT, load INTEGER, cores TEXT, duration INTEGER, verdict TEXT, rc INTEGER, samples INTEGER,
+  p1_mhz REAL, p50_mhz REAL, p99_mhz REAL, avg_mhz REAL, avg_w REAL, peak_w REAL, avg_temp_c REAL, max_temp_c REAL,
+  throttle_s REAL, ops_unit TEXT, ops_s REAL, ops_j REAL, ovh_pct REAL, trend TEXT);
+CREATE INDEX IF NOT EXISTS runs_ts ON runs(ts);
+CREATE INDEX IF NOT EXISTS runs_host ON runs(host, profile);
+"""
+
+def db_path(log_base):
+    return os.environ.get("HISTORY_DB") or os.path.join(log_base, HISTORY_DB_NAME)
+
+def connect(fp):
+    con = sqlite3.connect(fp)
+    con.row_factory = sqlite3.Row
+    con.executescript(SCHEMA)
+    have = {r["name"] for r in con.execute("PRAGMA table_info(runs)")}
+    for c, typ in ADDED_COLS:
+        if c not in have: con.execute(f"ALTER TABLE runs ADD COLUMN {c} {typ}")
+    return con
+
+# ====== 找出所有 run ======
+def iter_runs(log_base):
+    # (路徑, mtime)；目錄優先，只剩 tarball 的才讀 tarball
+    try: top = list(os.scandir(log_base))
+    except OSError: return
+    dirs = {e.name for e in top if e.is_dir()}
+    for e in top:
+        if e.is_dir() and e.name.startswith("campaign_"):
+            for sub in os.scandir(e.path):
+                if sub.is_dir() and sub.name.startswith("run_"): yield sub.path, _mtime(sub.path)
+        elif e.is_dir() and e.name.startswith("fleet_"):
+            for node in os.scandir(e.path):
+                if not node.is_dir(): continue
+                for sub in os.scandir(node.path):
+                    if sub.is_dir() and sub.name.startswith("run_"): yield sub.path, _mtime(sub.path)
+        elif e.is_dir() and e.name.startswith("run_"):
+            yield e.path, _mtime(e.path)
+        elif e.is_file() and _tar_ext(e.name) and e.name[:-len(_tar_ext(e.name))] not in dirs and e.name.startswith(("run_","campaign_")):
+            yield e.path, e.stat().st_mtime
+
+def _mtime(d):
+    for fn in (SUMMARY_FILE, "Albert_Overview.txt"):
+        try: return os.stat(os.path.join(d, fn)).st_mtime
+        except OSError: pass
+    return os.stat(d).st_mtime
+
+# ====== 讀一個 run ======
+def _overview_fields(text):
+    out = {}
+    for key, pat in (("profile", r"^Profile\s*:\s*(\S+)"), ("duration", r"^Duration\s*:\s*(\d+)"),
+                     ("verdict", r"^Verdict\s*:\s*(\w+)"), ("rc", r"^Workload RC\s*:\s*(-?\d+)"),
+                     ("avg_w", r"^Avg Power W\s*:\s*([\d.]+)"), ("peak_w", r"^Peak Power W\s*:\s*([\d.]+)")):
+        m = re.search(pat, text, re.M)
+        if m: out[key] = m.group(1)
+    return out
+
+def _legacy_summary(run_dir):
+    # 沒有 Albert_Summary.json 的舊 run：Overview + turbostat 文字
+    s = {"ts": os.path.basename(run_dir)[4:]}
+    ov = os.path.join(run_dir, "Albert_Overview.txt")
+    if os.path.exists(ov):
+        with open(ov, encoding="utf-8", errors="ignore") as f: s.update(_overview_fields(f.read()))
+    tel = os.path.join(run_dir, "telemetry")
+    bins = sorted(Path(tel).glob("telemetry_*.ptc")) if os.path.isdir(tel) else []
+    files = sorted(Path(tel).glob("turbostat_*.txt")) + sorted(Path(tel).glob("freq_*.txt")) if os.path.isdir(tel) else []
+    ts = None
+    if bins:                                # 欄式檔直接 mmap，不解析文字
+        try: ts = core.load_telemetry(str(bins[0]), cpu_metrics=())
+        except (OSError, ValueError): ts = None
+    if (ts is None or not len(ts)) and files: ts = core.parse_turbostat(str(files[0]), cpu_metrics=())
+    if ts is not None:
+        col = ts.series("Bzy_MHz") or ts.series("Avg_MHz")
+        pct = core.percentiles(col)
+        st = core.col_stats(col)
+        if pct: s.update(p1_mhz=pct[0], p50_mhz=pct[1], p99_mhz=pct[2], avg_mhz=st[0], samples=len(ts))
+        tmp = core.col_stats(ts.series("PkgTmp"))
+        if tmp: s.update(avg_temp_c=tmp[0], max_temp_c=tmp[2])
+        if col:
+            tt, tv = core.downsample_minmax(ts.t, col, 150)
+            s["trend"] = {"t": list(tt), "mhz": list(tv)}
+    return s
+
+def _tar_summaries(fp):
+    # 串流掃 tarball，只取每個 run_*/ 的 Albert_Summary.json / Overview（不解開整包）→ {run 目錄名: 摘要}
+    out, ovs, p = {}, {}, None
+    try:
+        if fp.endswith(".tar.zst"):
+            p = subprocess.Popen(["zstd", "-dcq", fp], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            tf = tarfile.open(fileobj=p.stdout, mode="r|")
+        else:
+            tf = tarfile.open(fp, "r|gz")
+        with tf:
+            for m in tf:
+                parts = m.name.split("/")
+                run = next((x for x in reversed(parts[:-1]) if x.startswith("run_")), None)
+                if run is None: continue
+                if parts[-1] == SUMMARY_FILE:
+                    out[run] = json.load(tf.extractfile(m))
+                elif parts[-1] == "Albert_Overview.txt":
+                    ovs[run] = _overview_fields(tf.extractfile(m).read().decode("utf-8", "ignore"))
+    except (OSError, tarfile.TarError, ValueError):
+        return {}
+    finally:
+        if p:
+            p.stdout.close(); p.kill(); p.wait()
+    for run, ov in ovs.items():
+        if run not in out and ov: out[run] = dict(ov, ts=re.sub(r"_s\d+$", "", run[4:]))
+    return out
+
+def _step(run):
+    m = re.search(r"_s(\d+)$", run)
+    return int(m.group(1)) if m else None
+
+def read_runs(path):
+    # [(索引用的路徑, 摘要)]；campaign tarball 每個步驟一筆，路徑記成 <tarball>/<run 目錄名>
+    if _tar_ext(path):
+        runs = _tar_summaries(path)
+        if os.path.basename(path).startswith("run_"):
+            return [(path, s) for s in list(runs.values())[:1]]
+        return [(os.path.join(path, run), dict(s, step=_step(run))) for run, s in sorted(runs.items())]
+    fp = os.path.join(path, SUMMARY_FILE)
+    if os.path.exists(fp):
+        with open(fp, encoding="utf-8") as f: s = json.load(f)
+    else:
+        s = _legacy_summary(path)
+    return [(path, dict(s, step=_step(os.path.basename(path))))] if s else []
+
+def index(log_base, con, log=print):
+    known = {r["path"]: r["mtime"] for r in con.execute("SELECT path, mtime FROM runs")}
+    t0, seen, added = time.time(), 0, 0
+    for path, mt in iter_runs(log_base):
+        camp = _tar_ext(path) and os.path.basename(path).startswith("campaign_")     # 每個步驟一筆，鍵是 <tarball>/<run>
+        if (known.get(path) == mt and not camp) or (camp and any(k.startswith(path + "/") and v == mt for k,v in known.items())):
+            seen += 1
+            continue
+        for key, s in read_runs(path):
+            seen += 1
+            vals = [mt, core.now()] + [s.get(c) for c in COLS] + [json.dumps(s.get("trend"))]
+            names = ("mtime", "indexed_at") + COLS + ("trend",)
+            # 已存在就原地更新（id 不變，compare 用的 id 才穩定）
+            if key in known:
+                con.execute(f"UPDATE runs SET {','.join(n + '=?' for n in names)} WHERE path=?", vals + [key])
+            else:
+                con.execute(f"INSERT INTO runs(path, {','.join(names)}) VALUES(?{',?'*len(names)})", [key] + vals)
+            added += 1
+    con.commit()
+    log(f"indexed {added} new/changed of {seen} runs in {time.time()-t0:.2f}s → {con.execute('SELECT COUNT(*) FROM runs').fetchone()[0]} total")
+    return added
+
+# ====== 查詢 / 比較 ======
+def resolve(con, key):
+    if key.isdigit():
+        r = con.execute("SELECT * FROM runs WHERE id=?", (int(key),)).fetchone()
+        if r: return r
+    r = con.execute("SELECT * FROM runs WHERE path=? OR path LIKE ? ORDER BY mtime DESC",
+                    (os.path.abspath(key), "%/" + os.path.basename(key.rstrip("/")).replace(".tar.gz", "").replace(".tar.zst", "") + "%")).fetchone()
+    if not r: raise SystemExit(f"run not found in history: {key}")
+    return r
+
+def _fmt(v): return "-" if v is None else (f"{v:.1f}" if isinstance(v, float) else str(v))
+
+# 方向：+1 越大越好，-1 越小越好
+CHECKS = (("p1_mhz", +1), ("p50_mhz", +1), ("p99_mhz", +1), ("avg_w", -1), ("peak_w", -1), ("max_temp_c", -1), ("throttle_s", -1),
+          ("ops_s", +1), ("ops_j", +1))
+
+def regressions(base, run, tol_pct):
+    out = []
+    for k, sign in CHECKS:
+        a, b = base[k], run[k]
+        if a is None or b is None: continue
+        if k.startswith("ops_") and base["ops_unit"] != run["ops_unit"]: continue    # 不同 workload 的 ops 不能比
+        if k == "throttle_s":
+            if b - a > max(5.0, a*tol_pct/100.0): out.append((k, a, b))
+            continue
+        if a and sign*(b - a)/abs(a)*100.0 < -tol_pct: out.append((k, a, b))
+    return out
+
+def compare(con, keys, tol_pct=TOL_PCT_DEFAULT, html=None, log=print):
+    runs = [resolve(con, k) for k in keys]
+    base = runs[0]
+    cols = ("id","ts","host","profile","verdict") + tuple(k for k,_ in CHECKS)
+    w = {c: max(len(c), *(len(_fmt(r[c])) for r in runs)) for c in cols}
+    log("  ".join(c.ljust(w[c]) for c in cols))
+    flagged = {}
+    for r in runs:
+        reg = regressions(base, r, tol_pct) if r is not base else []
+        flagged[r["id"]] = reg
+        log("  ".join(_fmt(r[c]).ljust(w[c]) for c in cols) + ("   <-- REGRESSION" if reg else ""))
+    for r in runs[1:]:
+        for k,a,b in flagged[r["id"]]:
+            log(f"[REGRESSION] run {r['id']} {k}: {_fmt(a)} → {_fmt(b)} (tol {tol_pct}%)")
+    if html: write_compare_html(html, runs, flagged, tol_pct)
+    return flagged
+
+def write_compare_html(fp, runs, flagged, tol_pct):
+    cols = ("id","ts","host","profile","verdict") + tuple(k for k,_ in CHECKS)
+    rows = "".join("<tr%s>%s</tr>" % (' class="bad"' if flagged[r["id"]] else "",
+                   "".join(f"<td{' class=b' if any(k==c for k,_,_ in flagged[r['id']]) else ''}>{escape(_fmt(r[c]))}</td>" for c in cols)) for r in runs)
+    series = [{"name": f"#{r['id']} {r['ts']}", "trend": json.loads(r["trend"] or "null") or {"t": [], "mhz": []}} for r in runs]
+    js = json.dumps(series).replace("</", "<\\/")            # 值裡的 </script> 不能提早結束 script
+    doc = f"""<!doctype html><meta charset="utf-8"><title>Albert History — Compare</title>
+<style>body{{font-family:system-ui,Segoe UI,Roboto,Arial,sans-serif;background:#fafafa;margin:24px}}
+.card{{background:#fff;border-radius:16px;box-shadow:0 6px 20px rgba(0,0,0,.08);padding:20px;max-width:1100px}}
+table{{border-collapse:collapse;width:100%}}td,th{{padding:6px 8px;border-bottom:1px solid #eee;font-size:13px;text-align:left}}
+tr.bad{{background:#fff5f5}}td.b{{color:#dc2626;font-weight:600}}svg{{width:100%;height:300px;border:1px solid #eee;border-radius:12px}}</style>
+<div class="card"><h2>Run comparison (baseline = first row, tolerance {tol_pct}%)</h2>
+<table><tr>{"".join(f"<th>{c}</th>" for c in cols)}</tr>{rows}</table>
+<h3>Frequency overlay (MHz)</h3><svg id="s" viewBox="0 0 1000 300" preserveAspectRatio="none"></svg><div id="lg"></div></div>
+<script>var S={js},C=["#3b82f6","#ef4444","#10b981","#f59e0b","#8b5cf6","#64748b"];
+var svg=document.getElementById('s'),t1=0,y0=1e9,y1=-1e9;S.forEach(function(s){{var t=s.trend;for(var i=0;i<t.t.length;i++){{t1=Math.max(t1,t.t[i]);y0=Math.min(y0,t.mhz[i]);y1=Math.max(y1,t.mhz[i])}}}});
+if(y1<=y0){{y0-=1;y1+=1}}S.forEach(function(s,k){{var t=s.trend,d='';for(var i=0;i<t.t.length;i++)d+=(d?'L':'M')+(40+t.t[i]/Math.max(1,t1)*950).toFixed(1)+','+(290-(t.mhz[i]-y0)/(y1-y0)*280).toFixed(1);
+var p=document.createElementNS('http://www.w3.org/2000/svg','path');p.setAttribute('d',d);p.setAttribute('fill','none');p.setAttribute('stroke',C[k%C.length]);p.setAttribute('stroke-width','1.5');svg.appendChild(p);
+var sp=document.createElement('span');sp.style.color=C[k%C.length];sp.style.marginRight='12px';sp.textContent='■ '+s.name;document.getElementById('lg').appendChild(sp)}});
+</script>"""
+    with open(fp, "w", encoding="utf-8") as f: f.write(doc)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="PTU CPU Verify run history (SQLite)")
+    ap.add_argument("--log-base", default=os.environ.get("LOG_BASE", core.LOG_BASE_DEFAULT))
+    sp = ap.add_subparsers(dest="cmd")
+    p = sp.add_parser("index"); p.add_argument("path", nargs="?")
+    p = sp.add_parser("list"); p.add_argument("--host"); p.add_argument("--profile"); p.add_argument("--last", type=int, default=30)
+    p = sp.add_parser("compare"); p.add_argument("runs", nargs="+"); p.add_argument("--tol", type=float, default=TOL_PCT_DEFAULT)
+    p.add_argument("--html"); p.add_argument("--no-index", action="store_true")
+    a = ap.parse_args(argv)
+    log_base = getattr(a, "path", None) or a.log_base
+    con = connect(db_path(log_base))
+    if a.cmd == "index":
+        index(log_base, con)
+    elif a.cmd == "list":
+        q, args = "SELECT * FROM runs WHERE 1=1", []
+        if a.host: q += " AND host=?"; args.append(a.host)
+        if a.profile: q += " AND profile=?"; args.append(a.profile)
+        rows = con.execute(q + " ORDER BY ts DESC LIMIT ?", args + [a.last]).fetchall()
+        cols = ("id",) + COLS
+        w = {c: max([len(c)] + [len(_fmt(r[c])) for r in rows]) for c in cols}
+        print("  ".join(c.ljust(w[c]) for c in cols))
+        for r in rows: print("  ".join(_fmt(r[c]).ljust(w[c]) for c in cols))
+    elif a.cmd == "compare":
+        if len(a.runs) < 2: raise SystemExit("compare needs at least two runs")
+        if not a.no_index: index(log_base, con, log=lambda s: None)
+        flagged = compare(con, a.runs, a.tol, a.html)
+        return 1 if any(flagged.values()) else 0
+    else:
+        ap.print_help()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import os, sys, json, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PTU_CPU_Verify as core
+
+STUBS = ("run_step", "setup_host", "restore_host", "package_dir", "check_selection")
+
+class CampaignResumeTest(unittest.TestCase):
+    # run_step 換成假的：只看 campaign_state.json 的狀態轉換與接續時用的設定
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.saved = {n: getattr(core, n) for n in STUBS}
+        self.steps, self.packaged, self.abort = [], [], False
+        core.setup_host = lambda cfg, log: {"zones": []}
+        core.restore_host = lambda shared, log: None
+        core.package_dir = lambda path, log, mode=None: self.packaged.append(path)
+        core.check_selection = lambda cfg: None
+        core.run_step = self.fake_step
+
+    def tearDown(self):
+        for n, f in self.saved.items(): setattr(core, n, f)
+        core._TERM.clear()
+        core.flush_logs()
+        shutil.rmtree(self.tmp, True)
+
+    def fake_step(self, cfg, run_dir, ts, shared):
+        self.steps.append((os.path.basename(run_dir)[-3:], cfg["duration"], cfg["load"], cfg["governor"]))
+        aborted, self.abort = self.abort, False
+        return {"aborted": aborted, "tripped": None, "verdict": "FAIL" if aborted else "PASS", "rc": 130 if aborted else 0, "reasons": []}
+
+    def run_campaign(self, **env):
+        env = dict(env, PTU_BIN="/nonexistent")
+        core.run_campaign(core.load_config(env))
+        camp = [d for d in os.listdir(self.tmp) if d.startswith("campaign_")]
+        self.assertEqual(len(camp), 1)
+        camp = os.path.join(self.tmp, camp[0])
+        with open(os.path.join(camp, core.CAMPAIGN_STATE)) as f: return camp, json.load(f)
+
+    def test_interrupted_step_resumes_with_saved_settings(self):
+        self.abort = True
+        camp, st = self.run_campaign(LOG_BASE=self.tmp, DURATION="4", GOVERNOR="keep", CAMPAIGN="LOAD=50|100")
+        self.assertEqual([s["status"] for s in st["steps"]], ["interrupted", "pending"])
+        self.assertEqual(st["base"]["DURATION"], "4")
+        self.assertEqual(self.packaged, [])
+        partial = st["steps"][0]["run_dir"]
+
+        camp2, st = self.run_campaign(CAMPAIGN_DIR=camp)         # 只給 CAMPAIGN_DIR：其餘設定都從 state 來
+        self.assertEqual(camp2, camp)
+        self.assertEqual([s["status"] for s in st["steps"]], ["done", "done"])
+        self.assertEqual(self.steps, [("s01", 4, 50, "keep"), ("s01", 4, 50, "keep"), ("s02", 4, 100, "keep")])
+        kept = st["steps"][0]["abandoned"]
+        self.assertEqual([os.path.basename(p) for p in kept], ["interrupted_" + os.path.basename(partial)])
+        self.assertTrue(os.path.isdir(kept[0]))
+        self.assertEqual(self.packaged, [camp])
+
+    def test_resume_refuses_conflicting_settings(self):
+        self.abort = True
+        camp, _ = self.run_campaign(LOG_BASE=self.tmp, DURATION="4", CAMPAIGN="LOAD=50|100")
+        with self.assertRaises(SystemExit) as cm:
+            self.run_campaign(CAMPAIGN_DIR=camp, DURATION="600")
+        self.assertIn("DURATION=4 (now 600)", str(cm.exception))
+        self.assertEqual(len(self.steps), 1)
+
+    def test_campaign_env(self):
+        env = core.campaign_env({"DURATION": "9", "LOAD": "10", "CAMPAIGN_DIR": "/x"}, {"DURATION": "4"})
+        self.assertEqual(env, {"DURATION": "4", "CAMPAIGN_DIR": "/x"})
+        self.assertEqual(core.campaign_conflicts({"DURATION": "4", "LOAD": "10"}, {"DURATION": "4"}), ["LOAD"])
+
+if __name__ == "__main__":
+    unittest.main()
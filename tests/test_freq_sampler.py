@@ -0,0 +1,53 @@
+import os, sys, errno, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PTU_CPU_Verify as core
+
+class NoAperf(core.FreqSampler):
+    # /dev/cpu/N/msr 打得開，但讀 MSR 回 EIO（VM、沒有 APERF/MPERF 的主機）
+    def _rdmsr(self, fd, reg): raise OSError(errno.EIO, "Input/output error")
+
+class FakeMsr(core.FreqSampler):
+    def _rdmsr(self, fd, reg): return reg
+
+class FreqSamplerFallbackTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cpu_root = os.path.join(self.tmp, "sys")
+        self.msr_root = os.path.join(self.tmp, "dev")
+        for c in range(2):
+            os.makedirs(os.path.join(self.cpu_root, f"cpu{c}", "cpufreq"))
+            with open(os.path.join(self.cpu_root, f"cpu{c}", "cpufreq", "scaling_cur_freq"), "w") as f: f.write("2400000\n")
+            os.makedirs(os.path.join(self.msr_root, str(c)))
+            open(os.path.join(self.msr_root, str(c), "msr"), "w").close()
+        with open(os.path.join(self.cpu_root, "online"), "w") as f: f.write("0-1\n")
+        self.stat = os.path.join(self.tmp, "stat")
+        with open(self.stat, "w") as f:
+            f.write("cpu  20 0 20 160 0 0 0 0\ncpu0 10 0 10 80 0 0 0 0\ncpu1 10 0 10 80 0 0 0 0\n")
+
+    def tearDown(self): shutil.rmtree(self.tmp, True)
+
+    def make(self, cls, mode="auto"):
+        return cls(os.path.join(self.tmp, "freq.txt"), mode=mode, cpu_root=self.cpu_root, msr_root=self.msr_root, proc_stat=self.stat)
+
+    def test_auto_falls_back_to_cpufreq_when_msr_read_fails(self):
+        fs = self.make(NoAperf)
+        self.assertEqual(fs.mode, "cpufreq")
+        self.assertEqual(fs.cpus, [0, 1])
+        mhz, stat = fs._snapshot()
+        self.assertEqual(mhz, {0: 2400.0, 1: 2400.0})
+        self.assertEqual(stat[0], (20, 100))
+        fs._close(); os.close(fs.stat_fd)
+
+    def test_msr_mode_raises_when_msr_read_fails(self):
+        with self.assertRaises(OSError):
+            self.make(NoAperf, mode="msr")
+
+    def test_msr_used_when_readable(self):
+        fs = self.make(FakeMsr)
+        self.assertEqual(fs.mode, "msr")
+        self.assertEqual(fs._snapshot()[1], (core.MSR_APERF, core.MSR_MPERF, core.MSR_TSC))
+        fs._close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os, sys, time, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PTU_CPU_Verify as core
+
+MAX_UJ = 262143328850
+
+class RaplTest(unittest.TestCase):
+    # 假的 /sys/class/powercap：兩個 package、package-0 底下一個 core 子 domain，外加 mmio 與控制型目錄
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for zid, name, energy in (("intel-rapl:0", "package-0", 1000), ("intel-rapl:0:0", "core", 500),
+                                  ("intel-rapl:1", "package-1", 2000), ("intel-rapl-mmio:0", "package-0", 7)):
+            os.makedirs(os.path.join(self.root, zid))
+            self.put(zid, "name", name)
+            self.put(zid, "energy_uj", energy)
+            self.put(zid, "max_energy_range_uj", MAX_UJ)
+        os.makedirs(os.path.join(self.root, "intel-rapl"))
+
+    def tearDown(self): shutil.rmtree(self.root, True)
+
+    def put(self, zid, fn, v):
+        with open(os.path.join(self.root, zid, fn), "w") as f: f.write(f"{v}\n")
+
+    def step(self, s, uj):
+        for zid, v in uj.items(): self.put(zid, "energy_uj", v)
+        time.sleep(0.002)
+        s.sample()
+
+    def test_zones(self):
+        zones = core.rapl_zones(self.root)
+        self.assertEqual([z["label"] for z in zones], ["package-0", "package-0/core", "package-1"])
+        self.assertEqual([z["top"] for z in zones], [True, False, True])
+        self.assertEqual(zones[0]["max"], MAX_UJ)
+
+    def test_wraparound(self):
+        s = core.RaplSampler(core.rapl_zones(self.root))
+        self.step(s, {"intel-rapl:0": 3000000, "intel-rapl:0:0": 1000500, "intel-rapl:1": 4002000})
+        self.step(s, {"intel-rapl:0": 1000000, "intel-rapl:0:0": 2000500, "intel-rapl:1": 6002000})       # package-0 回捲
+        self.assertEqual(s.wraps, 1)
+        self.assertAlmostEqual(s.energy_j[0], (2999000 + MAX_UJ - 2000000)/1e6)
+        self.assertAlmostEqual(s.energy_j[1], 2.0)
+        self.assertAlmostEqual(s.energy_j[2], 6.0)
+        sm = s.summary()
+        self.assertEqual((sm["samples"], sm["wraps"]), (2, 1))
+        self.assertAlmostEqual(sm["energy_j"], s.energy_j[0] + s.energy_j[2])    # 子 domain 不重複加
+        t, watts, total = s.ring[-1]
+        self.assertAlmostEqual(total, watts[0] + watts[2], places=3)
+        s.close()
+
+    def test_unreadable_zone_is_nan(self):
+        s = core.RaplSampler(core.rapl_zones(self.root))
+        self.put("intel-rapl:1", "energy_uj", "")
+        self.step(s, {"intel-rapl:0": 2000})
+        t, watts, total = s.ring[-1]
+        self.assertNotEqual(watts[2], watts[2])
+        self.assertAlmostEqual(s.energy_j[0], 0.001)
+        s.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os, sys, math, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PTU_CPU_Verify as core
+
+N, CPU2_AT, TMP_AT = 10, 4, 6
+
+def rows():
+    # Tstat.take() 的格式：(t, summary, {cpu: {...}}, {pkg: {...}})；中途多一顆 CPU、再多一個 metric
+    out = []
+    for i in range(N):
+        cpus = {c: {"Busy%": 90.0 + c, "Bzy_MHz": 3000.0 - i} for c in range(3 if i >= CPU2_AT else 2)}
+        if i >= TMP_AT:
+            for c,d in cpus.items(): d["CoreTmp"] = 60.0 + c
+        out.append((2.0*i, {"Bzy_MHz": 3000.0 - i, "PkgWatt": 250.5}, cpus, {0: {"PkgWatt": 250.5}}))
+    return out
+
+def nan(v): return v != v
+
+class TelemetryStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fp = os.path.join(self.tmp, "telemetry.ptc")
+        self.chunk_rows = core.TELEMETRY_CHUNK_ROWS
+        core.TELEMETRY_CHUNK_ROWS = 3           # 少量資料也切成好幾個 chunk
+
+    def tearDown(self):
+        core.TELEMETRY_CHUNK_ROWS = self.chunk_rows
+        shutil.rmtree(self.tmp, True)
+
+    def write(self, close=True):
+        st = core.TelemetryStore(self.fp)
+        st.topo = {0: (0, 0), 1: (0, 1), 2: (0, 2)}
+        for r in rows(): st.append(*r)
+        return st.close() if close else st
+
+    def test_round_trip(self):
+        st = self.write()
+        rd = core.TelemetryReader(self.fp)
+        self.assertTrue(rd.complete)
+        self.assertEqual(rd.rows, N)
+        self.assertGreater(len(rd.chunks), 3)
+        rd.close()
+
+        ts = core.load_telemetry(self.fp)
+        self.assertEqual(list(ts.t), [2.0*i for i in range(N)])
+        self.assertEqual(list(ts.summary["Bzy_MHz"]), [3000.0 - i for i in range(N)])
+        self.assertEqual(sorted(ts.cpu), [0, 1, 2])
+        self.assertEqual(list(ts.cpu[1]["Bzy_MHz"]), [3000.0 - i for i in range(N)])
+        col = ts.cpu[2]["Busy%"]
+        self.assertTrue(all(nan(v) for v in col[:CPU2_AT]))
+        self.assertEqual(list(col[CPU2_AT:]), [92.0]*(N - CPU2_AT))
+        col = ts.cpu[0]["CoreTmp"]
+        self.assertEqual(len(col), N)
+        self.assertTrue(all(nan(v) for v in col[:TMP_AT]))
+        self.assertEqual(list(col[TMP_AT:]), [60.0]*(N - TMP_AT))
+        self.assertEqual(list(ts.pkg[0]["PkgWatt"]), [250.5]*N)
+        self.assertEqual(ts.topo, st.topo)
+        self.assertEqual(ts._n, N)
+
+    def test_cpu_metric_filter_keeps_cpus(self):
+        self.write()
+        ts = core.load_telemetry(self.fp, cpu_metrics=())
+        self.assertEqual(sorted(ts.cpu), [0, 1, 2])         # 與 parse_turbostat 一樣：metric 濾掉了 CPU 還在
+        self.assertTrue(all(not d for d in ts.cpu.values()))
+        self.assertEqual(len(ts.summary["Bzy_MHz"]), N)
+        ts = core.load_telemetry(self.fp, cpu_metrics=("Busy%",))
+        self.assertEqual(sorted(ts.cpu[2]), ["Busy%"])
+
+    def test_truncated_file(self):
+        st = self.write()
+        last = st.index[-1]
+        with open(self.fp, "r+b") as f: f.truncate(last[0] + 10)      # 當在最後一個 chunk 寫到一半
+        rd = core.TelemetryReader(self.fp)
+        self.assertFalse(rd.complete)
+        self.assertEqual(rd.rows, N - last[1])
+        rd.close()
+        ts = core.load_telemetry(self.fp)
+        self.assertEqual(list(ts.t), [2.0*i for i in range(N - last[1])])
+        self.assertTrue(math.isnan(ts.cpu[0]["CoreTmp"][0]))
+
+    def test_unclosed_store_is_readable(self):
+        st = self.write(close=False)
+        try:
+            rd = core.TelemetryReader(self.fp)
+            self.assertFalse(rd.complete)
+            self.assertEqual(rd.rows, st.rows)
+            self.assertEqual(st.rows + len(st.t), N)        # 還沒滿 chunk 的列留在記憶體
+            rd.close()
+        finally:
+            st.abort()
+
+    def test_not_telemetry(self):
+        with open(self.fp, "w") as f: f.write("Package\tCore\tCPU\n")
+        with self.assertRaises(ValueError): core.TelemetryReader(self.fp)
+
+if __name__ == "__main__":
+    unittest.main()
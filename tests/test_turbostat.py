@@ -0,0 +1,116 @@
+import os, sys, math, random, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import PTU_CPU_Verify as core
+
+HDR1 = "Package\tCore\tCPU\tAvg_MHz\tBusy%\tBzy_MHz\tPkgWatt"
+HDR2 = "Package\tCore\tCPU\tAvg_MHz\tBusy%\tBzy_MHz\tCoreTmp\tPkgWatt"      # 中途多一欄
+
+def sample(i, hdr):
+    # turbostat 的列：package 欄只出現在每個 package 的第一顆 CPU（欄位在最後，所以是整列變短）
+    mhz, cols = 3000 - 10*i, hdr.split("\t")
+    rows = [{"Package": "-", "Core": "-", "CPU": "-", "Avg_MHz": mhz - 50, "Busy%": 99.0, "Bzy_MHz": mhz, "CoreTmp": 70, "PkgWatt": 400}]
+    for c in range(4):
+        r = {"Package": c//2, "Core": c%2, "CPU": c, "Avg_MHz": mhz - 50, "Busy%": 90.0 + c, "Bzy_MHz": mhz, "CoreTmp": 60 + c}
+        if c in (0, 2): r["PkgWatt"] = 200
+        rows.append(r)
+    return ["\t".join(str(r[k]) for k in cols if k in r) for r in rows]
+
+def turbostat_text(n=6, switch=3):
+    lines = []
+    for i in range(n):
+        hdr = HDR2 if i >= switch else HDR1
+        lines += [hdr] + sample(i, hdr)
+    return "\n".join(lines) + "\n"
+
+class TurbostatParseTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fp = os.path.join(self.tmp, "turbostat.txt")
+
+    def tearDown(self): shutil.rmtree(self.tmp, True)
+
+    def parse(self, text, **kw):
+        with open(self.fp, "w") as f: f.write(text)
+        return core.parse_turbostat(self.fp, **kw)
+
+    def test_columns(self):
+        ts = self.parse(turbostat_text())
+        self.assertEqual(len(ts.t), 6)
+        self.assertEqual(list(ts.summary["Bzy_MHz"]), [3000 - 10*i for i in range(6)])
+        self.assertEqual(sorted(ts.cpu), [0, 1, 2, 3])
+        self.assertEqual(sorted(ts.pkg), [0, 1])
+        self.assertEqual(list(ts.pkg[1]["PkgWatt"]), [200.0]*6)
+        self.assertEqual([round(v, 1) for v in ts.cpu[3]["Busy%"]], [93.0]*6)
+
+    def test_header_change_pads_new_metric(self):
+        ts = self.parse(turbostat_text())
+        col = ts.summary["CoreTmp"]
+        self.assertEqual(len(col), 6)
+        self.assertTrue(all(math.isnan(v) for v in col[:3]))
+        self.assertEqual(list(col[3:]), [70.0]*3)
+        self.assertEqual(list(ts.cpu[1]["CoreTmp"][3:]), [61.0]*3)
+
+    def test_cpu_metric_filter_keeps_summary(self):
+        ts = self.parse(turbostat_text(), cpu_metrics=("Busy%",))
+        self.assertEqual(sorted(ts.cpu[0]), ["Busy%"])
+        self.assertIn("Bzy_MHz", ts.summary)
+
+    def test_partial_last_line_ignored(self):
+        text = turbostat_text(3, 9)
+        ts = self.parse(text + "-\t-\t-\t12")            # turbostat 寫到一半
+        self.assertEqual(len(ts.t), 3)
+        self.assertEqual(list(ts.summary["Avg_MHz"]), [2950.0, 2940.0, 2930.0])
+
+class TurbostatStreamTest(unittest.TestCase):
+    # turbostat 邊寫邊讀：檔案以任意長度的片段長出來（常切在一行中間），FileTail + Tstat.take() 要和整檔解析一致
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.fp = os.path.join(self.tmp, "turbostat.txt")
+
+    def tearDown(self): shutil.rmtree(self.tmp, True)
+
+    def stream(self, text, seed, max_bytes=1 << 20):
+        rnd, tail, ts, got = random.Random(seed), core.FileTail(self.fp), core.Tstat(), []
+        data, pos = text.encode(), 0
+        open(self.fp, "wb").close()
+        while pos < len(data):
+            n = rnd.randint(1, 40)
+            with open(self.fp, "ab") as f: f.write(data[pos:pos + n])
+            pos += n
+            for ln in tail.lines(max_bytes): ts.feed(ln)
+            got += ts.take()
+        for ln in tail.lines(): ts.feed(ln)
+        return got + ts.take(final=True), ts
+
+    def whole(self, text):
+        with open(self.fp, "w") as f: f.write(text)
+        return core.parse_turbostat(self.fp).take(final=True)
+
+    def test_split_chunks_match_whole_file(self):
+        text = turbostat_text(12, 5)
+        want = self.whole(text)
+        self.assertEqual(len(want), 12)
+        for seed in range(5):
+            got, ts = self.stream(text, seed)
+            self.assertEqual(got, want)
+            self.assertEqual(len(ts.t), 0)                  # 取出後欄位清空，記憶體不隨時間長
+            self.assertEqual(sorted(ts.cpu), [0, 1, 2, 3])
+
+    def test_small_reads(self):
+        text = turbostat_text(4, 2)
+        got, _ = self.stream(text, 7, max_bytes=7)          # 每次只讀 7 bytes，一行要分好幾次才湊齊
+        self.assertEqual(got, self.whole(text))
+
+    def test_last_sample_held_until_final(self):
+        tail, ts = core.FileTail(self.fp), core.Tstat()
+        with open(self.fp, "w") as f: f.write(turbostat_text(3, 9) + "-\t-\t-\t12")
+        for ln in tail.lines(): ts.feed(ln)
+        self.assertEqual([r[0] for r in ts.take()], [0.0, ts.interval])   # 第 3 個樣本可能還有列沒寫完
+        self.assertEqual(tail.rest, b"-\t-\t-\t12")
+        rows = ts.take(final=True)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][2][3]["Busy%"], 93.0)
+
+if __name__ == "__main__":
+    unittest.main()